@@ -1,18 +1,15 @@
 from enum import Enum, auto
 from collections import deque
-from typing import Union, List, Tuple, Any, Sequence
-from io import BytesIO
+from functools import partial
+from itertools import chain, islice
+from types import MappingProxyType
+from typing import Union, List, Tuple, Any, Sequence, Optional, Callable, Dict, Mapping
 
-from sioresp.config import Config
+from sioresp.config import Config, Value
 from sioresp.buffer import Buffer
 from sioresp.events import BaseEvent, String, VerbatimString, ReplyError, Integer, Array, Map, Set, Push, Double, \
     Attribute, Null, Boolean
-from sioresp.exceptions import ProtocolError
-
-try:
-    import hiredis
-except:
-    hiredis = None
+from sioresp.exceptions import ProtocolError, LimitExceededError
 
 string_start = 43  # b"+"
 error_start = 45  # b"-1"
@@ -40,12 +37,52 @@ class ParserState(Enum):
     read_bulk_string_body = auto()
     read_blob_error_body = auto()
     read_verbatim_string_body = auto()
+    read_raw = auto()  # 原样收集一个大回复
+    skip = auto()  # 丢弃的回复 只找结尾
+    skip_attribute = auto()  # Config.skip_attributes 跳过attribute的内容
+
+
+BULK_START_BYTE = {bulk_string_start: String, blob_error_start: ReplyError, verbatim_string_start: VerbatimString}
+BULK_BODY_STATE = {bulk_string_start: ParserState.read_bulk_string_body,
+                   blob_error_start: ParserState.read_blob_error_body,
+                   verbatim_string_start: ParserState.read_verbatim_string_body}
+AGGREGATE_START_BYTE = {array_start: Array, map_start: Map, set_start: Set, attribute_start: Attribute,
+                        push_start: Push}
+# Connection methods assembling each aggregate, by config.immutable_containers
+ASSEMBLERS = {False: {Array: "_next_array", Push: "_next_push", Set: "_next_set", Map: "_next_map",
+                      Attribute: "_next_attribute"},
+              True: {Array: "_next_tuple", Push: "_next_tuple", Set: "_next_frozenset", Map: "_next_frozen_map",
+                     Attribute: "_next_frozen_attribute"}}
+VISITOR_CALLBACKS = {Array: ("begin_array", "end_array"), Set: ("begin_set", "end_set"), Map: ("begin_map", "end_map"),
+                     Push: ("begin_push", "end_push")}
 
 
 # https://erpeng.github.io/2019/07/12/redis-resp3/
 # https://redis.com.cn/topics/protocol.html#:~:text=Redis%E5%8D%8F%E8%AE%AE%E8%AF%A6%E7%BB%86%E8%A7%84%E8%8C%83%20Redis%E5%AE%A2%E6%88%B7%E7%AB%AF%E5%92%8C%E6%9C%8D%E5%8A%A1%E5%99%A8%E7%AB%AF%E9%80%9A%E4%BF%A1%E4%BD%BF%E7%94%A8%E5%90%8D%E4%B8%BA%20RESP%20%28REdis%20Serialization,Protocol%29%20%E7%9A%84%E5%8D%8F%E8%AE%AE%E3%80%82%20%E8%99%BD%E7%84%B6%E8%BF%99%E4%B8%AA%E5%8D%8F%E8%AE%AE%E6%98%AF%E4%B8%93%E9%97%A8%E4%B8%BARedis%E8%AE%BE%E8%AE%A1%E7%9A%84%EF%BC%8C%E5%AE%83%E4%B9%9F%E5%8F%AF%E4%BB%A5%E7%94%A8%E5%9C%A8%E5%85%B6%E5%AE%83%20client-server%20%E9%80%9A%E4%BF%A1%E6%A8%A1%E5%BC%8F%E7%9A%84%E8%BD%AF%E4%BB%B6%E4%B8%8A%E3%80%82
 # https://www.zeekling.cn/articles/2021/01/10/1610263628832.html#b3_solo_h3_16
 
+def _strict_integer(event: Integer) -> int:
+    data = event.data
+    digits = data[1:] if data[:1] in (b"-", b"+") else data
+    if not digits.isdigit():  # int() would also take spaces and underscores
+        raise ProtocolError(f"invalid integer {bytes(data)!r}")
+    return int(data)
+
+
+def _strict_double(event: Double) -> float:
+    data = event.data
+    try:
+        if b"_" in data or data != data.strip():
+            raise ValueError
+        return float(data)
+    except ValueError:
+        raise ProtocolError(f"invalid double {bytes(data)!r}") from None
+
+
+# post processors replacing those of Connection with validation="strict"
+STRICT_POST_PROCESSORS = {Integer: _strict_integer, Double: _strict_double}
+
+
 class Connection:
     post_processors = {
         String: lambda x: bytes(x) if x.len is None else None,  # len不是None就是-1 这里把-1长度的str也视为None
@@ -57,220 +94,426 @@ class Connection:
         Null: lambda x: None
     }
 
+    # top level aggregates this long are collected raw and handed to _raw_event, which
+    # subclasses like OffloadConnection define
+    raw_threshold = None  # type: Optional[int]
+    # resp3 attributes met while building the reply last returned, in wire order, each a list of (key, value)
+    attributes = ()  # type: Sequence[List[Tuple]]
+
     def __init__(self, config: Config):
         self.config = config
+        self._encoder = None  # type: Optional["Encoder"]
         self._buffer = Buffer()
         self._events = deque()
         self._events_backup = deque()  # stack
         self._parser_state = ParserState.wait_data
         self._current_length = None  # type: Optional[int]
+        self._frame_stack = []  # 每一层aggregate还剩多少个元素
+        self._reply_ends = deque()  # 每个完整回复结束时的偏移
+        self._fed = 0  # 一共喂进来多少字节
+        self._raw_header = None  # type: Optional[bytes]
+        self._raw_framer = None  # type: Optional["Framer"]
+        self._raw_pos = 0
+        self._discard = 0  # 还要丢弃多少个回复
+        self._skip_framer = None  # type: Optional["Framer"]
+        self._pending_attributes = None  # type: Optional[List[List[Tuple]]]
+        # next_with: the visitor taking the reply being received, and once that is complete
+        self._visitor = None  # type: Optional["Visitor"]
+        self._visit_error = None  # type: Optional[Exception]
+        self._visit_stack = []
+        self._streamed = None  # type: Optional[Tuple["Visitor", Optional[Exception]]]
+        if config.validation not in ("strict", "fast"):
+            raise ValueError(f"validation must be 'strict' or 'fast', got {config.validation!r}")
+        self._strict = config.validation == "strict"
+        if self._strict:
+            self.post_processors = {**self.post_processors, **STRICT_POST_PROCESSORS}
+        if config.resp_version not in (2, 3):  # checked here too since the encoder is made on first use
+            raise ValueError(f"resp_version must be one of [2, 3], got {config.resp_version!r}")
+        self._intern_cache = {}  # type: Dict[bytes, bytes]
+        if config.value_codecs:  # sioresp.codecs is only loaded when some are configured
+            from sioresp.codecs import decode_string
+
+            self.post_processors = {**self.post_processors, String: partial(decode_string, config)}
+        # plain functions of the class, bound methods kept on self would make a reference cycle
+        self._assemble = self._assemblers[bool(config.immutable_containers)]
+        self._returned = 0  # 已经作为完整回复返回的字节
+
+    @property
+    def encoder(self) -> "Encoder":
+        """
+        packs replies for pack_element and the writers, created on first use
+        :return:
+        """
+        if self._encoder is None:
+            from sioresp.encoder import Encoder
+
+            self._encoder = Encoder(self.config)
+        return self._encoder
 
     def feed_data(self, data: Union[bytes, bytearray]) -> None:
         assert data, "no data at all"
+        room = self._buffer_room()
+        if room is not None and len(data) > room:
+            self._feed_limited(data)
+            return
         self._buffer.extend(data)
-
-        while True:
-            start = self._buffer[0]
-            if start not in VALID_START_BYTE:
-                raise ProtocolError(f"invalid start byte {chr(start)}")
+        self._fed += len(data)
+        self._parse()
+
+    def _feed_limited(self, data) -> None:
+        # no more than max_buffer_size allows is buffered at once, the rest waits for parsing
+        with memoryview(data) as whole, whole.cast("B") as view:
+            pos = 0
+            while pos < len(view):
+                room = self._buffer_room()
+                if room <= 0:
+                    self._buffer_full()
+                with view[pos:pos + room] as chunk:
+                    self._buffer.extend(chunk)
+                    self._fed += len(chunk)
+                    pos += len(chunk)
+                self._parse()
+
+    def _buffer_room(self) -> Optional[int]:
+        # max_buffer_size counts what's beyond the declared body of the bulk string being read
+        limit = self.config.max_buffer_size
+        if limit is None:
+            return None
+        if self._current_length is not None:
+            limit += self._current_length + 2
+        return limit - len(self._buffer)
+
+    def _buffer_full(self) -> None:
+        raise LimitExceededError(
+            f"{len(self._buffer)} unparsed bytes exceeds max_buffer_size {self.config.max_buffer_size}")
+
+    def get_buffer(self, sizehint: int = 65536) -> memoryview:
+        """
+        room at the end of the parser's own buffer to receive into, eg. with sock.recv_into,
+        then report how much was written with buffer_updated. Like asyncio.BufferedProtocol,
+        but the view must be released before buffer_updated is called. The room is kept
+        between calls, nothing is allocated while it's big enough. It is smaller than
+        sizehint when max_buffer_size leaves less
+        :param sizehint:
+        :return:
+        """
+        if sizehint <= 0:
+            sizehint = 65536
+        room = self._buffer_room()
+        if room is not None:
+            if room <= 0:
+                self._buffer_full()
+            sizehint = min(sizehint, room)
+        return self._buffer.reserve(sizehint)
+
+    def buffer_updated(self, nbytes: int) -> None:
+        """
+        :param nbytes: bytes written into the view from get_buffer
+        :return:
+        """
+        self._buffer.written(nbytes)
+        self._fed += nbytes
+        if nbytes:
+            self._parse()
+
+    def _parse(self) -> None:
+        config = self.config
+        stack = self._frame_stack
+        strict = self._strict
+
+        buffer = self._buffer
+        buf = buffer.data  # the same bytearray for the buffer's whole life
+        append = self._events.append
+        emit = append if self._visitor is None else self._stream
+
+        while buffer.start != buffer.end:
             if self._parser_state == ParserState.wait_data:
+                start = buf[buffer.start]
+                if strict and start not in VALID_START_BYTE:
+                    raise ProtocolError(f"invalid start byte {chr(start)!r} at offset {self._fed - len(buffer)}")
+                s = buffer.readline(1)
+                if s is None:
+                    break
                 if start == string_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
                     event = String(data=s)
-                    self._events.append(event)
-                if start == error_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
+                elif start == error_start:
                     event = ReplyError(data=s)
-                    self._events.append(event)
-                if start == integer_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
+                elif start == integer_start or start == big_number_start:
                     event = Integer(data=s)
-                    self._events.append(event)
-                if start == big_number_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
-                    event = Integer(data=s)
-                    self._events.append(event)
-                if start == bulk_string_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
-                    length = int(s.decode())
-                    if length < 0:
-                        event = String(data=b"", len=length)
-                        self._events.append(event)
-                    else:
-                        self._current_length = length
-                        self._parser_state = ParserState.read_bulk_string_body
-                if start == blob_error_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
-                    length = int(s.decode())
-                    if length < 0:
-                        event = ReplyError(data=b"", len=length)
-                        self._events.append(event)
-                    else:
-                        self._current_length = length
-                        self._parser_state = ParserState.read_blob_error_body
-                if start == verbatim_string_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
-                    length = int(s.decode())
-                    if length < 0:
-                        event = VerbatimString(data=b"", len=length)
-                        self._events.append(event)
-                    else:
-                        self._current_length = length
-                        self._parser_state = ParserState.read_verbatim_string_body
-                if start == double_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
+                elif start == double_start:
                     event = Double(data=s)  # fixme inf -inf
-                    self._events.append(event)
-                if start == null_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                        if len(s) != 0:
-                            raise ProtocolError("null can't contain any data")
-                    else:
-                        break
+                elif start == null_start:
+                    if strict and len(s) != 0:
+                        raise ProtocolError(f"null can't contain any data, got {bytes(s)!r}")
                     event = Null()
-                    self._events.append(event)
-                if start == bool_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                        if bytes(s) not in (b"t", b"f"):
-                            raise ProtocolError("bool must be t or f")
-                    else:
-                        break
+                elif start == bool_start:
+                    if strict and s != b"t" and s != b"f":
+                        raise ProtocolError(f"bool must be t or f, got {bytes(s)!r}")
                     event = Boolean(data=s)
-                    self._events.append(event)
-                if start == array_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
-                    event = Array(len=int(s.decode()))
-                    self._events.append(event)
-                if start == map_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
-                    event = Map(len=int(s.decode()))
-                    self._events.append(event)
-                if start == set_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
-                    event = Set(len=int(s.decode()))
-                    self._events.append(event)
-                if start == attribute_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
-                    else:
-                        break
-                    event = Attribute(len=int(s.decode()))
-                    self._events.append(event)
-                if start == push_start:
-                    s = self._buffer.readline()
-                    if s is not None:
-                        s.skip(1)
+                elif start in BULK_START_BYTE:
+                    if strict and not (s.isdigit() or s == b"-1"):
+                        raise ProtocolError(f"invalid bulk length {bytes(s)!r}")
+                    length = int(s)
+                    if length < 0:
+                        event = BULK_START_BYTE[start](data=b"", len=length)
                     else:
-                        break
-                    event = Push(len=int(s.decode()))
-                    self._events.append(event)
-
-            if self._parser_state == ParserState.read_bulk_string_body:
-                if len(self._buffer) < self._current_length + 2:
+                        if config.max_bulk_length is not None and length > config.max_bulk_length:
+                            raise LimitExceededError(
+                                f"bulk length {length} exceeds max_bulk_length {config.max_bulk_length}")
+                        self._current_length = length
+                        self._parser_state = BULK_BODY_STATE[start]
+                        continue
+                elif start in AGGREGATE_START_BYTE:
+                    if strict and not (s.isdigit() or s == b"-1"):
+                        raise ProtocolError(f"invalid aggregate length {bytes(s)!r}")
+                    length = int(s)
+                    if config.max_aggregate_length is not None and length > config.max_aggregate_length:
+                        raise LimitExceededError(
+                            f"aggregate length {length} exceeds max_aggregate_length {config.max_aggregate_length}")
+                    if start == attribute_start:
+                        # the attribute belongs to the value after it, together they count as one element
+                        if config.skip_attributes:
+                            if length > 0:
+                                from sioresp.framing import Framer
+
+                                self._skip_framer = Framer(config, [length * 2])
+                                self._parser_state = ParserState.skip_attribute
+                            continue
+                        if config.max_nesting_depth is not None and len(stack) >= config.max_nesting_depth:
+                            raise LimitExceededError(
+                                f"nesting depth exceeds max_nesting_depth {config.max_nesting_depth}")
+                        emit(Attribute(len=length))
+                        stack.append(length * 2 + 1)
+                        continue
+                    event = AGGREGATE_START_BYTE[start](len=length)
+                    if length > 0:
+                        if config.max_nesting_depth is not None and len(stack) >= config.max_nesting_depth:
+                            raise LimitExceededError(
+                                f"nesting depth exceeds max_nesting_depth {config.max_nesting_depth}")
+                        # map carries key and value for each entry
+                        count = length * 2 if start == map_start else length
+                        if not stack and self.raw_threshold is not None and length >= self.raw_threshold:
+                            self._raw_header = b"%c%s\r\n" % (start, s)
+                            from sioresp.framing import Framer
+
+                            self._raw_framer = Framer(config, [count])
+                            self._raw_pos = 0
+                            self._parser_state = ParserState.read_raw
+                            continue
+                        emit(event)
+                        stack.append(count)
+                        continue
+                else:  # only reached in fast mode
+                    raise ProtocolError(f"invalid start byte {chr(start)!r}")
+            elif self._parser_state == ParserState.read_raw:
+                # _raw_pos is relative to buffer.start, which moves when get_buffer compacts
+                self._raw_pos = self._raw_framer.scan(buf, buffer.start + self._raw_pos, buffer.end) - buffer.start
+                if not self._raw_framer.complete:
                     break
-                s = self._buffer.read(self._current_length)
-                if bytes(self._buffer.read(2)) != b"\r\n":
-                    raise ProtocolError("bulk string should ended with \\r\\n")
-                self._current_length = None  # reset长度
-                event = String(data=s)
+                raw = self._raw_header + buffer.read(self._raw_pos)
+                self._raw_header = self._raw_framer = None
                 self._parser_state = ParserState.wait_data
-                self._events.append(event)
-
-            if self._parser_state == ParserState.read_verbatim_string_body:
-                if len(self._buffer) < self._current_length + 2:
+                event = self._raw_event(raw)
+            elif self._parser_state == ParserState.skip_attribute:
+                buffer.skip(self._skip_framer.scan(buf, buffer.start, buffer.end) - buffer.start)
+                if not self._skip_framer.complete:
                     break
-                s = self._buffer.read(self._current_length)
-                if bytes(self._buffer.read(2)) != b"\r\n":
-                    raise ProtocolError("verbatim string should ended with \\r\\n")
-                self._current_length = None  # reset长度
-                type_, _, data = s.partition(b":")
-                event = VerbatimString(data=data, type=type_)
+                self._skip_framer = None
                 self._parser_state = ParserState.wait_data
-                self._events.append(event)
-
-            if self._parser_state == ParserState.read_blob_error_body:
-                if len(self._buffer) < self._current_length + 2:
+                continue
+            elif self._parser_state == ParserState.skip:
+                buffer.skip(self._skip_framer.scan(buf, buffer.start, buffer.end) - buffer.start)
+                if not self._skip_framer.complete:
+                    break
+                self._returned = self._fed - len(buffer)
+                self._discard -= 1
+                if not self._discard:
+                    self._skip_framer = None
+                    self._parser_state = ParserState.wait_data
+                continue
+            else:
+                length = self._current_length
+                end = buffer.start + length
+                if buffer.end < end + 2:
                     break
-                s = self._buffer.read(self._current_length)
-                if bytes(self._buffer.read(2)) != b"\r\n":
-                    raise ProtocolError("blob error should ended with \\r\\n")
+                if buf[end] != 13 or buf[end + 1] != 10:  # b"\r\n"
+                    offset = f" at offset {self._fed - len(buffer) + length}" if strict else ""
+                    if self._parser_state == ParserState.read_bulk_string_body:
+                        raise ProtocolError(f"bulk string should ended with \\r\\n{offset}")
+                    if self._parser_state == ParserState.read_verbatim_string_body:
+                        raise ProtocolError(f"verbatim string should ended with \\r\\n{offset}")
+                    raise ProtocolError(f"blob error should ended with \\r\\n{offset}")
+                s = buffer.read(length)
+                buffer.skip(2)
                 self._current_length = None  # reset长度
-                event = ReplyError(data=s)
+                if self._parser_state == ParserState.read_bulk_string_body:
+                    event = String(data=s)
+                elif self._parser_state == ParserState.read_verbatim_string_body:
+                    type_, _, data = s.partition(b":")
+                    event = VerbatimString(data=data, type=type_)
+                else:
+                    event = ReplyError(data=s)
                 self._parser_state = ParserState.wait_data
-                self._events.append(event)
 
-            if not self._buffer:
-                break
+            emit(event)
+            # 一个值结束了 弹出已经完整的aggregate
+            while stack:
+                stack[-1] -= 1
+                if stack[-1]:
+                    break
+                stack.pop()
+            if not stack:  # 一个完整的回复
+                self._reply_ends.append(self._fed - buffer.end + buffer.start)
+                if emit is not append:
+                    self._end_stream()
+                    emit = append
+
+        if config.max_buffer_size is not None and self._buffer_room() < 0:
+            self._buffer_full()
+
+    def peek(self, n: int = 1) -> Optional[List[BaseEvent]]:
+        """
+        the first n events of the next reply without taking them, fewer when they aren't parsed
+        yet, so a caller can act on the head of a large reply before the rest arrives.
+        None when they can't be seen, the reply goes to a visitor (see next_with)
+        :param n:
+        :return:
+        """
+        if self._streamed is not None or self._visitor is not None:
+            return None
+        return list(islice(self._events, n))
+
+    def pending_bytes(self) -> int:
+        """
+        bytes fed in but not yet returned as a complete reply
+        :return:
+        """
+        return self._fed - self._returned
+
+    def should_pause_reading(self) -> bool:
+        """
+        async adapters should call transport.pause_reading() when this is True
+        :return:
+        """
+        high = self.config.read_high_water
+        return high is not None and self.pending_bytes() >= high
+
+    def should_resume_reading(self) -> bool:
+        """
+        async adapters should call transport.resume_reading() when this is True
+        :return:
+        """
+        high = self.config.read_high_water
+        if high is None:
+            return True
+        low = self.config.read_low_water
+        if low is None:
+            low = high // 4
+        return self.pending_bytes() <= low
 
     def reset(self):
+        """
+        back to the state of a new connection, eg. after a reconnect or in a forked child.
+        The encoder, packers and the intern cache are kept
+        """
         self._buffer.clear()
         self._events.clear()
         self._events_backup.clear()
+        self._frame_stack.clear()
+        self._reply_ends.clear()
+        self._fed = 0
+        self._returned = 0
+        self._current_length = None
+        self._raw_header = self._raw_framer = None
+        self._raw_pos = 0
+        self._discard = 0
+        self._skip_framer = None
+        self._pending_attributes = None
+        self._visitor = self._visit_error = self._streamed = None
+        self._visit_stack.clear()
+        self.attributes = ()
         self._parser_state = ParserState.wait_data
 
+    def discard(self, n: int = 1) -> None:
+        """
+        drop the next n replies, eg. the ones whose callers timed out or were cancelled.
+        Replies already parsed are dropped without being assembled, the rest are only
+        framed and cut off the buffer as they arrive, no python object is built for them
+        :param n:
+        :return:
+        """
+        if n and self._streamed is not None:
+            self._streamed = None
+            self._returned = self._reply_ends.popleft()
+            n -= 1
+        while n and self._reply_ends:
+            self._skip_element()
+            self._returned = self._reply_ends.popleft()
+            n -= 1
+        if not n:
+            return
+        self._discard += n
+        self._visitor = self._visit_error = None  # a visitor taking the reply being received loses it
+        self._visit_stack.clear()
+        if self._parser_state != ParserState.skip:
+            self._start_skip()
+
+    def _start_skip(self) -> None:
+        # everything still queued belongs to the reply being parsed, if any
+        from sioresp.framing import Framer
+
+        if self._parser_state == ParserState.read_raw:
+            framer = self._raw_framer
+            self._buffer.skip(self._raw_pos)
+            self._raw_header = self._raw_framer = None
+        elif self._parser_state == ParserState.skip_attribute:
+            # the rest of the attribute and the value it belongs to, like the tokenizer counts them
+            attribute = self._skip_framer
+            framer = Framer(self.config, self._frame_stack + [attribute.stack[0] + 1] + attribute.stack[1:])
+            framer._body_left = attribute._body_left
+            self._events.clear()
+            self._frame_stack.clear()
+        else:
+            framer = Framer(self.config, self._frame_stack[:])
+            if self._parser_state != ParserState.wait_data:  # in the middle of a bulk body
+                framer._body_left = self._current_length + 2
+            self._events.clear()
+            self._frame_stack.clear()
+        self._skip_framer = framer
+        self._parser_state = ParserState.skip
+
+    def _skip_element(self) -> None:
+        left = 1
+        events = self._events
+        while left:
+            event = events.popleft()
+            left -= 1
+            if isinstance(event, (Array, Set, Push)):
+                if event.len > 0:
+                    left += event.len
+            elif isinstance(event, Map):
+                left += event.len * 2
+            elif isinstance(event, Attribute):
+                left += event.len * 2 + 1
+
     def _next_element(self):
         event = self._events.popleft()
         self._events_backup.append(event)
 
         if isinstance(event, Array):
-            return self._next_array(event.len)
+            return self._assemble[Array](self, event.len)
         elif isinstance(event, Set):
-            return self._next_set(event.len)
+            return self._assemble[Set](self, event.len)
         elif isinstance(event, Map):
-            return self._next_map(event.len)
+            return self._assemble[Map](self, event.len)
         elif isinstance(event, Attribute):
-            return self._next_attribute(event.len)
+            attribute = self._assemble[Attribute](self, event.len)
+            if self._pending_attributes is None:
+                self._pending_attributes = []
+            self._pending_attributes.append(attribute)
+            return self._next_element()
         elif isinstance(event, Push):
-            return self._next_push(event.len)
+            return self._assemble[Push](self, event.len)
 
         return self.post_processors[type(event)](event)
 
@@ -290,28 +533,82 @@ class Connection:
         return s
 
     def _next_map(self, len_: int) -> Union[List[Tuple], dict]:
+        intern = self.intern if self.config.intern_cache_size else None
         if self.config.dict_for_map:
             m = {}
             for i in range(len_):
                 k = self._next_element()
+                if intern is not None:
+                    k = intern(k)
                 v = self._next_element()
                 m[k] = v
         else:
             m = []  # List[Tuple[K, V]] cause redis could use something unhashable as key
             for i in range(len_):
                 k = self._next_element()
+                if intern is not None:
+                    k = intern(k)
                 v = self._next_element()
                 m.append((k, v))
         return m
 
     def _next_attribute(self, len_: int) -> List[Tuple]:
+        intern = self.intern if self.config.intern_cache_size else None
         m = []  # attribute当成map处理
         for i in range(len_):
             k = self._next_element()
+            if intern is not None:
+                k = intern(k)
             v = self._next_element()
             m.append((k, v))
         return m
 
+    def _next_tuple(self, len_: int) -> Optional[tuple]:
+        if len_ < 0:
+            return None
+        next_element = self._next_element
+        return tuple(next_element() for _ in range(len_))
+
+    def _next_frozenset(self, len_: int) -> frozenset:
+        next_element = self._next_element
+        return frozenset(next_element() for _ in range(len_))
+
+    def _pairs(self, len_: int):
+        next_element = self._next_element
+        intern = self.intern if self.config.intern_cache_size else None
+        for _ in range(len_):
+            k = next_element()
+            if intern is not None:
+                k = intern(k)
+            yield k, next_element()
+
+    def _next_frozen_map(self, len_: int) -> Union[Tuple[Tuple], Mapping]:
+        if self.config.dict_for_map:
+            return MappingProxyType(dict(self._pairs(len_)))
+        return tuple(self._pairs(len_))
+
+    def _next_frozen_attribute(self, len_: int) -> Tuple[Tuple]:
+        return tuple(self._pairs(len_))
+
+
+    def intern(self, ele: Any) -> Any:
+        """
+        the shared object equal to ele if it's short bytes, so repeated field names
+        are stored once. also useful for the flat field/value arrays of resp2
+        :param ele:
+        :return:
+        """
+        if type(ele) is not bytes or len(ele) > self.config.intern_max_length:
+            return ele
+        cache = self._intern_cache
+        shared = cache.get(ele)
+        if shared is not None:
+            return shared
+        if len(cache) >= self.config.intern_cache_size:
+            cache.clear()  # bounded, start over like re's cache does
+        cache[ele] = ele
+        return ele
+
     def _next_push(self, len_: int) -> list:
         l = []
         if len_ < 0:  # 长度为-1的array解析成None
@@ -325,15 +622,147 @@ class Connection:
         return self
 
     def __next__(self):
+        if self._streamed is not None:  # already handed to a visitor by next_with
+            return self._pop_streamed()
+        if not self._reply_ends:  # nothing complete, don't build a partial reply just to undo it
+            raise StopIteration
         try:
             ele = self._next_element()
             self._events_backup.clear()  # 没出事
+            self._returned = self._reply_ends.popleft()
+            self.attributes = self._pending_attributes or ()
+            self._pending_attributes = None
             return ele
         except IndexError:
+            self._pending_attributes = None
             while self._events_backup:  # 出事了 不够数据 恢复栈
                 event = self._events_backup.pop()
                 self._events.appendleft(event)
             raise StopIteration
+        # eg. a value codec failed or, with validation="fast", int() refused a malformed
+        # integer: drop the whole reply to stay in step
+        except (ProtocolError, ValueError):
+            self._pending_attributes = None
+            while self._events_backup:
+                self._events.appendleft(self._events_backup.pop())
+            if self._reply_ends:
+                self._skip_element()
+                self._returned = self._reply_ends.popleft()
+            raise
+
+    def next_with(self, visitor: "Visitor") -> Any:
+        """
+        hand the next complete reply to visitor instead of building it, the containers are
+        never created. sioresp.visitor.BuildVisitor(con) gives what next() would.
+        When no reply is complete yet, visitor takes the one being received: what already
+        arrived of it right away, the rest from feed_data / buffer_updated as it's parsed,
+        so a huge reply is folded without its tokens piling up. Keep calling next_with with
+        the same visitor until it returns, next() would return the same result()
+        :param visitor:
+        :return: visitor.result()
+        """
+        if self._streamed is not None:
+            return self._pop_streamed()
+        if not self._reply_ends:
+            if self._visitor is None:
+                self._visitor = visitor
+                events = self._events  # the beginning of the reply, if any
+                while events:
+                    self._stream(events.popleft())
+            elif self._visitor is not visitor:
+                raise RuntimeError("the reply being received goes to another visitor")
+            raise StopIteration
+        events = self._events
+        backup = self._events_backup
+        try:
+            while True:
+                event = events.popleft()
+                backup.append(event)
+                if self._visit(visitor, event):
+                    break
+        except Exception:  # drop the whole reply to stay in step, like __next__
+            self._visit_stack.clear()
+            while backup:
+                events.appendleft(backup.pop())
+            self._skip_element()
+            self._returned = self._reply_ends.popleft()
+            raise
+        backup.clear()
+        self._returned = self._reply_ends.popleft()
+        return visitor.result()
+
+    def _visit(self, visitor: "Visitor", event) -> bool:
+        """
+        one event to visitor
+        :return: whether the reply is complete
+        """
+        stack = self._visit_stack  # [remaining elements, end callback name, is attribute]
+        type_ = type(event)
+        if type_ is String or type_ is VerbatimString:
+            if event.len is None:
+                visitor.on_bulk(memoryview(event.data))
+            else:
+                visitor.on_null()
+        elif type_ is Integer:
+            visitor.on_int(int(event))
+        elif type_ is Array or type_ is Push or type_ is Set or type_ is Map:
+            if event.len < 0:
+                visitor.on_null()
+            else:
+                begin, end = VISITOR_CALLBACKS[type_]
+                getattr(visitor, begin)(event.len)
+                if event.len:
+                    stack.append([event.len * 2 if type_ is Map else event.len, end, False])
+                    return False
+                getattr(visitor, end)()
+        elif type_ is Attribute:  # the value it belongs to follows
+            visitor.begin_attribute(event.len)
+            if event.len:
+                stack.append([event.len * 2, "end_attribute", True])
+            else:
+                visitor.end_attribute()
+            return False
+        elif type_ is ReplyError:
+            visitor.on_error(event)
+        elif type_ is Null:
+            visitor.on_null()
+        elif type_ is Double:
+            visitor.on_double(self.post_processors[Double](event))
+        elif type_ is Boolean:
+            visitor.on_bool(bool(event))
+        else:
+            visitor.on_value(self.post_processors[type_](event))
+        while stack:  # 一个值结束了
+            frame = stack[-1]
+            frame[0] -= 1
+            if frame[0]:
+                return False
+            stack.pop()
+            getattr(visitor, frame[1])()
+            if frame[2]:  # attribute done, not a value of its own
+                return False
+        return True
+
+    def _stream(self, event) -> None:
+        # where _parse puts events while a visitor takes the reply being received
+        if self._visit_error is None:
+            try:
+                self._visit(self._visitor, event)
+            except Exception as e:  # the rest of the reply is parsed and dropped, next_with raises it
+                self._visit_error = e
+
+    def _end_stream(self) -> None:
+        self._streamed = (self._visitor, self._visit_error)
+        self._visitor = self._visit_error = None
+        self._visit_stack.clear()
+
+    def _pop_streamed(self) -> Any:
+        visitor, error = self._streamed
+        self._streamed = None
+        self._returned = self._reply_ends.popleft()
+        if error is not None:
+            raise error
+        return visitor.result()
 
     def pack_string(self, string: Union[str, bytes, bytearray]) -> bytes:
         return f"+{string}\r\n".encode(self.config.encoding,
@@ -408,11 +837,8 @@ class Connection:
         return b"$-1\r\n" if self.config.resp_version == 2 else b"_\r\n"
 
     def pack_array(self, arr: Union[List, Tuple]) -> bytes:
-        ret = BytesIO()
-        ret.write(b"*%d\r\n" % len(arr))  # arr's len prefix
-        for i in arr:
-            ret.write(self.pack_element(i))
-        return ret.getvalue()
+        ret = bytearray(b"*%d\r\n" % len(arr))  # arr's len prefix
+        return bytes(self.encoder.encode_items(ret, arr))
 
     def pack_map(self, map: Union[dict, Sequence[Tuple[Any, Any]]]) -> bytes:
         """
@@ -420,15 +846,10 @@ class Connection:
         :param map:
         :return:
         """
-        ret = BytesIO()
-        ret.write(b"%")
-        ret.write(b"%d\r\n" % len(map))
+        ret = bytearray(b"%%%d\r\n" % len(map))
         if isinstance(map, dict):
             map = map.items()
-        for k, v in map:
-            ret.write(self.pack_element(k))
-            ret.write(self.pack_element(v))
-        return ret.getvalue()
+        return bytes(self.encoder.encode_items(ret, chain.from_iterable(map)))
 
     def pack_set(self, ele: set) -> bytes:
         """
@@ -436,11 +857,8 @@ class Connection:
         :param ele:
         :return:
         """
-        ret = BytesIO()
-        ret.write(b"~%d\r\n" % len(ele))
-        for i in ele:
-            ret.write(self.pack_element(i))
-        return ret.getvalue()
+        ret = bytearray(b"~%d\r\n" % len(ele))
+        return bytes(self.encoder.encode_items(ret, ele))
 
     def pack_attribute(self, attr: Union[dict, Sequence[Tuple[Any, Any]]]) -> bytes:
         """
@@ -448,14 +866,10 @@ class Connection:
         :param attr:
         :return:
         """
-        ret = BytesIO()
-        ret.write(b"|%d\r\n" % len(attr))
+        ret = bytearray(b"|%d\r\n" % len(attr))
         if isinstance(attr, dict):
             attr = attr.items()
-        for k, v in attr:
-            ret.write(self.pack_element(k))
-            ret.write(self.pack_element(v))
-        return ret.getvalue()
+        return bytes(self.encoder.encode_items(ret, chain.from_iterable(attr)))
 
     def pack_push(self, push: Union[List, Tuple]) -> bytes:
         """
@@ -465,70 +879,73 @@ class Connection:
         """
         if self.config.resp_version == 2:
             raise ProtocolError("resp version2 doesn't support push type")
-        ret = BytesIO()
-        ret.write(b">%d\r\n" % len(push))  # push's len prefix
-        for i in push:
-            ret.write(self.pack_element(i))
-        return ret.getvalue()
+        ret = bytearray(b">%d\r\n" % len(push))  # push's len prefix
+        return bytes(self.encoder.encode_items(ret, push))
+
+    def register_packer(self, cls: type, func: Optional[Callable[[Any], Any]] = None):
+        """
+        teach this connection to pack cls, func returns something packable
+        :param cls:
+        :param func:
+        :return:
+        """
+        return self.encoder.register(cls, func)
 
     def pack_element(self, ele: Any) -> bytes:
         """
-        this method could be rewrite in subclasses to have different strategies
+        packs by type, use register_packer or sioresp.encoder.register_packer for custom types
         :param ele:
         :return:
         """
-        if isinstance(ele, (str, bytes, bytearray)):
-            return self.pack_bulk_string(ele)
-        elif isinstance(ele, int):
-            if self.config.resp_version == 2:
-                return self.pack_integer(ele)
-            else:
-                return self.pack_big_number(ele)
-        elif isinstance(ele, float):
-            if self.config.resp_version == 2:
-                return self.pack_string(str(ele))
-            else:
-                return self.pack_double(ele)
-        elif isinstance(ele, bool):
-            if self.config.resp_version == 3:
-                return self.pack_boolean(ele)
-            else:
-                raise ProtocolError("resp version2 doesn't support bool type")
-        elif isinstance(ele, (list, tuple)):
-            return self.pack_array(ele)
-        elif isinstance(ele, dict):
-            if self.config.resp_version == 3:
-                return self.pack_map(ele)
-            else:
-                raise ProtocolError("resp version2 doesn't support map type")
-        elif isinstance(ele, set):
-            if self.config.resp_version == 3:
-                return self.pack_set(ele)
-            else:
-                raise ProtocolError("resp version2 doesn't support set type")
-        elif ele is None:
-            return self.pack_null()
+        return self.encoder.encode(ele)
+
+    def writer(self, buffer: Optional[Union[bytearray, memoryview]] = None) -> "RespWriter":
+        """
+        a RespWriter sharing this connection's config and packers
+        :param buffer: reuse this bytearray or preallocated memoryview
+        :return:
+        """
+        from sioresp.writer import RespWriter
+
+        return RespWriter(self.config, buffer, self.encoder)
 
     def send_command(self, *cmd) -> bytes:
         if len(cmd) == 1:
             return self.pack_element(cmd[0])
         return self.pack_element(cmd)
 
+    @classmethod
+    def _pick_assemblers(cls) -> None:
+        # looked up per class, so a subclass overriding _next_array and the like is honoured
+        cls._assemblers = {flag: {type_: getattr(cls, name) for type_, name in names.items()}
+                           for flag, names in ASSEMBLERS.items()}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._pick_assemblers()
+
+
+Connection._pick_assemblers()
+
 
-if hiredis is not None:
-    class HiredisConnection(Connection):
-        def __init__(self, config: Config):
-            self.config = config
-            self.reader = hiredis.Reader(ProtocolError, ReplyError, notEnoughData=StopIteration)
+# optional engines and helpers, imported on first access
+_lazy = {
+    "HiredisConnection": "sioresp.hiredis_connection",
+    "OffloadConnection": "sioresp.offload",
+    "RespWriter": "sioresp.writer",
+    "Encoder": "sioresp.encoder",
+}
 
-        def feed_data(self, data: Union[bytes, bytearray]) -> None:
-            self.reader.feed(data)
 
-        def __next__(self):
-            data = self.reader.gets()
-            if data is StopIteration:
-                raise data
-            return data
+def __getattr__(name: str):
+    module = _lazy.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
 
-        def reset(self):
-            pass
+    try:
+        value = getattr(import_module(module), name)
+    except ImportError as e:
+        raise AttributeError(f"{name} is not available: {e}") from e
+    globals()[name] = value
+    return value
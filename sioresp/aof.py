@@ -0,0 +1,188 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Read append only files and captured RESP logs through mmap
+"""
+import mmap
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+
+from sioresp import Connection
+from sioresp.config import Config
+from sioresp.exceptions import ProtocolError
+from sioresp.framing import Framer, read_command
+
+Record = Tuple[int, Any]  # (offset, command)
+
+_INCOMPLETE = None  # what read_command and _read_other return for a truncated record
+
+
+class AofReader:
+    """
+    Frames commands in place. Commands (arrays of bulk strings) are yielded as lists of
+    memoryview slices of the mapping unless copy=True, anything else is decoded with a
+    Connection. ``#`` annotation lines between records are skipped. Iteration stops at a
+    truncated tail, ``position`` is where reading stopped, a malformed record raises ProtocolError.
+    close() unmaps the file right away once the yielded memoryviews are released, while
+    some are alive the mapping stays until the last of them is gone
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], config: Optional[Config] = None):
+        self.path = path
+        self.config = config or Config()
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.size:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._mm = b""  # mmap can't map empty files
+        self._view = memoryview(self._mm)
+        self.position = 0
+
+    def close(self) -> None:
+        self._view.release()
+        if isinstance(self._mm, mmap.mmap):
+            try:
+                self._mm.close()
+            except BufferError:  # views still exported, the mmap is unmapped when it's freed with them
+                pass
+            self._mm = b""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self) -> Iterator[Record]:
+        return self.records()
+
+    def _read_other(self, pos: int) -> Optional[Tuple[int, Any]]:
+        framer = Framer(self.config)
+        end = framer.scan(self._mm, pos, self.size)
+        if not framer.complete:
+            return _INCOMPLETE
+        con = Connection(self.config)
+        con.feed_data(self._mm[pos:end])
+        return end, next(con)
+
+    def records(self, start: int = 0, stop: Optional[int] = None, copy: bool = False) -> Iterator[Record]:
+        """
+        :param start: must be a record boundary
+        :param stop: records starting at or after this offset are not yielded
+        :param copy: yield bytes instead of memoryview
+        :return:
+        """
+        mm = self._mm
+        size = self.size
+        if stop is None:
+            stop = size
+        if start == 0 and mm[:5] == b"REDIS":
+            raise ProtocolError("file starts with an RDB preamble, pass the offset of the AOF part as start")
+        pos = start
+        try:
+            while pos < stop:
+                if mm[pos] == 35:  # b"#" annotation line
+                    idx = mm.find(b"\r\n", pos, size)
+                    if idx == -1:
+                        break
+                    pos = idx + 2
+                    continue
+                if mm[pos] == 42:  # b"*"
+                    ret = read_command(mm, pos, size, None if copy else self._view)
+                    if ret is not _INCOMPLETE and ret[1] is None:
+                        ret = self._read_other(pos)
+                else:
+                    ret = self._read_other(pos)
+                if ret is _INCOMPLETE:
+                    break  # truncated tail
+                end, command = ret
+                yield pos, command
+                pos = end
+        finally:
+            self.position = pos
+
+    def _is_boundary(self, pos: int, checks: int = 3) -> bool:
+        """
+        whether a message really starts at pos: the next few messages must frame cleanly
+        """
+        framer = Framer(self.config)
+        for _ in range(checks):
+            if pos == self.size:
+                return True
+            if self._mm[pos] != 42:  # b"*"
+                return False
+            try:
+                pos = framer.scan(self._mm, pos, self.size)
+            except ProtocolError:
+                return False
+            if not framer.complete:
+                return False
+        return True
+
+    def boundary_after(self, pos: int) -> int:
+        """
+        first verified record boundary at or after pos
+        :param pos:
+        :return:
+        """
+        if pos <= 0:
+            return 0
+        mm = self._mm
+        while True:
+            idx = mm.find(b"\r\n*", pos - 2, self.size)
+            if idx == -1:
+                return self.size
+            pos = idx + 2
+            if self._is_boundary(pos):
+                return pos
+            pos += 1
+
+    def parallel_map(self, func: Callable[[Iterator[Record]], Any], workers: Optional[int] = None,
+                     executor: Optional[Executor] = None) -> List[Any]:
+        """
+        split the file at verified boundaries and run func over each part's records in
+        worker processes. func must be picklable, the results come back in file order.
+        A split that turns out not to be on the real record stream (a payload that looks
+        like a command) is detected and that part is read again from the right offset
+        :param func: called with an iterator of (offset, command) in bytes
+        :param workers:
+        :param executor:
+        :return:
+        """
+        workers = workers or os.cpu_count() or 1
+        bounds = sorted({0, self.size, *(self.boundary_after(self.size * i // workers) for i in range(1, workers))})
+        own = executor is None
+        if own:
+            executor = ProcessPoolExecutor(workers)
+        try:
+            futures = [executor.submit(_map_part, self.path, self.config, start, stop, func)
+                       for start, stop in zip(bounds, bounds[1:])]
+            results = []
+            expected = 0
+            for i, future in enumerate(futures):
+                if bounds[i] == expected:
+                    result, expected = future.result()
+                else:  # wrong split, whatever that part did is thrown away
+                    future.cancel()
+                    result, expected = executor.submit(_map_part, self.path, self.config, expected,
+                                                       bounds[i + 1], func).result()
+                results.append(result)
+            return results
+        finally:
+            if own:
+                executor.shutdown()
+
+
+def _map_part(path, config: Config, start: int, stop: int,
+              func: Callable[[Iterator[Record]], Any]) -> Tuple[Any, int]:
+    reader = AofReader(path, config)
+    records = reader.records(start, stop, copy=True)
+    result = func(records)
+    for _ in records:  # func may stop early, the end offset is still needed
+        pass
+    end = reader.position
+    reader.close()
+    return result, end
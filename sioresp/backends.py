@@ -0,0 +1,97 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Registry of parser engines. Nothing optional is imported until an engine is asked for.
+The engine used by default is the first available one in preference order, unless
+set_default() or the SIORESP_ENGINE environment variable picks another.
+"""
+import os
+from importlib import import_module
+from typing import Dict, List, Optional, Tuple
+
+_engines = {
+    "hiredis": ("sioresp.hiredis_connection", "HiredisConnection"),
+    "python": ("sioresp", "Connection"),
+}  # type: Dict[str, Tuple[str, str]]  # preference order
+_loaded = {}  # type: Dict[str, type]
+_default = None  # type: Optional[str]
+
+
+def register(name: str, module: str, attr: str, prefer: bool = False) -> None:
+    """
+    add an engine, its module is imported on first use
+    :param name:
+    :param module:
+    :param attr: the Connection compatible class in module
+    :param prefer: try it before the builtin ones
+    :return:
+    """
+    global _engines
+    _loaded.pop(name, None)
+    if prefer:
+        _engines = {name: (module, attr), **{k: v for k, v in _engines.items() if k != name}}
+    else:
+        _engines[name] = (module, attr)
+
+
+def load(name: str) -> type:
+    """
+    :param name:
+    :return: the engine's connection class
+    :raise ImportError: the engine is unknown or its dependency is missing
+    """
+    if name in _loaded:
+        return _loaded[name]
+    if name not in _engines:
+        raise ImportError(f"unknown engine {name!r}, choose from {list(_engines)}")
+    module, attr = _engines[name]
+    cls = getattr(import_module(module), attr)
+    _loaded[name] = cls
+    return cls
+
+
+def available() -> List[str]:
+    """
+    engines that can be loaded here, this imports them
+    :return:
+    """
+    ret = []
+    for name in _engines:
+        try:
+            load(name)
+        except ImportError:
+            continue
+        ret.append(name)
+    return ret
+
+
+def set_default(name: Optional[str]) -> None:
+    """
+    :param name: None goes back to automatic choosing
+    :return:
+    """
+    global _default
+    if name is not None:
+        load(name)
+    _default = name
+
+
+def active() -> str:
+    """
+    name of the engine get_connection_class() returns
+    :return:
+    """
+    name = _default or os.environ.get("SIORESP_ENGINE")
+    if name:
+        return name
+    for name in _engines:
+        try:
+            load(name)
+        except ImportError:
+            continue
+        return name
+    raise ImportError("no parser engine available")
+
+
+def get_connection_class(name: Optional[str] = None) -> type:
+    return load(name or active())
@@ -0,0 +1,168 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+DataLoader style coalescing of reads issued in the same event loop tick
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sioresp.events import ReplyError
+from sioresp.exceptions import ProtocolError
+
+Execute = Callable[[List[Tuple]], Awaitable[Sequence[Any]]]
+
+
+class Batcher:
+    """
+    Collects GET / HGET / EXISTS and other calls made in one loop iteration and sends
+    them as one pipeline through ``execute``: GETs become one MGET, HGETs on the same hash
+    one HMGET, the rest are pipelined. Identical reads already waiting or in flight share
+    one reply (single flight). ``execute`` takes a list of commands and returns their
+    replies in order, ReplyError included, eg. a pipeline over a Connection.
+    Note MGET answers nil where GET on a non string key would answer WRONGTYPE
+    """
+
+    def __init__(self, execute: Execute, max_batch: int = 1000, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._execute = execute
+        self.max_batch = max_batch  # flush right away once this many keys/commands are waiting
+        self._loop = loop
+        self._gets = {}  # type: Dict[Any, asyncio.Future]
+        self._hgets = {}  # type: Dict[Any, Dict[Any, asyncio.Future]]
+        self._calls = []  # type: List[Tuple[Tuple, asyncio.Future]]
+        self._waiting = 0
+        self._inflight = {}  # type: Dict[Tuple, asyncio.Future]  # single flight
+        self._handle = None  # type: Optional[asyncio.Handle]
+        self._tasks = set()
+
+    def _future(self) -> asyncio.Future:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop.create_future()
+
+    def _wait(self, fut: asyncio.Future) -> Awaitable:
+        # one caller giving up must not cancel the reply for the others
+        return asyncio.shield(fut)
+
+    def _queued(self) -> None:
+        self._waiting += 1
+        if self._waiting >= self.max_batch:
+            self.flush()
+        elif self._handle is None:
+            self._handle = self._loop.call_soon(self.flush)
+
+    def get(self, key) -> Awaitable:
+        command = ("GET", key)
+        fut = self._inflight.get(command)
+        if fut is None:
+            fut = self._inflight[command] = self._gets[key] = self._future()
+            self._queued()
+        return self._wait(fut)
+
+    def hget(self, key, field) -> Awaitable:
+        command = ("HGET", key, field)
+        fut = self._inflight.get(command)
+        if fut is None:
+            fut = self._inflight[command] = self._future()
+            self._hgets.setdefault(key, {})[field] = fut
+            self._queued()
+        return self._wait(fut)
+
+    def exists(self, key) -> Awaitable:
+        return self.call("EXISTS", key, single_flight=True)
+
+    def call(self, *command, single_flight: bool = False) -> Awaitable:
+        """
+        pipelined with the rest of the batch
+        :param command:
+        :param single_flight: share the reply with identical calls, only for reads
+        :return:
+        """
+        if single_flight:
+            fut = self._inflight.get(command)
+            if fut is not None:
+                return self._wait(fut)
+        fut = self._future()
+        if single_flight:
+            self._inflight[command] = fut
+        self._calls.append((command, fut))
+        self._queued()
+        return self._wait(fut)
+
+    def flush(self) -> None:
+        """
+        send everything waiting now instead of at the end of this loop iteration
+        :return:
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if not self._waiting:
+            return
+        commands = []
+        targets = []  # per command: (single flight keys, futures), futures is one future or a list for MGET/HMGET
+        if self._gets:
+            keys = list(self._gets)
+            futs = list(self._gets.values())
+            if len(keys) == 1:
+                commands.append(("GET", keys[0]))
+                targets.append(([("GET", keys[0])], futs[0]))
+            else:
+                commands.append(("MGET", *keys))
+                targets.append(([("GET", key) for key in keys], futs))
+        for key, fields in self._hgets.items():
+            names = list(fields)
+            futs = list(fields.values())
+            if len(names) == 1:
+                commands.append(("HGET", key, names[0]))
+                targets.append(([("HGET", key, names[0])], futs[0]))
+            else:
+                commands.append(("HMGET", key, *names))
+                targets.append(([("HGET", key, name) for name in names], futs))
+        for command, fut in self._calls:
+            commands.append(command)
+            targets.append(([command], fut))
+        self._gets = {}
+        self._hgets = {}
+        self._calls = []
+        self._waiting = 0
+        task = self._loop.create_task(self._run(commands, targets))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _fail(targets: List[Tuple[List[Tuple], Any]], exc: Exception) -> None:
+        for keys, futs in targets:
+            for fut in futs if isinstance(futs, list) else (futs,):
+                if not fut.done():
+                    fut.set_exception(exc)
+
+    async def _run(self, commands: List[Tuple], targets: List[Tuple[List[Tuple], Any]]) -> None:
+        try:
+            replies = await self._execute(commands)
+        except asyncio.CancelledError:
+            for keys, futs in targets:
+                for fut in futs if isinstance(futs, list) else (futs,):
+                    fut.cancel()
+            raise
+        except Exception as e:
+            self._fail(targets, e)
+        else:
+            if len(replies) != len(commands):
+                self._fail(targets, ProtocolError(f"{len(commands)} commands sent, {len(replies)} replies"))
+                return
+            for (keys, futs), reply in zip(targets, replies):
+                if not isinstance(futs, list):
+                    if not futs.done():
+                        futs.set_result(reply)
+                    continue
+                if not isinstance(reply, ReplyError) and (not isinstance(reply, (list, tuple)) or len(reply) != len(futs)):
+                    self._fail([(keys, futs)], ProtocolError(f"{len(futs)} values expected, got {reply!r}"))
+                    continue
+                for i, fut in enumerate(futs):
+                    if not fut.done():  # an error answers every key it stands for
+                        fut.set_result(reply if isinstance(reply, ReplyError) else reply[i])
+        finally:
+            for keys, futs in targets:
+                for key, fut in zip(keys, futs if isinstance(futs, list) else (futs,)):
+                    if self._inflight.get(key) is fut:
+                        del self._inflight[key]
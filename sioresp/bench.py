@@ -0,0 +1,265 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Load generator in the spirit of redis-benchmark, no redis needed:
+
+    python -m sioresp.bench -c 4 -P 16 -n 100000 --mix get=8,set=2 -d 64
+
+Starts a stub RESP server built on sioresp itself (a subprocess by default, so the CPU
+figures are the client's alone) and drives it through sioresp.client.Client with each
+engine. Latency is measured per pipeline round trip and counted for every request in it
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sioresp import Connection, Config, backends
+from sioresp.client import Address, Client
+
+COMMANDS = ("get", "set", "incr", "ping", "lrange")
+
+
+def _serve(sock: socket.socket, value_size: int) -> None:
+    con = Connection(Config())
+    writer = con.writer()
+    value = b"x" * value_size
+    counter = 0
+    with sock:
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            con.feed_data(data)
+            for command in con:
+                name = command[0].upper()
+                if name == b"GET":
+                    writer.write_bulk(value)
+                elif name == b"SET":
+                    writer.write_string(b"OK")
+                elif name == b"INCR":
+                    counter += 1
+                    writer.write_integer(counter)
+                elif name == b"PING":
+                    writer.write_string(b"PONG")
+                elif name == b"LRANGE":
+                    n = int(command[3]) - int(command[2]) + 1
+                    writer.write_array_header(n)
+                    for _ in range(n):
+                        writer.write_bulk(value)
+                else:
+                    writer.write_error(b"ERR unknown command " + name)
+            writer.flush_to(sock)
+
+
+def _accept_loop(listener: socket.socket, value_size: int) -> None:
+    while True:
+        try:
+            sock, _ = listener.accept()
+        except OSError:  # closed
+            return
+        if sock.family != socket.AF_UNIX:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        threading.Thread(target=_serve, args=(sock, value_size), daemon=True).start()
+
+
+def _listen(unix_path: Optional[str]) -> Tuple[socket.socket, Address]:
+    if unix_path:
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(unix_path)
+        address = unix_path
+    else:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        address = listener.getsockname()
+    listener.listen(128)
+    return listener, address
+
+
+def _server_process(pipe, value_size: int, unix_path: Optional[str]) -> None:
+    listener, address = _listen(unix_path)
+    pipe.send(address)
+    threading.Thread(target=_accept_loop, args=(listener, value_size), daemon=True).start()
+    pipe.recv()  # anything, or EOF, means stop
+    listener.close()
+
+
+class StubServer:
+    """
+    answers GET (a value of value_size bytes), SET, INCR, PING and LRANGE
+    """
+
+    def __init__(self, value_size: int = 3, mode: str = "process", unix_path: Optional[str] = None):
+        """
+        :param value_size:
+        :param mode: "process" or "thread"
+        :param unix_path: listen on a unix socket instead of 127.0.0.1
+        """
+        self.value_size = value_size
+        self.mode = mode
+        self.unix_path = unix_path
+        self.address = None  # type: Optional[Address]
+        self._listener = None  # type: Optional[socket.socket]
+        self._process = None
+        self._pipe = None
+
+    def start(self) -> Address:
+        if self.mode == "thread":
+            self._listener, self.address = _listen(self.unix_path)
+            threading.Thread(target=_accept_loop, args=(self._listener, self.value_size), daemon=True).start()
+        else:
+            self._pipe, child = multiprocessing.Pipe()
+            self._process = multiprocessing.Process(target=_server_process,
+                                                    args=(child, self.value_size, self.unix_path), daemon=True)
+            self._process.start()
+            child.close()
+            self.address = self._pipe.recv()
+        return self.address
+
+    def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.close()
+        if self._process is not None:
+            self._pipe.send(None)
+            self._process.join(5)
+            self._pipe.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """
+    :param mix: eg. "get=8,set=2"
+    :return: command name to weight
+    """
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip().lower()
+        if name not in COMMANDS:
+            raise ValueError(f"unknown command {name!r} in mix, choose from {COMMANDS}")
+        weights[name] = int(weight or 1)
+    return weights
+
+
+def make_commands(weights: Dict[str, int], count: int, value_size: int, keyspace: int,
+                  lrange_size: int, seed: int = 0) -> List[Tuple]:
+    rnd = random.Random(seed)
+    value = os.urandom(value_size)
+    names = rnd.choices(list(weights), list(weights.values()), k=count)
+    commands = []
+    for name in names:
+        key = b"key:%d" % rnd.randrange(keyspace)
+        if name == "get":
+            commands.append(("GET", key))
+        elif name == "set":
+            commands.append(("SET", key, value))
+        elif name == "incr":
+            commands.append(("INCR", b"counter"))
+        elif name == "ping":
+            commands.append(("PING",))
+        else:
+            commands.append(("LRANGE", key, 0, lrange_size - 1))
+    return commands
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run_engine(engine: str, address: Address, commands: Sequence[Tuple], clients: int, pipeline: int,
+               config: Config) -> Dict[str, float]:
+    """
+    :return: requests, seconds, rps, p50/p99/p999 in ms and cpu_us per request
+    """
+    cls = backends.load(engine)
+    per_client = [commands[i::clients] for i in range(clients)]
+    latencies = [[] for _ in range(clients)]  # type: List[List[float]]
+    errors = []
+
+    def work(i: int) -> None:
+        own = latencies[i]
+        try:
+            with Client(address, config, timeout=30, connection_class=cls) as client:
+                todo = per_client[i]
+                for pos in range(0, len(todo), pipeline):
+                    batch = todo[pos:pos + pipeline]
+                    begin = time.perf_counter()
+                    client.pipeline(batch)
+                    elapsed = time.perf_counter() - begin
+                    own.extend([elapsed] * len(batch))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(clients)]
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    if errors:
+        raise errors[0]
+    values = sorted(v for own in latencies for v in own)
+    n = len(values)
+    return {"requests": n, "seconds": wall, "rps": n / wall if wall else 0.0,
+            "p50": percentile(values, 0.5) * 1000, "p99": percentile(values, 0.99) * 1000,
+            "p999": percentile(values, 0.999) * 1000, "cpu_us": cpu / n * 1e6 if n else 0.0}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m sioresp.bench", description=__doc__.split("\n\n")[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--requests", type=int, default=100000)
+    parser.add_argument("-c", "--clients", type=int, default=4, help="connections, one thread each")
+    parser.add_argument("-P", "--pipeline", type=int, default=16)
+    parser.add_argument("-d", "--data-size", type=int, default=3, help="value size in bytes")
+    parser.add_argument("-r", "--keyspace", type=int, default=10000)
+    parser.add_argument("--mix", default="get=1,set=1", help=f"weights of {', '.join(COMMANDS)}")
+    parser.add_argument("--lrange-size", type=int, default=10)
+    parser.add_argument("--engines", help="comma separated, every available engine by default")
+    parser.add_argument("--validation", choices=("strict", "fast"), default="strict")
+    parser.add_argument("--server", choices=("process", "thread"), default="process",
+                        help="thread counts the server in the CPU figures")
+    parser.add_argument("--unix", action="store_true", help="unix socket instead of TCP")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    engines = args.engines.split(",") if args.engines else backends.available()
+    commands = make_commands(parse_mix(args.mix), args.requests, args.data_size, args.keyspace,
+                             args.lrange_size, args.seed)
+    config = Config(validation=args.validation)
+    with tempfile.TemporaryDirectory() as tmp:
+        unix_path = os.path.join(tmp, "bench.sock") if args.unix else None
+        with StubServer(args.data_size, args.server, unix_path) as server:
+            print(f"{args.requests} requests, {args.clients} clients, pipeline {args.pipeline}, "
+                  f"{args.data_size} byte values, mix {args.mix}, {args.server} server")
+            print(f"{'engine':<10}{'req/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'p999 ms':>10}{'cpu us/req':>12}")
+            for engine in engines:
+                stats = run_engine(engine, server.address, commands, args.clients, args.pipeline, config)
+                print(f"{engine:<10}{stats['rps']:>12.0f}{stats['p50']:>10.3f}{stats['p99']:>10.3f}"
+                      f"{stats['p999']:>10.3f}{stats['cpu_us']:>12.1f}")
+                sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
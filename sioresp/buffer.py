@@ -1,19 +1,87 @@
 from typing import Optional
 
 
-class Buffer(bytearray):
-    def readline(self) -> Optional["Buffer"]:
-        idx = self.find(b"\r\n")
+class Buffer:
+    """
+    data[start:end] is what hasn't been parsed yet, data[end:] is spare room kept between
+    reads so get_buffer can hand it out without allocating. Both indexes go back to 0 once
+    everything is consumed
+    """
+    __slots__ = ("data", "start", "end")
+
+    keep = 1 << 20  # spare room above this is given back when the buffer drains
+
+    def __init__(self, data=b""):
+        self.data = bytearray(data)
+        self.start = 0
+        self.end = len(self.data)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __bool__(self) -> bool:
+        return self.end != self.start
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self.end - self.start)
+            return self.data[self.start + start:self.start + stop:step]
+        if item < 0:
+            item += self.end - self.start
+        if not 0 <= item < self.end - self.start:
+            raise IndexError("buffer index out of range")
+        return self.data[self.start + item]
+
+    def find(self, sub, start: int = 0, end: Optional[int] = None) -> int:
+        idx = self.data.find(sub, self.start + start, self.end if end is None else self.start + end)
+        return idx if idx == -1 else idx - self.start
+
+    def readline(self, skip: int = 0) -> Optional[bytearray]:
+        """
+        :param skip: bytes at the beginning of the line left out of the result
+        :return: the line without \\r\\n, None when it isn't complete
+        """
+        idx = self.data.find(b"\r\n", self.start, self.end)
         if idx == -1:
             return None
-        ret = self[:idx]
-        del self[: idx + 2]
-        return Buffer(ret)
+        ret = self.data[self.start + skip:idx]
+        self.skip(idx + 2 - self.start)
+        return ret
 
-    def read(self, nbytes: int) -> "Buffer":
-        ret = self[:nbytes]
-        del self[:nbytes]
-        return Buffer(ret)
+    def read(self, nbytes: int) -> bytearray:
+        ret = self.data[self.start:self.start + nbytes]
+        self.skip(nbytes)
+        return ret
 
     def skip(self, nbytes: int) -> None:
-        del self[:nbytes]
+        self.start += nbytes
+        if self.start >= self.end:
+            self.clear()
+
+    def clear(self) -> None:
+        self.start = self.end = 0
+        if len(self.data) > self.keep:
+            del self.data[self.keep:]
+
+    def reserve(self, nbytes: int) -> memoryview:
+        """
+        at least nbytes of room after the data, moved to the front or grown only when the
+        spare room is too small. Must be released before the buffer is touched again
+        """
+        if len(self.data) - self.end < nbytes:
+            size = self.end - self.start
+            if self.start:
+                self.data[:size] = self.data[self.start:self.end]
+                self.start, self.end = 0, size
+            if len(self.data) - size < nbytes:
+                self.data.extend(bytes(max(nbytes - (len(self.data) - size), len(self.data))))
+        return memoryview(self.data)[self.end:self.end + nbytes]
+
+    def written(self, nbytes: int) -> None:
+        self.end += nbytes
+
+    def extend(self, data) -> None:
+        n = len(data)
+        with self.reserve(n) as view:
+            view[:] = data
+        self.end += n
@@ -0,0 +1,170 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+MSET / HSET / ZADD with many items, encoded into one bytearray sized exactly beforehand.
+Above Config.bulk_max_args arguments the items are split into several commands, pipelined
+in the same buffer; each function returns (data, commands) so the caller knows how many
+replies to read
+"""
+from collections import Counter
+from typing import Any, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from sioresp.codecs import Value, encode_value, escape
+from sioresp.config import Config
+from sioresp.exceptions import ProtocolError
+
+Items = Union[Mapping, Tuple[Sequence, Sequence]]  # a mapping, or (keys, values) of the same length
+
+
+def _column(config: Config, values: Any) -> List[bytes]:
+    """
+    every element as the bytes redis expects in a command
+    """
+    if hasattr(values, "tolist"):  # numpy arrays, without importing numpy
+        values = values.tolist()
+    elif not isinstance(values, (list, tuple)):
+        values = list(values)
+    encoding = config.encoding
+    errors = config.errors
+    kinds = set(map(type, values))
+    if len(kinds) == 1:  # the usual case, one comprehension instead of the dispatch below
+        kind = kinds.pop()
+        if kind is bytes:
+            return _escape(config, list(values))
+        if kind is str:
+            return _escape(config, [value.encode(encoding, errors) for value in values])
+        if kind is int:
+            return [b"%d" % value for value in values]
+        if kind is float:
+            return [repr(value).encode() for value in values]
+    ret = []
+    append = ret.append
+    for value in values:
+        cls = type(value)
+        if cls is bytes:
+            append(escape(config, value) + value)
+        elif cls is str:
+            value = value.encode(encoding, errors)
+            append(escape(config, value) + value)
+        elif cls is int:
+            append(b"%d" % value)
+        elif cls is float:
+            append(repr(value).encode())
+        elif isinstance(value, (bytearray, memoryview)):
+            append(escape(config, value) + bytes(value))
+        elif isinstance(value, Value):
+            tag, data = encode_value(config, value.value)
+            append(tag + data)
+        elif isinstance(value, bool):
+            raise ProtocolError("can't pack bool as a bulk string")
+        elif isinstance(value, int):
+            append(b"%d" % value)
+        elif isinstance(value, float):
+            append(repr(value).encode())
+        else:
+            raise ProtocolError(f"can't pack type {type(value).__name__} as a bulk string")
+    return ret
+
+
+def _escape(config: Config, column: List[bytes]) -> List[bytes]:
+    # like write_bulk, plain bytes that look coded get an empty tag
+    if config.value_codecs:
+        return [escape(config, value) + value for value in column]
+    return column
+
+
+def _split(config: Config, items: Items) -> Tuple[List[bytes], List[bytes]]:
+    if isinstance(items, Mapping):
+        return _column(config, items.keys()), _column(config, items.values())
+    first, second = items
+    first, second = _column(config, first), _column(config, second)
+    if len(first) != len(second):
+        raise ValueError(f"{len(first)} keys but {len(second)} values")
+    return first, second
+
+
+def _encode(config: Config, head_args: Sequence[bytes], first: List[bytes], second: List[bytes]) -> Tuple[bytearray, int]:
+    """
+    head + first[i] + second[i] for every i, chunked by bulk_max_args
+    """
+    count = len(first)
+    limit = config.bulk_max_args
+    per_command = count
+    if limit:
+        per_command = (limit - len(head_args)) // 2
+        if per_command < 1:
+            raise ValueError(f"bulk_max_args {limit} leaves no room for a pair after {len(head_args)} arguments")
+    head = b"".join([b"$%d\r\n%s\r\n" % (len(arg), arg) for arg in head_args])
+    commands = -(-count // per_command)
+    full_header = b"*%d\r\n%s" % (len(head_args) + 2 * per_command, head)
+    last_header = b"*%d\r\n%s" % (len(head_args) + 2 * (count - (commands - 1) * per_command), head)
+    # the exact size first: b"$" length b"\r\n" value b"\r\n" for every element
+    size = len(full_header) * (commands - 1) + len(last_header)
+    for column in (first, second):
+        lengths = Counter(map(len, column))  # few distinct lengths, their digits are counted once
+        size += sum([(n + len(str(n)) + 5) * times for n, times in lengths.items()])
+    out = bytearray(size)
+    pos = 0
+    for start in range(0, count, per_command):
+        stop = min(start + per_command, count)
+        header = full_header if stop < count else last_header
+        end = pos + len(header)
+        out[pos:end] = header
+        pos = end
+        # one command's pairs at a time, bulk_max_args bounds what is held besides out
+        chunk = b"".join([b"$%d\r\n%s\r\n$%d\r\n%s\r\n" % (len(a), a, len(b), b)
+                          for a, b in zip(first[start:stop], second[start:stop])])
+        end = pos + len(chunk)
+        out[pos:end] = chunk
+        pos = end
+    return out, commands
+
+
+def _head(config: Config, *args) -> List[bytes]:
+    return _column(config, args)
+
+
+def mset(config: Config, items: Items) -> Tuple[bytearray, int]:
+    """
+    chunks are separate MSET commands, the whole is no longer atomic
+    :param config:
+    :param items: {key: value} or (keys, values)
+    :return: (data, commands)
+    """
+    first, second = _split(config, items)
+    if not first:
+        raise ValueError("MSET needs at least one key")
+    return _encode(config, _head(config, "MSET"), first, second)
+
+
+def hset(config: Config, key: Any, items: Items) -> Tuple[bytearray, int]:
+    """
+    :param config:
+    :param key:
+    :param items: {field: value} or (fields, values)
+    :return: (data, commands)
+    """
+    first, second = _split(config, items)
+    if not first:
+        raise ValueError("HSET needs at least one field")
+    return _encode(config, _head(config, "HSET", key), first, second)
+
+
+def zadd(config: Config, key: Any, members: Union[Mapping, Iterable], scores: Optional[Iterable] = None,
+         options: Sequence = ()) -> Tuple[bytearray, int]:
+    """
+    :param config:
+    :param key:
+    :param members: {member: score}, or members with their scores in ``scores``; numpy arrays work
+    :param scores:
+    :param options: eg. ("NX",) or ("GT", "CH"), repeated in every chunk
+    :return: (data, commands)
+    """
+    if scores is None:
+        if not isinstance(members, Mapping):
+            raise ValueError("scores are needed unless members is a mapping")
+        scores, members = members.values(), members.keys()
+    second, first = _split(config, (members, scores))
+    if not first:
+        raise ValueError("ZADD needs at least one member")
+    return _encode(config, _head(config, "ZADD", key, *options), first, second)
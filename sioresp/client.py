@@ -0,0 +1,244 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Blocking client for threads and other non async code, over TCP or a unix socket
+"""
+import os
+import socket
+import weakref
+from itertools import chain
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+from sioresp.codecs import escape
+from sioresp.config import Config
+from sioresp.exceptions import CommunicationError
+from sioresp.writer import RespWriter
+
+Address = Union[Tuple[str, int], str]  # (host, port) or a unix socket path
+
+IOV_MAX = 1024  # most platforms accept at least this many buffers per sendmsg
+
+
+class Client:
+    """
+    Replies are received straight into the parser's buffer with recv_into, commands go out
+    with sendmsg: small parts are packed together, bulk arguments of ``sendmsg_threshold``
+    bytes or more are handed to the kernel as they are, without being copied.
+    ReplyError is returned in place of the reply, like every other reply.
+    After a read timeout the replies still owed are discarded so the client stays usable,
+    any other failure closes the socket.
+    A forked child forgets the socket it inherited and connects again on first use
+    """
+
+    def __init__(self, address: Optional[Address], config: Optional[Config] = None, timeout: Optional[float] = None,
+                 connect_timeout: Optional[float] = None, connection_class: Optional[type] = None,
+                 recv_size: int = 65536, sendmsg_threshold: int = 16384):
+        """
+        :param address: None for a socket given to from_socket that can't be connected again
+        :param config:
+        :param timeout: seconds for each send and recv, None blocks forever
+        :param connect_timeout: defaults to timeout
+        :param connection_class: sioresp.backends.get_connection_class() by default
+        :param recv_size: room asked from the parser for each recv_into
+        :param sendmsg_threshold:
+        """
+        if connection_class is None:
+            from sioresp.backends import get_connection_class
+
+            connection_class = get_connection_class()
+        self.address = address
+        self.config = config or Config()
+        self.timeout = timeout
+        self.connect_timeout = timeout if connect_timeout is None else connect_timeout
+        self.recv_size = recv_size
+        self.sendmsg_threshold = sendmsg_threshold
+        self.connection = connection_class(self.config)
+        self._writer = RespWriter(self.config, encoder=self.connection.encoder)
+        self._sock = None  # type: Optional[socket.socket]
+        _clients.add(self)
+
+    @classmethod
+    def from_socket(cls, sock: socket.socket, config: Optional[Config] = None, **kwargs) -> "Client":
+        """
+        wrap an already connected socket, eg. one end of socket.socketpair(). Unnamed unix
+        sockets like those have no address, the client can't connect again once it drops them
+        :param sock:
+        :param config:
+        :param kwargs:
+        :return:
+        """
+        client = cls(sock.getpeername() or None, config, **kwargs)
+        sock.settimeout(client.timeout)
+        client._sock = sock
+        return client
+
+    def connect(self) -> None:
+        if self._sock is not None:
+            return
+        if self.address is None:
+            raise CommunicationError("socket has no address to reconnect to")
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.settimeout(self.connect_timeout)
+                sock.connect(self.address)
+            except BaseException:
+                sock.close()
+                raise
+        else:
+            sock = socket.create_connection(self.address, self.connect_timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        self.connection.reset()
+        self._sock = sock
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _after_fork(self) -> None:
+        """
+        in the child: the socket is the parent's too, close only this process's descriptor
+        (no shutdown, the parent keeps using it) and drop whatever was read or queued
+        """
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+        self.connection.reset()
+        self._writer.clear()
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def execute(self, *args) -> Any:
+        """
+        send one command and wait for its reply
+        :param args:
+        :return:
+        """
+        return self.pipeline((args,))[0]
+
+    def pipeline(self, commands: Sequence[Sequence]) -> List[Any]:
+        """
+        send all commands at once and read their replies in order
+        :param commands:
+        :return:
+        """
+        self.send(commands)
+        return self._read(len(commands))
+
+    def send(self, commands: Sequence[Sequence]) -> None:
+        """
+        send commands without waiting for their replies, read them later with receive
+        and the connection, in order
+        :param commands:
+        :return:
+        """
+        self.connect()
+        try:
+            self._send(self._pack(commands))
+        except BaseException:  # a command may be half written, the stream is lost
+            self.close()
+            raise
+
+    def _pack(self, commands: Sequence[Sequence]) -> list:
+        writer = self._writer
+        threshold = self.sendmsg_threshold
+        chunks = []
+        writer.clear()
+        for args in commands:
+            writer.write_array_header(len(args))
+            for arg in args:
+                if isinstance(arg, (bytes, bytearray, memoryview)) and len(arg) >= threshold:
+                    arg = memoryview(arg).cast("B")
+                    tag = escape(self.config, arg)
+                    writer.write(b"$%d\r\n" % (len(tag) + len(arg)))
+                    writer.write(tag)
+                    chunks.append(writer.getvalue())
+                    chunks.append(arg)
+                    writer.clear()
+                    writer.write(b"\r\n")
+                else:
+                    writer.write_bulk(arg)
+        chunks.append(writer.getbuffer())
+        return chunks
+
+    def _send(self, chunks: list) -> None:
+        sock = self._sock
+        views = [memoryview(chunk) for chunk in chunks]
+        try:
+            if not hasattr(sock, "sendmsg"):  # windows
+                sock.sendall(b"".join(views))
+                return
+            i = 0
+            while i < len(views):
+                sent = sock.sendmsg(views[i:i + IOV_MAX])
+                while sent:  # drop what went out, keep the rest of a partly sent buffer
+                    n = len(views[i])
+                    if sent < n:
+                        views[i] = views[i][sent:]
+                        break
+                    sent -= n
+                    i += 1
+                while i < len(views) and not len(views[i]):
+                    i += 1
+        finally:
+            for view in chain(views, chunks):
+                if isinstance(view, memoryview):
+                    view.release()
+
+    def receive(self) -> None:
+        """
+        one recv_into the parser's buffer, then the replies are taken from the connection
+        """
+        con = self.connection
+        view = con.get_buffer(self.recv_size)
+        try:
+            n = self._sock.recv_into(view)
+        except BaseException:
+            view.release()
+            con.buffer_updated(0)
+            raise
+        view.release()
+        con.buffer_updated(n)
+        if not n:
+            raise CommunicationError("connection closed by server")
+
+    def _read(self, count: int) -> List[Any]:
+        con = self.connection
+        replies = []
+        try:
+            while len(replies) < count:
+                for reply in con:
+                    replies.append(reply)
+                    if len(replies) == count:
+                        break
+                else:
+                    self.receive()
+        except socket.timeout:
+            con.discard(count - len(replies))  # late replies are framed and dropped when they arrive
+            raise
+        except BaseException:
+            self.close()
+            raise
+        return replies
+
+
+_clients = weakref.WeakSet()  # type: weakref.WeakSet
+
+
+def _after_fork_in_child() -> None:
+    for client in list(_clients):
+        client._after_fork()
+
+
+if hasattr(os, "register_at_fork"):  # not on windows
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,205 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Value codecs: serializers and compressors applied to marked values on the way out
+and to every tagged bulk string on the way back.
+
+A coded value is MAGIC + count + codec ids + payload. Values below
+Config.value_codec_threshold skip the compressors, and plain bytes that went through
+no codec at all are sent untouched unless they happen to start with MAGIC, then they get
+an empty tag. That goes for every bulk argument, not only Value, whenever value_codecs is set.
+Replies are decoded with the codecs of the Config only.
+"""
+from typing import Any, Callable, Dict, Tuple
+
+from sioresp.config import Config, Value  # Value is defined with Config, packing it needs no codec
+from sioresp.exceptions import ProtocolError
+
+MAGIC = b"\x1fR"
+EMPTY_TAG = MAGIC + b"\x00"  # no codec applied
+
+
+class Codec:
+    __slots__ = ("id", "name", "encode", "decode", "serializer")
+
+    def __init__(self, id: int, name: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any],
+                 serializer: bool = False):
+        self.id = id
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+        self.serializer = serializer  # serializers always run, compressors only above the threshold
+
+
+_by_name = {}  # type: Dict[str, Codec]
+_by_id = {}  # type: Dict[int, Codec]
+
+
+def register_codec(codec: Codec) -> None:
+    if not 0 < codec.id < 256:
+        raise ValueError("codec id must fit in one byte and not be 0")
+    _by_name[codec.name] = codec
+    _by_id[codec.id] = codec
+
+
+def unregister_codec(name: str) -> None:
+    codec = _by_name.pop(name, None)
+    if codec is not None and _by_id.get(codec.id) is codec:
+        del _by_id[codec.id]
+
+
+def get_codec(name: str) -> Codec:
+    try:
+        return _by_name[name]
+    except KeyError:
+        raise ValueError(f"unknown codec {name!r}, choose from {list(_by_name)}") from None
+
+
+def encode_value(config: Config, value: Any) -> Tuple[bytes, bytes]:
+    """
+    :param config:
+    :param value:
+    :return: (tag, payload), tag is b"" when nothing was applied
+    """
+    ids = []
+    for name in config.value_codecs:
+        codec = get_codec(name)
+        if not codec.serializer:
+            if isinstance(value, str):
+                value = value.encode(config.encoding, config.errors)
+            elif not isinstance(value, (bytes, bytearray, memoryview)):
+                break
+            if len(value) < config.value_codec_threshold:
+                continue
+        value = codec.encode(value)
+        ids.append(codec.id)
+    if isinstance(value, str):
+        value = value.encode(config.encoding, config.errors)
+    elif not isinstance(value, (bytes, bytearray, memoryview)):
+        raise ProtocolError(f"can't pack type {type(value).__name__} without a serializer in value_codecs")
+    if not ids:
+        return escape(config, value), value
+    return MAGIC + bytes((len(ids), *ids)), value
+
+
+def escape(config: Config, data) -> bytes:
+    """
+    the tag for plain bytes going out uncoded: when value_codecs is on and they start
+    with MAGIC they get an empty tag, so they are not taken for a coded value on the way back
+    :param config:
+    :param data: bytes-like
+    :return: b"" or MAGIC + b"\\x00"
+    """
+    if config.value_codecs and data[:2] == MAGIC:
+        return EMPTY_TAG
+    return b""
+
+
+def decode_value(config: Config, data) -> Any:
+    """
+    only the codecs in config.value_codecs are applied, a tag naming any other one is
+    refused, so a value tagged pickle is never unpickled unless pickle is enabled
+    :param config:
+    :param data: bytes-like that starts with MAGIC
+    :return:
+    :raise ProtocolError: truncated tag, codec not enabled or failing
+    """
+    if len(data) < 3 or len(data) < 3 + data[2]:
+        raise ProtocolError(f"truncated codec tag in {bytes(data[:8])!r}")
+    count = data[2]
+    payload = memoryview(data)[3 + count:]
+    value = payload
+    try:
+        for codec_id in reversed(data[3:3 + count]):
+            codec = _by_id.get(codec_id)
+            if codec is None or codec.name not in config.value_codecs:
+                raise ProtocolError(f"codec id {codec_id} is not in value_codecs")
+            try:
+                value = codec.decode(value)
+            except Exception as e:
+                raise ProtocolError(f"{codec.name} failed to decode a value: {e!r}") from e
+        return bytes(value) if value is payload else value
+    finally:
+        payload.release()
+
+
+def decode_string(config: Config, event) -> Any:
+    """
+    post processor for String replies while value_codecs is set
+    :param config:
+    :param event: a String event
+    :return:
+    """
+    if event.len is not None:
+        return None
+    if event.data.startswith(MAGIC):
+        return decode_value(config, event.data)
+    return bytes(event)
+
+
+def _zlib_encode(data):
+    import zlib
+
+    return zlib.compress(data)
+
+
+def _zlib_decode(data):
+    import zlib
+
+    return zlib.decompress(data)
+
+
+def _lzma_encode(data):
+    import lzma
+
+    return lzma.compress(data)
+
+
+def _lzma_decode(data):
+    import lzma
+
+    return lzma.decompress(data)
+
+
+def _bz2_encode(data):
+    import bz2
+
+    return bz2.compress(data)
+
+
+def _bz2_decode(data):
+    import bz2
+
+    return bz2.decompress(data)
+
+
+def _pickle_encode(obj):
+    import pickle
+
+    return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+
+def _pickle_decode(data):
+    # only for servers you trust, unpickling runs arbitrary code
+    import pickle
+
+    return pickle.loads(data)
+
+
+def _msgpack_encode(obj):
+    import msgpack
+
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def _msgpack_decode(data):
+    import msgpack
+
+    return msgpack.unpackb(data, raw=False)
+
+
+register_codec(Codec(1, "zlib", _zlib_encode, _zlib_decode))
+register_codec(Codec(2, "lzma", _lzma_encode, _lzma_decode))
+register_codec(Codec(3, "bz2", _bz2_encode, _bz2_decode))
+register_codec(Codec(16, "pickle", _pickle_encode, _pickle_decode, serializer=True))
+register_codec(Codec(17, "msgpack", _msgpack_encode, _msgpack_decode, serializer=True))
@@ -1,12 +1,114 @@
 """
 Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
 """
-from dataclasses import dataclass
+from typing import Any, Optional, Tuple
 
 
-@dataclass
+class _LazyFields:
+    """
+    __dataclass_fields__ of a class written without @dataclass, made by dataclasses on first
+    access. dataclasses.fields/replace/asdict and @dataclass subclasses work the same, and
+    importing sioresp doesn't pay for dataclasses and inspect
+    """
+
+    def __get__(self, instance, owner):
+        from dataclasses import dataclass
+
+        # the methods are written by hand, only the fields and params are added to owner
+        dataclass(init=False, repr=False, eq=False)(owner)
+        return owner.__dict__["__dataclass_fields__"]
+
+
+def lazy_dataclass(cls: type) -> type:
+    """
+    for classes with __init__, __repr__ and __eq__ over their annotated fields already written
+    :param cls:
+    :return:
+    """
+    cls.__dataclass_fields__ = _LazyFields()
+    return cls
+
+
+class Value:
+    """
+    marks a command argument to go through Config.value_codecs, eg.
+    con.send_command("SET", "key", Value({"a": 1})). Also importable from sioresp.codecs
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __repr__(self):
+        return f"Value({self.value!r})"
+
+
+@lazy_dataclass
 class Config:
+    """
+    a dataclass for dataclasses.fields/replace/asdict, the fields can be given by position
+    """
     encoding: str = "utf-8"
     errors: str = "strict"
     resp_version: int = 2
-    dict_for_map = False  # True if you want to use dict for map type instead of List[Tuple[K, V]]
+    dict_for_map: bool = False  # True if you want to use dict for map type instead of List[Tuple[K, V]]
+    # tuple for array/push, frozenset for set, tuple of pairs for map/attribute or a read only
+    # MappingProxyType with dict_for_map. Smaller and safe to share, the python engine only
+    immutable_containers: bool = False
+    intern_cache_size: int = 0  # > 0 to share the bytes objects of repeated map keys, bounded to this many
+    intern_max_length: int = 64  # longer keys are never interned
+    # names from sioresp.codecs applied in order to Value arguments, tagged replies are decoded in reverse
+    value_codecs: Tuple[str, ...] = ()
+    value_codec_threshold: int = 1024  # smaller values skip the compressors
+    # resp3 attributes are dropped while framing instead of being parsed into Connection.attributes
+    skip_attributes: bool = False
+    # "strict" checks every byte, with the offset in errors. "fast" is for trusted servers,
+    # it only checks what is needed to stay in sync: start bytes are looked at once the line is
+    # complete, null and bool payloads are not checked
+    validation: str = "strict"
+    # limits, None means unlimited. LimitExceededError is raised when they are broken
+    # unparsed bytes buffered at once besides the body of the bulk string being read, checked
+    # before anything is buffered: larger feed_data is parsed piecewise, get_buffer gives less room
+    max_buffer_size: Optional[int] = None
+    max_bulk_length: Optional[int] = 512 * 1024 * 1024  # same as redis proto-max-bulk-len
+    max_aggregate_length: Optional[int] = None  # element count of array/map/set/attribute/push
+    max_nesting_depth: Optional[int] = None
+    # sioresp.bulk splits MSET/HSET/ZADD with more arguments than this, the command name and
+    # key included, into several commands, None keeps one command however large
+    bulk_max_args: Optional[int] = 10000
+    # backpressure for Connection.should_pause_reading, None means never pause
+    read_high_water: Optional[int] = None
+    read_low_water: Optional[int] = None  # default to read_high_water // 4
+
+    _fields = tuple(__annotations__)
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(self._fields):
+            raise TypeError(f"Config takes at most {len(self._fields)} positional arguments, got {len(args)}")
+        for name, value in zip(self._fields, args):
+            if name in kwargs:
+                raise TypeError(f"Config got multiple values for argument {name!r}")
+            setattr(self, name, value)
+        for name, value in kwargs.items():
+            if name not in self._fields:
+                raise TypeError(f"Config got an unexpected keyword argument {name!r}")
+            setattr(self, name, value)
+
+    def __repr__(self):
+        args = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{self.__class__.__qualname__}({args})"
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self._fields)
+
+    def replace(self, **changes) -> "Config":
+        """
+        a copy with some fields changed, same as dataclasses.replace
+        :param changes:
+        :return:
+        """
+        from dataclasses import replace
+
+        return replace(self, **changes)
@@ -0,0 +1,334 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Differential test of the parser engines on split input:
+
+    python -m sioresp.difftest --replies 40 --resp 2,3 --seed 0
+
+Generates a random reply stream, parses it whole with Connection as the reference, then
+feeds it to every engine in chunks of every size from 1 byte to the whole stream, through
+feed_data and through get_buffer / buffer_updated, and checks the replies are the same.
+Prints parse throughput for each chunk size
+"""
+import argparse
+import random
+import sys
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from sioresp import Connection, Config, backends
+from sioresp.events import ReplyError
+
+Engines = Dict[str, Tuple[type, Config]]  # label -> (connection class, config)
+
+MODES = ("feed", "buffer")
+
+
+class Mismatch(AssertionError):
+    def __init__(self, engine: str, mode: str, split: int, index: int, expected: Any, got: Any):
+        super().__init__(f"{engine} ({mode}, chunks of {split}) reply {index}: expected {expected!r}, got {got!r}")
+        self.engine = engine
+        self.mode = mode
+        self.split = split
+        self.index = index
+        self.expected = expected
+        self.got = got
+
+
+class _Generator:
+    def __init__(self, rnd: random.Random, resp_version: int, max_depth: int, max_length: int, max_bulk: int,
+                 attributes: bool):
+        self.rnd = rnd
+        self.resp3 = resp_version == 3
+        self.max_depth = max_depth
+        self.max_length = max_length
+        self.max_bulk = max_bulk
+        self.attributes = attributes
+        self.unique = 0  # set members and map keys must not collide
+        self.out = bytearray()
+
+    def blob(self, n: Optional[int] = None) -> bytes:
+        if n is None:
+            n = self.rnd.randint(0, self.max_bulk)
+        return bytes(self.rnd.choice(b"ab\r\n\x00\xff01 ") for _ in range(n))
+
+    def line(self) -> bytes:
+        return bytes(self.rnd.choice(b"abcxyz019 -+:") for _ in range(self.rnd.randint(0, 12)))
+
+    def key(self) -> None:
+        self.unique += 1
+        if self.rnd.random() < 0.5:
+            self.out += b"+k%d\r\n" % self.unique
+        else:
+            body = b"%d:" % self.unique + self.blob(self.rnd.randint(0, 8))
+            self.out += b"$%d\r\n%s\r\n" % (len(body), body)
+
+    def scalar(self) -> None:
+        rnd = self.rnd
+        out = self.out
+        kinds = ["simple", "error", "int", "bulk", "bulk", "null_bulk"]
+        if self.resp3:
+            kinds += ["null", "bool", "double", "big", "verbatim", "blob_error"]
+        kind = rnd.choice(kinds)
+        if kind == "simple":
+            out += b"+%s\r\n" % self.line()
+        elif kind == "error":
+            out += b"-ERR %s\r\n" % self.line()
+        elif kind == "int":
+            out += b":%d\r\n" % rnd.choice((0, -1, rnd.randint(-2 ** 63, 2 ** 63 - 1), rnd.randint(-1000, 1000)))
+        elif kind == "bulk":
+            body = self.blob()
+            out += b"$%d\r\n%s\r\n" % (len(body), body)
+        elif kind == "null_bulk":
+            out += b"$-1\r\n"
+        elif kind == "null":
+            out += b"_\r\n"
+        elif kind == "bool":
+            out += b"#t\r\n" if rnd.random() < 0.5 else b"#f\r\n"
+        elif kind == "double":
+            value = rnd.choice((rnd.uniform(-1e6, 1e6), rnd.random() * 10 ** rnd.randint(-300, 300), 0.0))
+            out += b",%s\r\n" % rnd.choice((repr(value).encode(), b"inf", b"-inf", b"%d" % int(value)))
+        elif kind == "big":
+            out += b"(%d\r\n" % rnd.randint(-10 ** 40, 10 ** 40)
+        elif kind == "verbatim":
+            body = b"txt:" + self.blob()
+            out += b"=%d\r\n%s\r\n" % (len(body), body)
+        else:
+            body = b"ERR " + self.blob()
+            out += b"!%d\r\n%s\r\n" % (len(body), body)
+
+    def value(self, depth: int) -> None:
+        rnd = self.rnd
+        out = self.out
+        if self.attributes and rnd.random() < 0.05:
+            n = rnd.randint(1, 2)
+            out += b"|%d\r\n" % n
+            for _ in range(n):
+                self.key()
+                self.scalar()
+        if depth >= self.max_depth or rnd.random() < 0.6:
+            self.scalar()
+            return
+        kinds = ["array", "array", "null_array"]
+        if self.resp3:
+            kinds += ["map", "set"]
+        kind = rnd.choice(kinds)
+        n = rnd.randint(0, self.max_length)
+        if kind == "null_array":
+            out += b"*-1\r\n"
+        elif kind == "array":
+            out += b"*%d\r\n" % n
+            for _ in range(n):
+                self.value(depth + 1)
+        elif kind == "map":
+            out += b"%%%d\r\n" % n
+            for _ in range(n):
+                self.key()
+                self.value(depth + 1)
+        else:
+            out += b"~%d\r\n" % n
+            for _ in range(n):
+                self.key()
+
+    def reply(self) -> None:
+        if self.resp3 and self.rnd.random() < 0.05:
+            n = self.rnd.randint(1, self.max_length)
+            self.out += b">%d\r\n" % n
+            for _ in range(n):
+                self.value(1)
+        else:
+            self.value(0)
+
+
+def make_corpus(resp_version: int = 3, replies: int = 100, seed: Optional[int] = None, max_depth: int = 3,
+                max_length: int = 6, max_bulk: int = 48, attributes: bool = False) -> bytes:
+    """
+    a random stream of complete replies, with every type of the protocol version,
+    nulls, empty and nested aggregates and bulk strings containing CRLF
+    :param resp_version: 2 or 3
+    :param replies:
+    :param seed:
+    :param max_depth: aggregate nesting
+    :param max_length: elements per aggregate
+    :param max_bulk: bytes per bulk string
+    :param attributes: put resp3 attributes before some values, they are not compared
+    :return:
+    """
+    gen = _Generator(random.Random(seed), resp_version, max_depth, max_length, max_bulk, attributes)
+    for _ in range(replies):
+        gen.reply()
+    return bytes(gen.out)
+
+
+def normalize(reply: Any) -> Any:
+    """
+    a form every engine agrees on: lists for arrays, pairs and push, sorted lists for sets,
+    ("error", message), ("float", repr) so nan equals itself and ("bool", value) so True isn't 1
+    """
+    if isinstance(reply, (bytes, bytearray, memoryview)):
+        return bytes(reply)
+    if isinstance(reply, str):
+        return reply.encode()
+    if isinstance(reply, bool):
+        return "bool", reply
+    if isinstance(reply, float):
+        return "float", repr(reply)
+    if isinstance(reply, (ReplyError, Exception)):
+        data = getattr(reply, "data", None)
+        if data is None:
+            data = str(reply)
+        return "error", data.encode() if isinstance(data, str) else bytes(data)
+    if isinstance(reply, (list, tuple)):
+        return [normalize(item) for item in reply]
+    if isinstance(reply, (set, frozenset)):
+        return sorted((normalize(item) for item in reply), key=repr)
+    if isinstance(reply, Mapping):
+        return [[normalize(k), normalize(v)] for k, v in reply.items()]
+    return reply
+
+
+def engines(names: Optional[Sequence[str]] = None, resp_version: int = 3) -> Engines:
+    """
+    every available engine, the python one also with validation="fast"
+    :param names: engine names, backends.available() by default
+    :param resp_version:
+    :return:
+    """
+    ret = {}  # type: Engines
+    for name in names or backends.available():
+        ret[name] = (backends.load(name), Config(resp_version=resp_version))
+        if name == "python":
+            ret["python-fast"] = (Connection, Config(resp_version=resp_version, validation="fast"))
+    return ret
+
+
+def parse(cls: type, config: Config, data: bytes, split: int, mode: str = "feed") -> Tuple[List, float]:
+    """
+    :param cls:
+    :param config:
+    :param data:
+    :param split: chunk size
+    :param mode: "feed" for feed_data, "buffer" for get_buffer / buffer_updated
+    :return: the replies and the seconds spent
+    """
+    con = cls(config)
+    replies = []
+    append = replies.append
+    view = memoryview(data)
+    start = time.perf_counter()
+    for pos in range(0, len(data), split):
+        chunk = view[pos:pos + split]
+        if mode == "feed":
+            con.feed_data(chunk)
+        else:
+            buf = con.get_buffer(len(chunk))
+            buf[:len(chunk)] = chunk
+            buf.release()
+            con.buffer_updated(len(chunk))
+        for reply in con:
+            append(reply)
+    elapsed = time.perf_counter() - start
+    view.release()
+    return replies, elapsed
+
+
+def reference(data: bytes, resp_version: int = 3) -> List:
+    replies, _ = parse(Connection, Config(resp_version=resp_version), data, max(len(data), 1))
+    return [normalize(reply) for reply in replies]
+
+
+def check(data: bytes, expected: List, label: str, cls: type, config: Config, split: int,
+          mode: str = "feed") -> float:
+    """
+    :return: the seconds spent parsing
+    :raise Mismatch:
+    """
+    try:
+        replies, elapsed = parse(cls, config, data, split, mode)
+    except Exception as e:
+        raise Mismatch(label, mode, split, -1, None, e) from e
+    for i, (want, reply) in enumerate(zip(expected, replies)):
+        got = normalize(reply)
+        if got != want:
+            raise Mismatch(label, mode, split, i, want, got)
+    if len(replies) != len(expected):
+        raise Mismatch(label, mode, split, min(len(replies), len(expected)), f"{len(expected)} replies",
+                       f"{len(replies)} replies")
+    return elapsed
+
+
+def run(data: bytes, splits: Sequence[int], engines_: Engines, resp_version: int = 3,
+        modes: Sequence[str] = MODES, repeat: int = 1) -> Dict[str, Dict[int, float]]:
+    """
+    check every engine at every split size and mode
+    :param repeat: timed runs per split size, the fastest counts
+    :return: {engine: {split: bytes per second}}, from the feed_data runs when there are any
+    :raise Mismatch: on the first difference
+    """
+    expected = reference(data, resp_version)
+    timed = "feed" if "feed" in modes else modes[0]
+    throughput = {label: {} for label in engines_}  # type: Dict[str, Dict[int, float]]
+    for label, (cls, config) in engines_.items():
+        for split in splits:
+            for mode in modes:
+                elapsed = check(data, expected, label, cls, config, split, mode)
+                if mode == timed:
+                    for _ in range(repeat - 1):
+                        elapsed = min(elapsed, parse(cls, config, data, split, mode)[1])
+                    throughput[label][split] = len(data) / elapsed if elapsed else float("inf")
+    return throughput
+
+
+def parse_splits(splits: str, total: int) -> List[int]:
+    """
+    "all", or comma separated sizes, "max" for the whole stream
+    """
+    if splits == "all":
+        return list(range(1, total + 1))
+    ret = []
+    for part in splits.split(","):
+        part = part.strip()
+        ret.append(total if part == "max" else min(int(part), total))
+    return ret
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m sioresp.difftest", description=__doc__.split("\n\n")[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replies", type=int, default=40)
+    parser.add_argument("--resp", default="2,3", help="protocol versions of the corpora")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-depth", type=int, default=3)
+    parser.add_argument("--attributes", action="store_true", help="python engines only")
+    parser.add_argument("--splits", default="all", help='"all" or comma separated sizes, "max" is the whole stream')
+    parser.add_argument("--engines", help="comma separated, every available engine by default")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per split size, the fastest counts")
+    parser.add_argument("--rows", choices=("pow2", "all"), default="pow2",
+                        help="print every split size or only powers of two and the whole stream")
+    args = parser.parse_args(argv)
+
+    names = args.engines.split(",") if args.engines else None
+    failed = False
+    for version in (int(v) for v in args.resp.split(",")):
+        data = make_corpus(version, args.replies, args.seed, args.max_depth, attributes=args.attributes)
+        splits = parse_splits(args.splits, len(data))
+        engines_ = engines(names, version)
+        print(f"RESP{version}: {args.replies} replies, {len(data)} bytes, seed {args.seed}, "
+              f"{len(splits)} split sizes")
+        try:
+            throughput = run(data, splits, engines_, version, repeat=args.repeat)
+        except Mismatch as e:
+            print(f"MISMATCH {e}")
+            failed = True
+            continue
+        print(f"{'split':>8}" + "".join(f"{label + ' MB/s':>18}" for label in engines_))
+        for split in sorted(set(splits)):
+            if args.rows == "pow2" and split & (split - 1) and split != len(data):
+                continue
+            print(f"{split:>8}" + "".join(f"{throughput[label][split] / 1e6:>18.2f}" for label in engines_))
+        sys.stdout.flush()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+"""
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from sioresp.config import Config, Value
+from sioresp.exceptions import ProtocolError
+
+# packer(encoder, out, ele) writes ele into out. aggregates only write their header
+# and return an iterator of children, which the encoder walks without recursion
+Packer = Callable[["Encoder", bytearray, Any], Optional[Iterator]]
+
+_registry = {}  # type: Dict[type, Callable[[Any], Any]]
+_registry_version = 0  # bumped by register_packer, encoders compare it on every encode
+
+
+def register_packer(cls: type, func: Optional[Callable[[Any], Any]] = None):
+    """
+    register a process wide packer for cls, like functools.singledispatch.register.
+    func returns a value the encoder knows how to pack, eg. str(decimal), not another cls.
+    Existing encoders pick it up on their next encode, packers registered on an encoder
+    itself win
+    :param cls:
+    :param func:
+    :return:
+    """
+    global _registry_version
+    if func is None:
+        return lambda f: register_packer(cls, f)
+    _registry[cls] = func
+    _registry_version += 1
+    return func
+
+
+def _pack_str(encoder: "Encoder", out: bytearray, ele: str) -> None:
+    ele = ele.encode(encoder.config.encoding, encoder.config.errors)
+    _pack_bytes(encoder, out, ele)
+
+
+def _pack_bytes(encoder: "Encoder", out: bytearray, ele) -> None:
+    tag = encoder._escape(encoder.config, ele) if encoder._escape is not None else b""
+    out += b"$%d\r\n" % (len(tag) + len(ele))
+    out += tag
+    out += ele
+    out += b"\r\n"
+
+
+def _pack_value(encoder: "Encoder", out: bytearray, ele: Value) -> None:
+    from sioresp.codecs import encode_value
+
+    tag, payload = encode_value(encoder.config, ele.value)
+    out += b"$%d\r\n" % (len(tag) + len(payload))
+    out += tag
+    out += payload
+    out += b"\r\n"
+
+
+def _pack_integer(encoder: "Encoder", out: bytearray, ele: int) -> None:
+    out += b":%d\r\n" % ele
+
+
+def _pack_big_number(encoder: "Encoder", out: bytearray, ele: int) -> None:
+    out += b"(%d\r\n" % ele
+
+
+def _pack_float_string(encoder: "Encoder", out: bytearray, ele: float) -> None:
+    out += b"+%s\r\n" % str(ele).encode()
+
+
+def _pack_double(encoder: "Encoder", out: bytearray, ele: float) -> None:
+    out += b",%s\r\n" % str(ele).encode()
+
+
+def _pack_boolean(encoder: "Encoder", out: bytearray, ele: bool) -> None:
+    out += b"#t\r\n" if ele else b"#f\r\n"
+
+
+def _pack_null2(encoder: "Encoder", out: bytearray, ele: None) -> None:
+    out += b"$-1\r\n"
+
+
+def _pack_null3(encoder: "Encoder", out: bytearray, ele: None) -> None:
+    out += b"_\r\n"
+
+
+def _pack_array(encoder: "Encoder", out: bytearray, ele) -> Iterator:
+    out += b"*%d\r\n" % len(ele)
+    return iter(ele)
+
+
+def _pack_map(encoder: "Encoder", out: bytearray, ele: dict) -> Iterator:
+    out += b"%%%d\r\n" % len(ele)
+    return chain.from_iterable(ele.items())
+
+
+def _pack_set(encoder: "Encoder", out: bytearray, ele) -> Iterator:
+    out += b"~%d\r\n" % len(ele)
+    return iter(ele)
+
+
+def _unsupported(name: str) -> Packer:
+    def packer(encoder: "Encoder", out: bytearray, ele):
+        raise ProtocolError(f"resp version2 doesn't support {name} type")
+
+    return packer
+
+
+_common = {
+    str: _pack_str,
+    bytes: _pack_bytes,
+    bytearray: _pack_bytes,
+    memoryview: _pack_bytes,
+    Value: _pack_value,
+    list: _pack_array,
+    tuple: _pack_array,
+}
+
+_tables = {
+    2: {
+        **_common,
+        int: _pack_integer,
+        float: _pack_float_string,
+        bool: _unsupported("bool"),
+        dict: _unsupported("map"),
+        set: _unsupported("set"),
+        frozenset: _unsupported("set"),
+        type(None): _pack_null2,
+    },
+    3: {
+        **_common,
+        int: _pack_big_number,
+        float: _pack_double,
+        bool: _pack_boolean,
+        dict: _pack_map,
+        set: _pack_set,
+        frozenset: _pack_set,
+        type(None): _pack_null3,
+    },
+}  # type: Dict[int, Dict[type, Packer]]
+
+
+def _user_packer(cls: type, func: Callable[[Any], Any]) -> Packer:
+    def packer(encoder: "Encoder", out: bytearray, ele: Any):
+        value = func(ele)
+        if isinstance(value, cls):  # would come back here forever
+            raise ProtocolError(f"packer for {cls.__name__} returned a {type(value).__name__} again")
+        return iter((value,))
+
+    return packer
+
+
+class Encoder:
+    """
+    type -> packer dispatch table built once per Connection, nested values are
+    written iteratively into one output buffer
+    """
+
+    def __init__(self, config: Config):
+        if config.resp_version not in _tables:
+            raise ValueError(f"resp_version must be one of {sorted(_tables)}, got {config.resp_version!r}")
+        self.config = config
+        self._escape = None  # sioresp.codecs.escape, only loaded when value_codecs is set
+        if config.value_codecs:
+            from sioresp.codecs import escape
+
+            self._escape = escape
+        self._base = _tables[config.resp_version]
+        self._own = {}  # type: Dict[type, Callable[[Any], Any]]  # registered on this encoder
+        self._user = {}  # type: Dict[type, Callable[[Any], Any]]
+        self._packers = {}  # type: Dict[type, Packer]
+        self._version = -1
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        # user packers win over the builtin ones, mro lookups are filled lazily by _dispatch
+        self._version = _registry_version
+        self._user = {**_registry, **self._own}
+        self._packers = {cls: packer for cls, packer in self._base.items() if cls not in self._user}
+
+    def register(self, cls: type, func: Optional[Callable[[Any], Any]] = None):
+        """
+        register a packer for cls on this encoder only, see register_packer
+        :param cls:
+        :param func:
+        :return:
+        """
+        if func is None:
+            return lambda f: self.register(cls, f)
+        self._own[cls] = func
+        self._rebuild()
+        return func
+
+    def _dispatch(self, cls: type) -> Packer:
+        for base in cls.__mro__:
+            if base in self._user:
+                packer = _user_packer(base, self._user[base])
+                break
+            if base in self._base:
+                packer = self._base[base]
+                break
+        else:
+            raise ProtocolError(f"can't pack type {cls.__name__}")
+        self._packers[cls] = packer
+        return packer
+
+    def encode_items(self, out: bytearray, items: Iterable) -> bytearray:
+        """
+        pack every element of items into out
+        :param out:
+        :param items:
+        :return: out
+        """
+        if self._version != _registry_version:
+            self._rebuild()
+        packers = self._packers
+        stack = []
+        it = iter(items)
+        while True:
+            for ele in it:
+                packer = packers.get(type(ele)) or self._dispatch(type(ele))
+                children = packer(self, out, ele)
+                if children is not None:
+                    stack.append(it)
+                    it = children
+                    break
+            else:
+                if not stack:
+                    return out
+                it = stack.pop()
+
+    def encode_into(self, out: bytearray, ele: Any) -> bytearray:
+        return self.encode_items(out, (ele,))
+
+    def encode(self, ele: Any) -> bytes:
+        return bytes(self.encode_items(bytearray(), (ele,)))
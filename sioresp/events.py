@@ -1,17 +1,33 @@
-from dataclasses import dataclass, field
-import decimal
 from typing import Union, Optional
 
+from sioresp.config import lazy_dataclass
 
-@dataclass
+
+@lazy_dataclass
 class BaseEvent:
-    pass
+    _fields = ()  # 给__repr__和__eq__用
+
+    def __repr__(self):
+        args = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{self.__class__.__qualname__}({args})"
 
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self._fields)
 
-@dataclass
+    __hash__ = None
+
+
+@lazy_dataclass
 class String(BaseEvent):
     data: Union[bytes, bytearray]
     len: Optional[int] = None
+    _fields = ("data", "len")
+
+    def __init__(self, data: Union[bytes, bytearray], len: Optional[int] = None):
+        self.data = data
+        self.len = len
 
     def __str__(self):
         return self.data.decode()
@@ -20,15 +36,26 @@ class String(BaseEvent):
         return bytes(self.data)
 
 
-@dataclass
+@lazy_dataclass
 class VerbatimString(String):
     type: Optional[str] = None
+    _fields = ("data", "len", "type")
 
+    def __init__(self, data: Union[bytes, bytearray], len: Optional[int] = None, type: Optional[str] = None):
+        self.data = data
+        self.len = len
+        self.type = type
 
-@dataclass
+
+@lazy_dataclass
 class ReplyError(BaseEvent):
     data: Union[bytes, bytearray, str]
     len: Optional[int] = None
+    _fields = ("data", "len")
+
+    def __init__(self, data: Union[bytes, bytearray, str], len: Optional[int] = None):
+        self.data = data
+        self.len = len
 
     def __str__(self):
         return self.data if isinstance(self.data, str) else self.data.decode()
@@ -37,30 +64,42 @@ class ReplyError(BaseEvent):
         return bytes(self.data)
 
 
-@dataclass
+@lazy_dataclass
 class Integer(BaseEvent):
     data: Union[bytes, bytearray]
+    _fields = ("data",)
+
+    def __init__(self, data: Union[bytes, bytearray]):
+        self.data = data
 
     def __int__(self):
         return int(self.data.decode())
 
 
-@dataclass
+@lazy_dataclass
 class Null(BaseEvent):
     pass
 
 
-@dataclass
+@lazy_dataclass
 class Double(BaseEvent):
     data: Union[bytes, bytearray]
+    _fields = ("data",)
+
+    def __init__(self, data: Union[bytes, bytearray]):
+        self.data = data
 
     def __float__(self):
         return float(self.data.decode())
 
 
-@dataclass
+@lazy_dataclass
 class Boolean(BaseEvent):
     data: Union[bytes, bytearray]
+    _fields = ("data",)
+
+    def __init__(self, data: Union[bytes, bytearray]):
+        self.data = data
 
     def __bool__(self):
         if bytes(self.data) == b"t":
@@ -69,34 +108,47 @@ class Boolean(BaseEvent):
             return False
 
 
-@dataclass
+@lazy_dataclass
 class BigNumber(BaseEvent):  # todo decimal?
     data: Union[bytes, bytearray]
+    _fields = ("data",)
+
+    def __init__(self, data: Union[bytes, bytearray]):
+        self.data = data
 
     def __int__(self):
         return int(self.data.decode())
 
 
-@dataclass
-class Array(BaseEvent):
+@lazy_dataclass
+class _Aggregate(BaseEvent):
     len: int
+    _fields = ("len",)
 
+    def __init__(self, len: int):
+        self.len = len
 
-@dataclass
-class Map(BaseEvent):
-    len: int
 
+@lazy_dataclass
+class Array(_Aggregate):
+    pass
 
-@dataclass
-class Set(BaseEvent):
-    len: int
 
+@lazy_dataclass
+class Map(_Aggregate):
+    pass
 
-@dataclass
-class Attribute(BaseEvent):
-    len: int
+
+@lazy_dataclass
+class Set(_Aggregate):
+    pass
 
 
-@dataclass
-class Push(BaseEvent):
-    len: int
+@lazy_dataclass
+class Attribute(_Aggregate):
+    pass
+
+
+@lazy_dataclass
+class Push(_Aggregate):
+    pass
@@ -15,4 +15,8 @@ class ProtocolError(RedisError):
 
 
 class PipelinedExceptions(RedisError):
-    pass
\ No newline at end of file
+    pass
+
+
+class LimitExceededError(ProtocolError):
+    pass
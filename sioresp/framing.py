@@ -0,0 +1,152 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+"""
+from typing import List, Optional
+
+from sioresp.config import Config
+from sioresp.exceptions import ProtocolError, LimitExceededError
+
+BULK_START = {36, 33, 61}  # b"$" b"!" b"="
+AGGREGATE_START = {42, 126, 62}  # b"*" b"~" b">"
+PAIR_AGGREGATE_START = {37}  # b"%"
+ATTRIBUTE_START = 124  # b"|" pairs, then the value they belong to
+LINE_START = {43, 45, 58, 44, 95, 35, 40}  # b"+" b"-" b":" b"," b"_" b"#" b"("
+
+
+def _length(buf, pos: int, idx: int) -> int:
+    # the number after the type byte at buf[pos], up to the \r\n at idx
+    try:
+        return int(buf[pos + 1:idx])
+    except ValueError:
+        raise ProtocolError(f"invalid length {bytes(buf[pos + 1:idx])!r} at offset {pos}") from None
+
+
+class Framer:
+    """
+    Finds where a message ends without building any python object.
+    Resumable: call scan again with more data from the returned position,
+    ``complete`` tells whether a whole message has been passed.
+    """
+
+    def __init__(self, config: Optional[Config] = None, stack: Optional[List[int]] = None):
+        self.config = config
+        self.stack = stack if stack is not None else []  # 每一层aggregate还剩多少个元素
+        self.complete = False
+        self._body_left = 0  # bulk body bytes (with \r\n) not seen yet
+
+    def reset(self) -> None:
+        self.stack.clear()
+        self.complete = False
+        self._body_left = 0
+
+    def scan(self, buf, pos: int = 0, end: Optional[int] = None) -> int:
+        """
+        advance over buf[pos:end], stops right after a complete message
+        :param buf: bytes-like or mmap
+        :param pos:
+        :param end:
+        :return: the position scanning stopped at
+        """
+        if end is None:
+            end = len(buf)
+        if self.complete:  # 上一条消息已经结束 开始新的
+            self.complete = False
+        stack = self.stack
+        config = self.config
+        while pos < end:
+            if self._body_left:
+                left = self._body_left
+                n = min(left, end - pos)
+                crlf = pos + left - 2  # where the \r\n starts, maybe in a later chunk
+                for i in range(max(pos, crlf), pos + n):  # the part of it in this chunk, even 1 byte
+                    if buf[i] != (13 if i == crlf else 10):
+                        raise ProtocolError("bulk string should ended with \\r\\n")
+                pos += n
+                self._body_left -= n
+                if self._body_left:
+                    return pos
+            else:
+                idx = buf.find(b"\r\n", pos, end)
+                if idx == -1:
+                    return pos
+                start = buf[pos]
+                if start in BULK_START:
+                    length = _length(buf, pos, idx)
+                    pos = idx + 2
+                    if length >= 0:
+                        if config is not None and config.max_bulk_length is not None \
+                                and length > config.max_bulk_length:
+                            raise LimitExceededError(
+                                f"bulk length {length} exceeds max_bulk_length {config.max_bulk_length}")
+                        self._body_left = length + 2
+                        continue
+                elif start in AGGREGATE_START or start in PAIR_AGGREGATE_START or start == ATTRIBUTE_START:
+                    length = _length(buf, pos, idx)
+                    pos = idx + 2
+                    if length > 0 or start == ATTRIBUTE_START:
+                        if config is not None:
+                            if config.max_aggregate_length is not None and length > config.max_aggregate_length:
+                                raise LimitExceededError(
+                                    f"aggregate length {length} exceeds max_aggregate_length "
+                                    f"{config.max_aggregate_length}")
+                            if config.max_nesting_depth is not None and len(stack) >= config.max_nesting_depth:
+                                raise LimitExceededError(
+                                    f"nesting depth exceeds max_nesting_depth {config.max_nesting_depth}")
+                        if start == ATTRIBUTE_START:
+                            stack.append(length * 2 + 1)
+                        else:
+                            stack.append(length * 2 if start in PAIR_AGGREGATE_START else length)
+                        continue
+                elif start in LINE_START:
+                    pos = idx + 2
+                else:
+                    raise ProtocolError(f"invalid start byte {chr(start)}")
+            # 一个值结束了
+            while stack:
+                stack[-1] -= 1
+                if stack[-1]:
+                    break
+                stack.pop()
+            if not stack:
+                self.complete = True
+                return pos
+        return pos
+
+
+def read_command(buf, pos: int, end: int, source=None):
+    """
+    frame one command, an array of bulk strings starting with b"*" at buf[pos]
+    :param buf: bytes-like or mmap, it's searched for \\r\\n
+    :param pos:
+    :param end:
+    :param source: arguments are sliced from it, buf by default. a memoryview of buf gives zero copy slices
+    :return: (end, args), args is None when it isn't a plain command. None when incomplete
+    """
+    if source is None:
+        source = buf
+    idx = buf.find(b"\r\n", pos, end)
+    if idx == -1:
+        return None
+    n = _length(buf, pos, idx)
+    pos = idx + 2
+    args = []
+    for _ in range(n):
+        if pos >= end:
+            return None
+        if buf[pos] != 36:  # b"$"
+            return pos, None
+        idx = buf.find(b"\r\n", pos, end)
+        if idx == -1:
+            return None
+        length = _length(buf, pos, idx)
+        pos = idx + 2
+        if length < 0:
+            return pos, None
+        body_end = pos + length
+        if body_end + 2 > end:
+            return None
+        if buf[body_end:body_end + 2] != b"\r\n":
+            raise ProtocolError(f"bulk string at {pos} should ended with \\r\\n")
+        args.append(source[pos:body_end])
+        pos = body_end + 2
+    return pos, args
@@ -0,0 +1,88 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+"""
+from typing import Union
+
+import hiredis
+
+from sioresp import Connection
+from sioresp.config import Config
+from sioresp.events import ReplyError
+from sioresp.exceptions import ProtocolError
+
+
+class HiredisConnection(Connection):
+    def __init__(self, config: Config):
+        super().__init__(config)
+        self.reader = hiredis.Reader(ProtocolError, ReplyError, notEnoughData=StopIteration)
+
+    # hiredis keeps its own buffer, ours stays empty and its spare room is where we receive
+
+    def buffer_updated(self, nbytes: int) -> None:
+        if nbytes:
+            self.reader.feed(self._buffer.data, 0, nbytes)
+
+    def feed_data(self, data: Union[bytes, bytearray]) -> None:
+        self.reader.feed(data)
+
+    def discard(self, n: int = 1) -> None:
+        # hiredis can't skip a reply, they are still built and thrown away in __next__
+        self._discard += n
+
+    def __next__(self):
+        data = self.reader.gets()
+        while self._discard and data is not StopIteration:
+            self._discard -= 1
+            data = self.reader.gets()
+        if data is StopIteration:
+            raise data
+        return data
+
+    def next_with(self, visitor):
+        # hiredis only hands out whole replies, the visitor walks the one it built
+        self._walk(visitor, self.__next__())
+        return visitor.result()
+
+    def _walk(self, visitor, value) -> None:
+        if isinstance(value, bytes):
+            with memoryview(value) as view:
+                visitor.on_bulk(view)
+        elif value is None:
+            visitor.on_null()
+        elif isinstance(value, bool):
+            visitor.on_bool(value)
+        elif isinstance(value, int):
+            visitor.on_int(value)
+        elif isinstance(value, float):
+            visitor.on_double(value)
+        elif isinstance(value, ReplyError):
+            visitor.on_error(value)
+        elif isinstance(value, list):
+            visitor.begin_array(len(value))
+            for item in value:
+                self._walk(visitor, item)
+            visitor.end_array()
+        elif isinstance(value, (set, frozenset)):
+            visitor.begin_set(len(value))
+            for item in value:
+                self._walk(visitor, item)
+            visitor.end_set()
+        elif isinstance(value, dict):
+            visitor.begin_map(len(value))
+            for key, item in value.items():
+                self._walk(visitor, key)
+                self._walk(visitor, item)
+            visitor.end_map()
+        else:
+            visitor.on_value(value)
+
+    def peek(self, n: int = 1):
+        return None  # hiredis hands out whole replies only
+
+    def pending_bytes(self) -> int:
+        return self.reader.len()
+
+    def reset(self):
+        # a reader can't be emptied, a new one drops whatever was fed to the old
+        self.reader = hiredis.Reader(ProtocolError, ReplyError, notEnoughData=StopIteration)
+        self._discard = 0
@@ -0,0 +1,244 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Many concurrent callers over one socket, replies dispatched in request order
+"""
+import asyncio
+import os
+import weakref
+from collections import deque
+from typing import Any, Callable, List, Optional, Sequence
+
+from sioresp.config import Config
+from sioresp.events import Push
+from sioresp.exceptions import CommunicationError
+from sioresp.writer import RespWriter
+
+
+class Multiplexer(asyncio.Protocol):
+    """
+    Commands of every caller are appended to one write buffer and a FIFO of futures,
+    each reply resolves the oldest one. ReplyError is the result of its own request only.
+    A caller that gives up leaves its slot in the FIFO, its reply is discarded on arrival
+    without being built (RESP2, where nothing but replies can come).
+
+    Flushing is Nagle like: with nothing in flight the buffer goes out at the end of the
+    current loop iteration, otherwise it waits until the replies in flight are all back,
+    ``flush_delay`` seconds have passed, or ``flush_bytes`` / ``max_batch`` is reached.
+    RESP3 push frames go to ``push_handler`` instead of a waiter, they are told apart with
+    Connection.peek, so RESP3 needs an engine that can peek (not hiredis).
+
+    A forked child can't use the parent's transport or event loop. The child drops both,
+    and one made with create() connects again on its next execute or pipeline
+    """
+
+    def __init__(self, config: Optional[Config] = None, connection_class: Optional[type] = None,
+                 max_batch: int = 1000, flush_bytes: int = 65536, flush_delay: float = 0.0002,
+                 push_handler: Optional[Callable[[Any], None]] = None):
+        if connection_class is None:
+            from sioresp.backends import get_connection_class
+
+            connection_class = get_connection_class()
+        self.config = config or Config()
+        self.connection = connection_class(self.config)
+        self._resp3 = self.config.resp_version == 3
+        if self._resp3 and self.connection.peek() is None:
+            raise ValueError(f"{connection_class.__name__} can't tell RESP3 push frames from replies")
+        self.max_batch = max_batch
+        self.flush_bytes = flush_bytes
+        self.flush_delay = flush_delay
+        self.push_handler = push_handler
+        self.transport = None  # type: Optional[asyncio.Transport]
+        self._writer = RespWriter(self.config, encoder=self.connection.encoder)
+        self._waiters = deque()  # type: deque  # flushed ones first, then the buffered ones
+        self._buffered = 0  # commands in the write buffer
+        self._in_flight = 0  # commands sent and not answered
+        self._handle = None  # type: Optional[asyncio.Handle]
+        self._exc = None  # type: Optional[BaseException]
+        self._loop = None  # type: Optional[asyncio.AbstractEventLoop]
+        self._address = None  # type: Optional[tuple]  # (host, port, path) given to create()
+        self._forked = False
+        self._reconnecting = None  # type: Optional[asyncio.Future]
+        _multiplexers.add(self)
+
+    @classmethod
+    async def create(cls, host: Optional[str] = None, port: int = 6379, path: Optional[str] = None,
+                     **kwargs) -> "Multiplexer":
+        """
+        connect over TCP, or to a unix socket when path is given
+        """
+        protocol = cls(**kwargs)
+        protocol._address = (host, port, path)
+        await protocol._connect()
+        return protocol
+
+    async def _connect(self) -> None:
+        host, port, path = self._address
+        loop = asyncio.get_running_loop()
+        if path is not None:
+            await loop.create_unix_connection(lambda: self, path)
+        else:
+            await loop.create_connection(lambda: self, host, port)
+
+    def _after_fork(self) -> None:
+        """
+        in the child: forget the transport, the loop and every waiter without touching
+        them, they belong to the parent (closing would unregister the parent's socket
+        from a shared epoll). Only the child's copy of the socket descriptor is closed
+        """
+        if self.transport is not None:
+            sock = self.transport.get_extra_info("socket")
+            if sock is not None and sock.fileno() != -1:
+                os.close(sock.fileno())
+        self.transport = None
+        self._loop = None
+        self._handle = None
+        self._reconnecting = None
+        self._waiters = deque()
+        self._buffered = self._in_flight = 0
+        self._writer.clear()
+        self.connection.reset()
+        if self._address is None:  # no way to connect again
+            self._exc = CommunicationError("connection inherited across fork")
+        else:
+            self._exc = None
+            self._forked = True
+
+    async def _reconnect(self) -> None:
+        if self._reconnecting is None:
+            self._reconnecting = asyncio.ensure_future(self._connect())
+        reconnecting = self._reconnecting
+        try:
+            await asyncio.shield(reconnecting)
+        except BaseException:
+            if self._reconnecting is reconnecting and reconnecting.done():  # the next call tries again
+                self._reconnecting = None
+            raise
+        self._forked = False
+        self._reconnecting = None
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        self._loop = asyncio.get_running_loop()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._exc = CommunicationError(f"connection lost: {exc}" if exc else "connection closed")
+        self._cancel_flush()
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_exception(self._exc)
+        self._buffered = self._in_flight = 0
+        self._writer.clear()
+
+    def data_received(self, data: bytes) -> None:
+        con = self.connection
+        self._drop_abandoned()
+        con.feed_data(data)
+        waiters = self._waiters
+        while True:
+            self._drop_abandoned()
+            if self._resp3:
+                first = con.peek()
+                push = bool(first) and type(first[0]) is Push
+            else:
+                push = False
+            try:
+                reply = next(con)
+            except StopIteration:
+                break
+            if push:
+                if self.push_handler is not None:
+                    self.push_handler(reply)
+                continue
+            if not self._in_flight:
+                self.transport.close()
+                self.connection_lost(CommunicationError("reply without a request"))
+                return
+            self._in_flight -= 1
+            fut = waiters.popleft()
+            if not fut.done():  # the caller may have given up
+                fut.set_result(reply)
+        if not self._in_flight and self._buffered:  # everything acknowledged, send what piled up
+            self.flush()
+
+    def _drop_abandoned(self) -> None:
+        # callers at the head that gave up, their replies are skipped instead of built.
+        # with RESP3 a push frame could come first and be skipped instead, so not there
+        if self._resp3:
+            return
+        waiters = self._waiters
+        n = 0
+        while self._in_flight and waiters[0].done():
+            waiters.popleft()
+            self._in_flight -= 1
+            n += 1
+        if n:
+            self.connection.discard(n)
+
+    def _cancel_flush(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def flush(self) -> None:
+        self._cancel_flush()
+        if not self._buffered or self.transport is None:
+            return
+        self._writer.flush_to(self.transport)
+        self._in_flight += self._buffered
+        self._buffered = 0
+
+    def _queue(self, commands: Sequence[Sequence]) -> List[asyncio.Future]:
+        if self._exc is not None:
+            raise self._exc
+        if self.transport is None:
+            raise CommunicationError("not connected")
+        writer = self._writer
+        start = len(writer)
+        try:
+            for args in commands:
+                writer.write_command(*args)
+        except BaseException:  # nothing of a batch that can't be encoded is sent
+            writer.truncate(start)
+            raise
+        futures = [self._loop.create_future() for _ in commands]
+        self._waiters.extend(futures)
+        self._buffered += len(futures)
+        if self._buffered >= self.max_batch or len(writer) >= self.flush_bytes:
+            self.flush()
+        elif self._handle is None:
+            if self._in_flight:
+                self._handle = self._loop.call_later(self.flush_delay, self.flush)
+            else:
+                self._handle = self._loop.call_soon(self.flush)
+        return futures
+
+    async def execute(self, *args) -> Any:
+        if self._forked:
+            await self._reconnect()
+        return await self._queue((args,))[0]
+
+    async def pipeline(self, commands: Sequence[Sequence]) -> List[Any]:
+        """
+        same contract as Batcher's execute, so it can back a Batcher, ShardedClient or Scripts
+        """
+        if self._forked:
+            await self._reconnect()
+        return list(await asyncio.gather(*self._queue(commands)))
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+
+
+_multiplexers = weakref.WeakSet()  # type: weakref.WeakSet
+
+
+def _after_fork_in_child() -> None:
+    for multiplexer in list(_multiplexers):
+        multiplexer._after_fork()
+
+
+if hasattr(os, "register_at_fork"):  # not on windows
+    os.register_at_fork(after_in_child=_after_fork_in_child)
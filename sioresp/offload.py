@@ -0,0 +1,126 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+"""
+import asyncio
+from dataclasses import dataclass
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Optional
+
+from sioresp import Connection
+from sioresp.config import Config
+from sioresp.events import BaseEvent
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # python3.13+
+    except TypeError:
+        # pool workers share the parent's resource tracker, registering again is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+def _decode_shared(name: str, size: int, config: Config) -> Any:
+    """
+    runs in the worker process
+    :param name: shared memory holding one complete reply
+    :param size:
+    :param config:
+    :return:
+    """
+    shm = _attach(name)
+    try:
+        con = Connection(config)
+        con.feed_data(shm.buf[:size])
+        return next(con)
+    finally:
+        shm.close()
+
+
+class OffloadedReply:
+    """
+    A reply decoding in another process. await it, or call result() outside of asyncio
+    """
+
+    def __init__(self, future: Future, size: int):
+        self.future = future
+        self.size = size  # wire size
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        return self.future.result(timeout)
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+    def __repr__(self):
+        return f"<OffloadedReply size={self.size} done={self.future.done()}>"
+
+
+@dataclass
+class Offloaded(BaseEvent):
+    reply: OffloadedReply
+
+
+class OffloadConnection(Connection):
+    """
+    Top level aggregates with at least ``threshold`` elements are framed without building
+    objects, copied into shared memory and decoded by ``executor``. next() returns an
+    OffloadedReply for them, in the same position as the reply would have been.
+    Without an executor the connection starts its own ProcessPoolExecutor on the first
+    offloaded reply and shuts it down in close(), or on leaving a with block
+    """
+    post_processors = {**Connection.post_processors, Offloaded: lambda x: x.reply}
+
+    def __init__(self, config: Config, executor: Optional[Executor] = None, threshold: int = 100000):
+        super().__init__(config)
+        self.executor = executor
+        self._own_executor = executor is None
+        self._closed = False
+        self.raw_threshold = threshold
+
+    def close(self) -> None:
+        """
+        shut down the executor this connection started, waiting for replies still decoding.
+        A shared executor passed in is left alone
+        """
+        self._closed = True
+        if self._own_executor and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _raw_event(self, raw: bytearray) -> BaseEvent:
+        """
+        called by _parse with the whole wire bytes of a top level aggregate once raw_threshold
+        is reached, returns the event queued in its place
+        :param raw:
+        :return:
+        """
+        if self._closed:
+            raise RuntimeError("can't offload a reply, the connection is closed")
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor()
+        size = len(raw)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            shm.buf[:size] = raw
+            future = self.executor.submit(_decode_shared, shm.name, size, self.config)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+        def release(_):
+            shm.close()
+            shm.unlink()
+
+        future.add_done_callback(release)
+        return Offloaded(reply=OffloadedReply(future, size))
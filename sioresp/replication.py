@@ -0,0 +1,202 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Consume what a master sends to a replica: the PSYNC reply, the RDB payload and then the command stream
+"""
+from collections import deque
+from typing import Any, Callable, Optional
+
+from sioresp import Connection
+from sioresp.config import Config
+from sioresp.exceptions import ProtocolError, LimitExceededError
+from sioresp.framing import Framer, read_command
+
+EOF_MARK_LENGTH = 40  # diskless replication: $EOF:<40 bytes mark>\r\n ... <mark>
+
+
+class ReplicationState:
+    psync_reply = 0  # +FULLRESYNC / +CONTINUE
+    rdb_header = 1  # $<len> or $EOF:<mark>
+    rdb_body = 2
+    stream = 3  # commands
+
+
+class ReplicationConnection(Connection):
+    """
+    Feed it everything read after sending PSYNC (or SYNC). The RDB payload, which has no
+    trailing \\r\\n, goes to ``rdb_sink`` in chunks as it arrives; a chunk is a memoryview
+    only valid during the call, so copy or write it out right away. Then next() returns
+    commands as lists of bytes, and ``offset`` is the replication offset right after the
+    last one returned, ready for REPLCONF ACK
+    """
+
+    def __init__(self, config: Config, rdb_sink: Callable[[memoryview], Any], offset: int = -1,
+                 replid: Optional[str] = None):
+        """
+        :param config:
+        :param rdb_sink: eg. file.write
+        :param offset: for partial resync, the offset sent in PSYNC
+        :param replid:
+        """
+        super().__init__(config)
+        self.rdb_sink = rdb_sink
+        self._psync = (offset, replid)  # what reset() goes back to
+        self._commands = deque()  # (stream_pos after it, command)
+        self._reset_sync()
+
+    def _reset_sync(self) -> None:
+        self.offset, self.replid = self._psync
+        self.rdb_size = None  # type: Optional[int]  # None for diskless transfers until the end mark
+        self.rdb_received = 0
+        self.repl_state = ReplicationState.psync_reply
+        self._base_offset = self.offset
+        self._rdb_left = 0
+        self._eof_mark = None  # type: Optional[bytes]
+        self._stream_pos = 0  # command stream bytes framed so far
+        self._commands.clear()
+
+    def reset(self):
+        """
+        ready for the reply to a new PSYNC, with the offset and replid given to the constructor
+        :return:
+        """
+        super().reset()
+        self._reset_sync()
+
+    @property
+    def rdb_complete(self) -> bool:
+        return self.repl_state == ReplicationState.stream
+
+    def pending_bytes(self) -> int:
+        return len(self._buffer) + (self._stream_pos - (self.offset - self._base_offset)
+                                    if self.repl_state == ReplicationState.stream else 0)
+
+    def ack_command(self) -> bytes:
+        return self.send_command("REPLCONF", "ACK", str(self.offset))
+
+    def _skip_keepalive(self) -> None:
+        # the master sends \n while it's still preparing the rdb
+        buffer = self._buffer
+        n = 0
+        while n < len(buffer) and buffer[n] == 10:
+            n += 1
+        if n:
+            buffer.skip(n)
+
+    def _parse(self) -> None:
+        buffer = self._buffer
+        if self.repl_state == ReplicationState.psync_reply:
+            self._skip_keepalive()
+            if buffer[:1] == b"$":  # SYNC, the rdb comes right away
+                self.repl_state = ReplicationState.rdb_header
+            else:
+                line = buffer.readline()
+                if line is None:
+                    return self._check_buffer()
+                if line.startswith(b"+FULLRESYNC"):
+                    _, replid, offset = line.decode().split()
+                    self.replid = replid
+                    self.offset = self._base_offset = int(offset)
+                    self.repl_state = ReplicationState.rdb_header
+                elif line.startswith(b"+CONTINUE"):
+                    parts = line.decode().split()
+                    if len(parts) > 1:
+                        self.replid = parts[1]
+                    self.repl_state = ReplicationState.stream
+                else:
+                    raise ProtocolError(f"unexpected psync reply {bytes(line)!r}")
+
+        if self.repl_state == ReplicationState.rdb_header:
+            self._skip_keepalive()
+            line = buffer.readline()
+            if line is None:
+                return self._check_buffer()
+            if line[:1] != b"$":
+                raise ProtocolError(f"expect rdb payload, got {bytes(line)!r}")
+            if line.startswith(b"$EOF:"):
+                self._eof_mark = bytes(line[5:])
+                if len(self._eof_mark) != EOF_MARK_LENGTH:
+                    raise ProtocolError("bad rdb eof mark")
+            else:
+                self.rdb_size = self._rdb_left = int(line[1:])
+            self.repl_state = ReplicationState.rdb_body
+
+        if self.repl_state == ReplicationState.rdb_body:
+            if self._eof_mark is None:
+                n = min(self._rdb_left, len(buffer))
+                self._rdb_left -= n
+                done = not self._rdb_left
+                skip = n
+            else:
+                idx = buffer.find(self._eof_mark)
+                done = idx != -1
+                # the mark may be split, hold its possible beginning back
+                n = idx if done else max(len(buffer) - EOF_MARK_LENGTH + 1, 0)
+                skip = n + EOF_MARK_LENGTH if done else n
+            if n:
+                with memoryview(buffer.data) as view, view[buffer.start:buffer.start + n] as chunk:
+                    self.rdb_sink(chunk)
+                self.rdb_received += n
+            buffer.skip(skip)
+            if not done:
+                return
+            if self.rdb_size is None:
+                self.rdb_size = self.rdb_received
+            self.repl_state = ReplicationState.stream
+
+        if self.repl_state == ReplicationState.stream:
+            self._frame_commands()
+        self._check_buffer()
+
+    def _frame_commands(self) -> None:
+        buffer = self._buffer.data
+        start = pos = self._buffer.start
+        end = self._buffer.end
+        commands = self._commands
+        with memoryview(buffer) as view:
+            while pos < end:
+                if buffer[pos] == 42:  # b"*"
+                    ret = read_command(buffer, pos, end, view)
+                    if ret is None:
+                        break
+                    next_pos, args = ret
+                    if args is not None:
+                        command = [bytes(arg) for arg in args]
+                        for arg in args:
+                            arg.release()
+                    else:
+                        next_pos, command = self._decode_other(buffer, pos, end)
+                        if next_pos is None:
+                            break
+                elif buffer[pos] == 10:  # keepalive
+                    next_pos, command = pos + 1, None
+                else:
+                    next_pos, command = self._decode_other(buffer, pos, end)
+                    if next_pos is None:
+                        break
+                self._stream_pos += next_pos - pos
+                pos = next_pos
+                if command is not None:
+                    commands.append((self._stream_pos, command))
+        self._buffer.skip(pos - start)
+
+    def _decode_other(self, buffer, pos: int, end: int):
+        framer = Framer(self.config)
+        next_pos = framer.scan(buffer, pos, end)
+        if not framer.complete:
+            return None, None
+        con = Connection(self.config)
+        con.feed_data(buffer[pos:next_pos])
+        return next_pos, next(con)
+
+    def _check_buffer(self) -> None:
+        limit = self.config.max_buffer_size
+        if limit is not None and len(self._buffer) > limit:
+            raise LimitExceededError(f"{len(self._buffer)} unparsed bytes exceeds max_buffer_size {limit}")
+
+    def __next__(self):
+        if not self._commands:
+            raise StopIteration
+        stream_pos, command = self._commands.popleft()
+        self.offset = self._base_offset + stream_pos
+        return command
@@ -0,0 +1,172 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+SCAN / HSCAN / SSCAN / ZSCAN iteration that keeps the next page in flight
+"""
+import queue
+import socket
+import threading
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from sioresp.client import Client
+from sioresp.events import Array, ReplyError, String
+from sioresp.exceptions import RedisError
+
+PAIR_COMMANDS = {"HSCAN", "ZSCAN"}  # pages of field, value
+
+
+def _command(command: str, key: Any, cursor: Any, match: Any, count: Optional[int], type_: Optional[str]) -> tuple:
+    args = [command] if key is None else [command, key]
+    args.append(cursor)
+    if match is not None:
+        args += ("MATCH", match)
+    if count is not None:
+        args += ("COUNT", count)
+    if type_ is not None:
+        args += ("TYPE", type_)
+    return tuple(args)
+
+
+def _peek_cursor(con) -> Tuple[Optional[bytes], bool]:
+    """
+    the cursor of the reply at the head of the queue as soon as its first element is
+    tokenized, before the rest of the page arrives
+    :return: (cursor, whether more data may still show it)
+    """
+    events = con.peek(2)
+    if events is None:  # can't peek, found out from the whole reply
+        return None, False
+    if not events:
+        return None, True
+    if type(events[0]) is not Array or events[0].len < 2:  # not a page, eg. an error
+        return None, False
+    if len(events) < 2:
+        return None, True
+    if type(events[1]) is not String:
+        return None, False
+    return bytes(events[1].data), False
+
+
+def scan_pages(client: Client, command: str = "SCAN", key: Any = None, match: Any = None,
+               count: Optional[int] = None, type_: Optional[str] = None) -> Iterator[List]:
+    """
+    The next SCAN goes out as soon as the cursor of the current page is parsed, the
+    rest of the page is read while the server already works on the next one.
+    If the generator is closed early the page in flight is discarded, not waited for
+    :param client:
+    :param command: SCAN, HSCAN, SSCAN or ZSCAN
+    :param key: for HSCAN, SSCAN and ZSCAN
+    :param match:
+    :param count:
+    :param type_: SCAN only
+    :return: pages, lists of elements
+    """
+    command = command.upper()
+    if (key is None) != (command == "SCAN"):
+        raise ValueError(f"{command} {'takes no' if key is not None else 'needs a'} key")
+    con = client.connection
+    client.send([_command(command, key, b"0", match, count, type_)])
+    outstanding = 1  # pages asked for and not read yet
+    try:
+        while True:
+            next_cursor, wait = _peek_cursor(con)
+            while wait:
+                client.receive()
+                next_cursor, wait = _peek_cursor(con)
+            if next_cursor is not None and next_cursor != b"0":
+                client.send([_command(command, key, next_cursor, match, count, type_)])
+                outstanding += 1
+            while True:
+                try:
+                    reply = next(con)
+                    break
+                except StopIteration:
+                    client.receive()
+            outstanding -= 1
+            if isinstance(reply, ReplyError):
+                raise RedisError(str(reply))
+            if next_cursor is None:  # found out only now
+                next_cursor = reply[0]
+                if next_cursor != b"0":
+                    client.send([_command(command, key, next_cursor, match, count, type_)])
+                    outstanding += 1
+            yield reply[1]
+            if next_cursor == b"0":
+                return
+    except (GeneratorExit, socket.timeout):
+        con.discard(outstanding)
+        raise
+    except BaseException as e:
+        if type(e) is not RedisError:  # an error reply leaves the connection in step
+            client.close()
+        raise
+
+
+def scan_iter(client: Client, command: str = "SCAN", key: Any = None, match: Any = None,
+              count: Optional[int] = None, type_: Optional[str] = None) -> Iterator:
+    """
+    elements one by one, (field, value) pairs for HSCAN and ZSCAN
+    """
+    pairs = command.upper() in PAIR_COMMANDS
+    for page in scan_pages(client, command, key, match, count, type_):
+        if pairs:
+            yield from zip(page[::2], page[1::2])
+        else:
+            yield from page
+
+
+_DONE = object()
+
+
+def parallel_scan(clients: Sequence[Client], command: str = "SCAN", key: Any = None, match: Any = None,
+                  count: Optional[int] = None, type_: Optional[str] = None, max_pages: int = 4) -> Iterator:
+    """
+    scan every client (eg. every shard) in its own thread at the same time, elements come
+    in whatever order the pages arrive
+    :param clients:
+    :param max_pages: pages waiting for the consumer per client before its thread pauses
+    """
+    pages = queue.Queue(max_pages * len(clients))
+    stop = threading.Event()
+    pairs = command.upper() in PAIR_COMMANDS
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def work(client: Client) -> None:
+        scan = scan_pages(client, command, key, match, count, type_)
+        try:
+            for page in scan:
+                if not put(page):
+                    break
+        except BaseException as e:
+            put(e)
+        finally:
+            scan.close()
+            put(_DONE)
+
+    threads = [threading.Thread(target=work, args=(client,), daemon=True) for client in clients]
+    for thread in threads:
+        thread.start()
+    running = len(threads)
+    try:
+        while running:
+            page = pages.get()
+            if page is _DONE:
+                running -= 1
+            elif isinstance(page, BaseException):
+                raise page
+            elif pairs:
+                yield from zip(page[::2], page[1::2])
+            else:
+                yield from page
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
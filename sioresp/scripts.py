@@ -0,0 +1,109 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Lua scripts sent by sha1 with EVALSHA, the source only goes out when the server lacks it
+"""
+from hashlib import sha1
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from sioresp.batch import Execute
+from sioresp.events import ReplyError
+from sioresp.exceptions import RedisError
+
+EVALSHA_COMMANDS = {"EVALSHA": "EVAL", "EVALSHA_RO": "EVAL_RO"}
+
+
+class Script:
+    __slots__ = ("source", "sha")
+
+    def __init__(self, source: Union[str, bytes], encoding: str = "utf-8"):
+        self.source = source.encode(encoding) if isinstance(source, str) else bytes(source)
+        self.sha = sha1(self.source).hexdigest()
+
+    def __repr__(self):
+        return f"Script(sha={self.sha!r})"
+
+
+class Scripts:
+    """
+    Registry over an ``execute`` coroutine (a list of commands in, their replies out, like
+    Batcher's or ShardedClient.pipeline). call() gives an EVALSHA command to pipeline with
+    anything else. execute() first makes sure the server has every script the pipeline
+    calls: shas not seen loaded yet are checked with SCRIPT EXISTS and the missing ones
+    sent with SCRIPT LOAD, then the pipeline goes out as it is, so scripts run in order
+    with the commands around them.
+    If the server still answers NOSCRIPT (scripts flushed in between), the scripts are
+    loaded again and the pipeline is re-run from the first failure, but only when every
+    command from there on failed the same way; otherwise something after it already ran
+    and the NOSCRIPT errors are returned as they are
+    """
+
+    def __init__(self, execute: Execute, encoding: str = "utf-8"):
+        self._execute = execute
+        self.encoding = encoding
+        self._scripts = {}  # type: Dict[str, Script]
+        self._loaded = set()  # type: Set[str]  # shas the server is known to have
+
+    def register(self, source: Union[str, bytes]) -> Script:
+        script = Script(source, self.encoding)
+        return self._scripts.setdefault(script.sha, script)
+
+    def call(self, script: Script, keys: Sequence = (), args: Sequence = (), readonly: bool = False) -> Tuple:
+        """
+        :param script: from register()
+        :param keys:
+        :param args:
+        :param readonly: EVALSHA_RO
+        :return: the command
+        """
+        return ("EVALSHA_RO" if readonly else "EVALSHA", script.sha, len(keys), *keys, *args)
+
+    async def run(self, script: Script, keys: Sequence = (), args: Sequence = (), readonly: bool = False) -> Any:
+        return (await self.execute([self.call(script, keys, args, readonly)]))[0]
+
+    def _script(self, command: Sequence) -> Optional[Script]:
+        """
+        the registered script command calls with EVALSHA, None for anything else
+        """
+        name = command[0]
+        name = (name.decode() if isinstance(name, (bytes, bytearray)) else name).upper()
+        if name not in EVALSHA_COMMANDS:
+            return None
+        sha = command[1]
+        return self._scripts.get(sha.decode() if isinstance(sha, (bytes, bytearray)) else sha)
+
+    async def load(self, scripts: Iterable[Script]) -> None:
+        """
+        SCRIPT EXISTS for the scripts not known to be loaded, SCRIPT LOAD for the missing ones
+        """
+        todo = list({script.sha: script for script in scripts if script.sha not in self._loaded}.values())
+        if not todo:
+            return
+        exists = (await self._execute([("SCRIPT", "EXISTS", *(script.sha for script in todo))]))[0]
+        if isinstance(exists, ReplyError):
+            raise RedisError(str(exists))
+        missing = [script for script, found in zip(todo, exists) if not found]
+        if missing:
+            for reply in await self._execute([("SCRIPT", "LOAD", script.source) for script in missing]):
+                if isinstance(reply, ReplyError):
+                    raise RedisError(str(reply))
+        self._loaded.update(script.sha for script in todo)
+
+    @staticmethod
+    def _noscript(reply: Any) -> bool:
+        return isinstance(reply, ReplyError) and str(reply).startswith("NOSCRIPT")
+
+    async def execute(self, commands: Sequence[Sequence]) -> List[Any]:
+        scripts = [self._script(command) for command in commands]
+        await self.load(script for script in scripts if script is not None)
+        replies = list(await self._execute(commands))
+        failed = [i for i, (script, reply) in enumerate(zip(scripts, replies))
+                  if script is not None and self._noscript(reply)]
+        if not failed:
+            return replies
+        self._loaded.difference_update(scripts[i].sha for i in failed)
+        first = failed[0]
+        if len(failed) == len(commands) - first:  # nothing after the first failure ran, safe to redo in order
+            await self.load(scripts[i] for i in failed)
+            replies[first:] = await self._execute(commands[first:])
+        return replies
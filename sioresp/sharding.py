@@ -0,0 +1,178 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Client side sharding over independent servers (not Redis Cluster) with a consistent hash ring
+"""
+import asyncio
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from zlib import crc32
+
+from sioresp.batch import Execute
+from sioresp.config import Config
+from sioresp.events import ReplyError
+from sioresp.exceptions import ProtocolError
+
+# command -> (first key, keys step, how replies of the parts are merged)
+MULTI_KEY = {
+    "MGET": (1, 1, "list"),
+    "DEL": (1, 1, "sum"),
+    "UNLINK": (1, 1, "sum"),
+    "EXISTS": (1, 1, "sum"),
+    "TOUCH": (1, 1, "sum"),
+    "MSET": (1, 2, "ok"),
+}
+KEY_POSITION = {"EVAL": 3, "EVALSHA": 3, "EVAL_RO": 3, "EVALSHA_RO": 3, "FCALL": 3, "FCALL_RO": 3}
+
+
+class HashRing:
+    """
+    Every node gets ``vnodes`` points on a 32 bit crc32 ring, a key belongs to the first
+    point at or after its hash. The top ``table_bits`` of the hash index a table that
+    answers directly for every slice of the ring without a point in it, the rest bisect.
+    Like redis cluster, only the part between the first { and the next } is hashed
+    when it's not empty, so related keys can be kept together
+    """
+
+    def __init__(self, nodes: Sequence[str], vnodes: int = 160, table_bits: int = 16,
+                 config: Optional[Config] = None):
+        if not nodes:
+            raise ValueError("no nodes")
+        self.nodes = list(nodes)
+        self.config = config or Config()
+        self._shift = 32 - table_bits
+        points = {}  # type: Dict[int, int]
+        for index, node in enumerate(self.nodes):
+            for i in range(vnodes):
+                points.setdefault(crc32(f"{node}-{i}".encode()), index)
+        self._points = sorted(points)
+        self._owners = [points[p] for p in self._points]
+        table = []
+        pos = 0
+        for bucket in range(1 << table_bits):
+            low = bucket << self._shift
+            high = low + (1 << self._shift)
+            start = pos
+            while pos < len(self._points) and self._points[pos] < high:
+                pos += 1
+            # no point inside: the whole slice goes to the next point
+            table.append(self._owners[pos % len(self._points)] if start == pos else -1)
+        self._table = table
+
+    def _hash(self, key: Any) -> int:
+        # the bytes write_bulk sends for the key, so a key hashes the same whatever its type
+        if isinstance(key, str):
+            key = key.encode(self.config.encoding, self.config.errors)
+        elif isinstance(key, bool):
+            raise ProtocolError("can't pack bool as a bulk string")
+        elif isinstance(key, int):
+            key = b"%d" % key
+        elif isinstance(key, float):
+            key = repr(key).encode()
+        elif isinstance(key, memoryview):
+            key = bytes(key)
+        elif not isinstance(key, (bytes, bytearray)):
+            raise ProtocolError(f"can't pack type {type(key).__name__} as a bulk string")
+        start = key.find(b"{")
+        if start != -1:
+            end = key.find(b"}", start + 1)
+            if end > start + 1:
+                key = key[start + 1:end]
+        return crc32(key)
+
+    def node_index(self, key: Any) -> int:
+        h = self._hash(key)
+        index = self._table[h >> self._shift]
+        if index != -1:
+            return index
+        return self._owners[bisect_left(self._points, h) % len(self._points)]
+
+    def node_for(self, key: Any) -> str:
+        return self.nodes[self.node_index(key)]
+
+
+class ShardedClient:
+    """
+    Routes commands by key to one ``execute`` per node (the same contract as Batcher's:
+    a list of commands in, their replies out). A pipeline is grouped into one batch per
+    node, the batches run concurrently and the replies come back in the original order.
+    MGET, MSET, DEL, UNLINK, EXISTS and TOUCH over keys of several nodes are split and
+    merged; an error from any part is the reply of the whole command. Other commands go
+    where their first key (or the first key of EVAL/EVALSHA/FCALL) lives
+    """
+
+    def __init__(self, nodes: Dict[str, Execute], vnodes: int = 160, config: Optional[Config] = None):
+        self.nodes = dict(nodes)
+        self.ring = HashRing(list(self.nodes), vnodes, config=config)
+        self._executes = [self.nodes[name] for name in self.ring.nodes]
+
+    def node_for(self, key: Any) -> str:
+        return self.ring.node_for(key)
+
+    async def execute(self, *command) -> Any:
+        return (await self.pipeline((command,)))[0]
+
+    async def mget(self, *keys) -> Any:
+        return await self.execute("MGET", *keys)
+
+    def _route(self, command: Sequence) -> int:
+        name = command[0]
+        name = (name.decode() if isinstance(name, (bytes, bytearray)) else name).upper()
+        position = KEY_POSITION.get(name, 1)
+        if name in KEY_POSITION and len(command) > 2 and int(command[2]) == 0:
+            position = len(command)  # no key at all
+        if position >= len(command):
+            raise ValueError(f"can't route {name} without a key")
+        return self.ring.node_index(command[position])
+
+    async def pipeline(self, commands: Sequence[Sequence]) -> List[Any]:
+        ring = self.ring
+        batches = {}  # type: Dict[int, List[Tuple]]
+        # per command: (merge, [(node, index in its batch, positions of the keys)], key count)
+        plan = []
+
+        def add(node: int, command: Tuple) -> int:
+            batch = batches.setdefault(node, [])
+            batch.append(command)
+            return len(batch) - 1
+
+        for command in commands:
+            command = tuple(command)
+            name = command[0]
+            name = (name.decode() if isinstance(name, (bytes, bytearray)) else name).upper()
+            spec = MULTI_KEY.get(name)
+            if spec is not None and len(command) > spec[0] + spec[1]:
+                first, step, merge = spec
+                groups = {}  # type: Dict[int, Tuple[list, List[int]]]
+                for n, i in enumerate(range(first, len(command), step)):
+                    args, positions = groups.setdefault(ring.node_index(command[i]), ([], []))
+                    args.extend(command[i:i + step])
+                    positions.append(n)
+                if len(groups) > 1:
+                    parts = [(node, add(node, command[:first] + tuple(args)), positions)
+                             for node, (args, positions) in groups.items()]
+                    plan.append((merge, parts, (len(command) - first) // step))
+                    continue
+            node = self._route(command)
+            plan.append((None, [(node, add(node, command), None)], 0))
+
+        nodes = list(batches)
+        results = await asyncio.gather(*(self._executes[node](batches[node]) for node in nodes))
+        replies = dict(zip(nodes, results))
+        out = []
+        for merge, parts, count in plan:
+            pieces = [replies[node][index] for node, index, _ in parts]
+            error = next((piece for piece in pieces if isinstance(piece, ReplyError)), None)
+            if merge is None or error is not None:
+                out.append(pieces[0] if error is None else error)
+            elif merge == "list":
+                merged = [None] * count
+                for (_, _, positions), piece in zip(parts, pieces):
+                    for position, value in zip(positions, piece):
+                        merged[position] = value
+                out.append(merged)
+            elif merge == "sum":
+                out.append(sum(pieces))
+            else:
+                out.append(pieces[0])
+        return out
@@ -0,0 +1,198 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+Sampling tracer for commands and replies. Attaching swaps the connection's class for a
+traced subclass, detached connections run the plain methods untouched
+"""
+import random
+from collections import deque
+from time import perf_counter
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from sioresp.exceptions import ProtocolError
+
+
+class Sample:
+    __slots__ = ("kind", "name", "size", "type", "duration")
+
+    def __init__(self, kind: str, name: Optional[str], size: Optional[int], type: Optional[str], duration: float):
+        self.kind = kind  # "send" or "reply"
+        self.name = name  # command name, for replies the one sent with send_command it answers
+        self.size = size  # encoded bytes, or reply bytes on the wire (None for hiredis)
+        self.type = type  # reply type, the event name like Array or ReplyError, or the error that dropped it
+        self.duration = duration  # seconds spent encoding, or parsing and assembling
+
+    def __repr__(self):
+        return (f"Sample(kind={self.kind!r}, name={self.name!r}, size={self.size!r}, type={self.type!r}, "
+                f"duration={self.duration!r})")
+
+
+class Tracer:
+    """
+    Records a ``rate`` fraction of the commands sent with send_command and of their replies,
+    into a ring buffer of ``size`` samples, or to ``callback`` when one is given.
+    Replies are matched to commands in order, so push frames and commands written some
+    other way (RespWriter, a client) shift the names
+    """
+
+    def __init__(self, rate: float = 1.0, size: int = 1024, callback: Optional[Callable[[Sample], Any]] = None,
+                 seed: Optional[int] = None):
+        self.rate = rate
+        self.callback = callback
+        self.samples = deque(maxlen=size)  # type: Deque[Sample]
+        self._random = random.Random(seed).random
+
+    def sampled(self) -> bool:
+        return self.rate >= 1 or self._random() < self.rate
+
+    def record(self, sample: Sample) -> None:
+        if self.callback is not None:
+            self.callback(sample)
+        else:
+            self.samples.append(sample)
+
+    def attach(self, connection) -> None:
+        cls = type(connection)
+        if isinstance(connection, _Traced):
+            cls = cls.__bases__[1]
+        connection._tracer = self
+        connection._trace_pending = deque()  # (command name, sampled) waiting for their replies
+        # parse time of each complete reply not returned yet, unknown for those parsed before
+        connection._trace_parsed = deque([0.0] * len(connection._reply_ends))
+        connection._trace_parse_time = 0.0  # of the reply being parsed so far
+        connection.__class__ = _traced_class(cls)
+
+    @staticmethod
+    def detach(connection) -> None:
+        if isinstance(connection, _Traced):
+            connection.__class__ = type(connection).__bases__[1]
+            del connection._tracer, connection._trace_pending, connection._trace_parsed, connection._trace_parse_time
+
+    def top(self, n: int = 10, by: str = "duration", kind: Optional[str] = None) -> List[Sample]:
+        """
+        :param n:
+        :param by: "duration" or "size"
+        :param kind: only "send" or "reply" samples
+        :return: the n slowest or largest samples in the ring buffer
+        """
+        samples = [s for s in self.samples if (kind is None or s.kind == kind) and getattr(s, by) is not None]
+        return sorted(samples, key=lambda s: getattr(s, by), reverse=True)[:n]
+
+    def report(self, n: int = 10) -> str:
+        lines = []
+        for by in ("duration", "size"):
+            lines.append(f"top {n} by {by}")
+            lines.append(f"{'kind':<6}{'command':<16}{'type':<14}{'bytes':>10}{'us':>10}")
+            for s in self.top(n, by):
+                lines.append(f"{s.kind:<6}{s.name or '?':<16}{s.type or '':<14}"
+                             f"{'' if s.size is None else s.size:>10}{s.duration * 1e6:>10.1f}")
+        return "\n".join(lines)
+
+
+class _Traced:
+    def send_command(self, *args) -> bytes:
+        tracer = self._tracer
+        sampled = tracer.sampled()
+        start = perf_counter() if sampled else 0.0
+        data = super().send_command(*args)
+        name = args[0].decode() if isinstance(args[0], (bytes, bytearray)) else str(args[0])
+        name = name.upper()
+        if sampled:
+            tracer.record(Sample("send", name, len(data), None, perf_counter() - start))
+        self._trace_pending.append((name, sampled))
+        return data
+
+    def reset(self):
+        super().reset()
+        self._trace_pending.clear()
+        self._trace_parsed.clear()
+        self._trace_parse_time = 0.0
+
+    def _parse(self) -> None:
+        # the time of a call is shared by the replies it completes, or carried to the next one
+        ends = self._reply_ends
+        before = len(ends)
+        start = perf_counter()
+        try:
+            super()._parse()
+        finally:
+            self._trace_parse_time += perf_counter() - start
+            done = len(ends) - before
+            if done > 0:
+                self._trace_parsed.extend([self._trace_parse_time / done] * done)
+                self._trace_parse_time = 0.0
+
+    def _take_parsed(self, before: int) -> float:
+        # replies returned or dropped since len(_reply_ends) was before take their parse time along
+        parsed = self._trace_parsed
+        n = min(before - len(self._reply_ends), len(parsed))
+        if n <= 0:
+            return 0.0
+        taken = parsed.popleft()
+        for _ in range(n - 1):
+            parsed.popleft()
+        return taken
+
+    def discard(self, n: int = 1) -> None:
+        pending = self._trace_pending
+        for _ in range(min(n, len(pending))):
+            pending.popleft()
+        before = len(self._reply_ends)
+        super().discard(n)
+        self._take_parsed(before)
+        if self._discard:  # the reply being parsed is skipped, so is its time
+            self._trace_parse_time = 0.0
+
+    def __next__(self):
+        return self._traced_reply(super().__next__)
+
+    def next_with(self, visitor):
+        return self._traced_reply(super().next_with, visitor)
+
+    def _traced_reply(self, method, *args):
+        pending = self._trace_pending
+        if pending:
+            name, sampled = pending[0]
+        else:
+            name, sampled = None, self._tracer.sampled()
+        before = len(self._reply_ends)
+        if not sampled:
+            try:
+                reply = method(*args)
+            except (ProtocolError, ValueError):  # the reply was dropped, its command goes with it
+                if pending:
+                    pending.popleft()
+                raise
+            finally:
+                self._take_parsed(before)
+            if pending:
+                pending.popleft()
+            return reply
+        events = self._events
+        type_ = type(events[0]).__name__ if events and self._reply_ends and self._streamed is None else None
+        returned = self._returned
+        start = perf_counter()
+        try:
+            reply = method(*args)
+        except (ProtocolError, ValueError) as e:
+            if pending:
+                pending.popleft()
+            self._tracer.record(Sample("reply", name, None, type(e).__name__, perf_counter() - start))
+            raise
+        finally:
+            duration = perf_counter() - start + self._take_parsed(before)
+        if pending:
+            pending.popleft()
+        size = (self._returned - returned) or None  # hiredis keeps no offsets
+        self._tracer.record(Sample("reply", name, size, type_ or type(reply).__name__, duration))
+        return reply
+
+
+_traced_classes = {}  # type: Dict[type, type]
+
+
+def _traced_class(cls: type) -> type:
+    traced = _traced_classes.get(cls)
+    if traced is None:
+        traced = _traced_classes[cls] = type(f"Traced{cls.__name__}", (_Traced, cls), {})
+    return traced
@@ -0,0 +1,163 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+
+SAX style consumption of replies, see Connection.next_with
+"""
+from types import MappingProxyType
+from typing import Any
+
+from sioresp.codecs import MAGIC, decode_value
+from sioresp.events import ReplyError
+
+
+class Visitor:
+    """
+    Gets called for every value of one reply in wire order, begin_* with the element
+    count (pairs for maps and attributes) and end_* once all elements were visited.
+    An attribute's end_attribute comes before the value it belongs to.
+    Null arrays and null bulk strings come as on_null. A view passed to on_bulk is only
+    meant for the call, copy what has to be kept. next_with returns result()
+    """
+
+    def begin_array(self, n: int) -> None:
+        pass
+
+    def end_array(self) -> None:
+        pass
+
+    def begin_set(self, n: int) -> None:
+        pass
+
+    def end_set(self) -> None:
+        pass
+
+    def begin_map(self, n: int) -> None:
+        pass
+
+    def end_map(self) -> None:
+        pass
+
+    def begin_attribute(self, n: int) -> None:
+        pass
+
+    def end_attribute(self) -> None:
+        pass
+
+    def begin_push(self, n: int) -> None:
+        pass
+
+    def end_push(self) -> None:
+        pass
+
+    def on_bulk(self, view: memoryview) -> None:
+        """
+        bulk, simple and verbatim strings
+        """
+
+    def on_error(self, err: ReplyError) -> None:
+        pass
+
+    def on_int(self, value: int) -> None:
+        pass
+
+    def on_double(self, value: float) -> None:
+        pass
+
+    def on_bool(self, value: bool) -> None:
+        pass
+
+    def on_null(self) -> None:
+        pass
+
+    def on_value(self, value: Any) -> None:
+        """
+        events of types added by subclasses of Connection, already post processed
+        """
+
+    def result(self) -> Any:
+        return None
+
+
+class BuildVisitor(Visitor):
+    """
+    builds the same objects next() returns, attributes go to connection.attributes
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.config = connection.config
+        self.intern = connection.intern if self.config.intern_cache_size else None
+        self._stack = []  # [container, is map like, key waiting for its value]
+        self._result = None
+        self._attributes = None
+
+    def _add(self, value: Any) -> None:
+        if not self._stack:
+            self._result = value
+            return
+        frame = self._stack[-1]
+        container = frame[0]
+        if frame[1]:
+            if frame[2] is None:
+                frame[2] = (self.intern(value) if self.intern is not None else value,)
+                return
+            key = frame[2][0]
+            frame[2] = None
+            if isinstance(container, dict):
+                container[key] = value
+            else:
+                container.append((key, value))
+        elif isinstance(container, set):
+            container.add(value)
+        else:
+            container.append(value)
+
+    def _end(self) -> None:
+        container = self._stack.pop()[0]
+        if self.config.immutable_containers:
+            if isinstance(container, list):
+                container = tuple(container)
+            elif isinstance(container, set):
+                container = frozenset(container)
+            else:
+                container = MappingProxyType(container)
+        self._add(container)
+
+    def begin_array(self, n: int) -> None:
+        self._stack.append([[], False, None])
+
+    def begin_set(self, n: int) -> None:
+        self._stack.append([set(), False, None])
+
+    def begin_map(self, n: int) -> None:
+        self._stack.append([{} if self.config.dict_for_map else [], True, None])
+
+    def begin_attribute(self, n: int) -> None:
+        self._stack.append([[], True, None])
+
+    def end_attribute(self) -> None:
+        if self._attributes is None:
+            self._attributes = []
+        attribute = self._stack.pop()[0]
+        self._attributes.append(tuple(attribute) if self.config.immutable_containers else attribute)
+
+    begin_push = begin_array
+    end_array = end_set = end_map = end_push = _end
+
+    def on_bulk(self, view: memoryview) -> None:
+        if self.config.value_codecs and view[:2] == MAGIC:
+            self._add(decode_value(self.config, view))
+        else:
+            self._add(bytes(view))
+
+    def on_null(self) -> None:
+        self._add(None)
+
+    on_error = on_int = on_double = on_bool = on_value = _add
+
+    def result(self) -> Any:
+        result = self._result
+        self._result = None
+        self.connection.attributes = self._attributes or ()
+        self._attributes = None
+        return result
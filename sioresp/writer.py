@@ -0,0 +1,237 @@
+"""
+Copyright (c) 2008-2021 synodriver <synodriver@gmail.com>
+"""
+from typing import Any, Iterable, Optional, Sequence, Union
+
+from sioresp.config import Config, Value
+from sioresp.exceptions import ProtocolError
+
+
+class RespWriter:
+    """
+    Encode straight into a reusable buffer. A bytearray keeps its capacity across clear() and
+    grows when needed, a memoryview is a fixed preallocated area and raises BufferError when full.
+    Also usable as the ``out`` argument of Encoder.encode_items since it supports ``+=``
+    """
+
+    def __init__(self, config: Config, buffer: Optional[Union[bytearray, memoryview]] = None,
+                 encoder: Optional["Encoder"] = None):
+        self.config = config
+        self._encoder = encoder
+        self._escape = None  # sioresp.codecs.escape, only loaded when value_codecs is set
+        if config.value_codecs:
+            from sioresp.codecs import escape
+
+            self._escape = escape
+        self._buf = bytearray(4096) if buffer is None else buffer
+        self._pos = 0
+
+    @property
+    def encoder(self) -> "Encoder":
+        """
+        used by write_element, created on first use unless one was given
+        :return:
+        """
+        if self._encoder is None:
+            from sioresp.encoder import Encoder
+
+            self._encoder = Encoder(self.config)
+        return self._encoder
+
+    def __len__(self) -> int:
+        return self._pos
+
+    def __iadd__(self, data) -> "RespWriter":
+        self.write(data)
+        return self
+
+    def write(self, data) -> None:
+        """
+        raw bytes, nothing is added
+        :param data:
+        :return:
+        """
+        end = self._pos + len(data)
+        if end > len(self._buf):
+            self._grow(end)
+        self._buf[self._pos:end] = data
+        self._pos = end
+
+    def _write_parts(self, *parts) -> None:
+        # all or nothing, the room is checked once before anything is copied
+        end = self._pos + sum(map(len, parts))
+        if end > len(self._buf):
+            self._grow(end)
+        buf = self._buf
+        pos = self._pos
+        for part in parts:
+            buf[pos:pos + len(part)] = part
+            pos += len(part)
+        self._pos = end
+
+    @property
+    def capacity(self) -> int:
+        """
+        the size of the buffer: a bytearray grows past it when needed, a memoryview's is fixed
+        :return:
+        """
+        return len(self._buf)
+
+    def _grow(self, size: int) -> None:
+        if not isinstance(self._buf, bytearray):
+            raise BufferError(f"preallocated buffer is full, {size} bytes needed")
+        capacity = len(self._buf)
+        self._buf.extend(bytes(max(size, capacity * 2) - capacity))
+
+    def getbuffer(self) -> memoryview:
+        """
+        view of the encoded bytes, release it before writing again
+        :return:
+        """
+        return memoryview(self._buf)[:self._pos]
+
+    def getvalue(self) -> bytes:
+        return bytes(self._buf[:self._pos])
+
+    def clear(self) -> None:
+        """
+        start over, the capacity is kept
+        :return:
+        """
+        self._pos = 0
+
+    def truncate(self, size: int) -> None:
+        """
+        drop what was written after the first size bytes, eg. a half written command
+        :param size:
+        :return:
+        """
+        if size < self._pos:
+            self._pos = size
+
+    def flush_to(self, transport) -> int:
+        """
+        hand the encoded bytes to a socket (sendall) or a transport (write) and clear.
+        sockets get the memory directly, write() gets a bytes copy since asyncio transports
+        may hold on to the data after returning
+        :param transport:
+        :return: bytes flushed
+        """
+        n = self._pos
+        if n == 0:
+            return 0
+        sendall = getattr(transport, "sendall", None)
+        with memoryview(self._buf) as view, view[:n] as data:
+            if sendall is not None:
+                sendall(data)
+            else:
+                transport.write(bytes(data))
+        self._pos = 0
+        return n
+
+    def write_array_header(self, length: int) -> None:
+        self.write(b"*%d\r\n" % length)
+
+    def write_map_header(self, length: int) -> None:
+        """
+        resp 3
+        :param length: count of key value pairs
+        :return:
+        """
+        self.write(b"%%%d\r\n" % length)
+
+    def write_set_header(self, length: int) -> None:
+        """
+        resp 3
+        :param length:
+        :return:
+        """
+        self.write(b"~%d\r\n" % length)
+
+    def write_push_header(self, length: int) -> None:
+        """
+        resp 3
+        :param length:
+        :return:
+        """
+        if self.config.resp_version == 2:
+            raise ProtocolError("resp version2 doesn't support push type")
+        self.write(b">%d\r\n" % length)
+
+    def write_bulk(self, data: Union[str, bytes, bytearray, memoryview, int, float, Value]) -> None:
+        """
+        numbers are written as their text form, like redis expects in commands.
+        Value goes through Config.value_codecs
+        :param data:
+        :return:
+        """
+        if isinstance(data, str):
+            data = data.encode(self.config.encoding, self.config.errors)
+        elif isinstance(data, bool):
+            raise ProtocolError("can't pack bool as a bulk string")
+        elif isinstance(data, int):
+            data = b"%d" % data
+        elif isinstance(data, float):
+            data = repr(data).encode()
+        elif isinstance(data, Value):
+            from sioresp.codecs import encode_value
+
+            tag, data = encode_value(self.config, data.value)
+            self._write_parts(b"$%d\r\n" % (len(tag) + len(data)), tag, data, b"\r\n")
+            return
+        elif not isinstance(data, (bytes, bytearray, memoryview)):
+            raise ProtocolError(f"can't pack type {type(data).__name__} as a bulk string")
+        if self._escape is not None:
+            tag = self._escape(self.config, data)
+            self._write_parts(b"$%d\r\n%s" % (len(tag) + len(data), tag), data, b"\r\n")
+        else:
+            self._write_parts(b"$%d\r\n" % len(data), data, b"\r\n")
+
+    def write_string(self, string: Union[str, bytes, bytearray]) -> None:
+        if isinstance(string, str):
+            string = string.encode(self.config.encoding, self.config.errors)
+        self.write(b"+%s\r\n" % string)
+
+    def write_error(self, err: Union[str, bytes, bytearray]) -> None:
+        if isinstance(err, str):
+            err = err.encode(self.config.encoding, self.config.errors)
+        self.write(b"-%s\r\n" % err)
+
+    def write_integer(self, ele: int) -> None:
+        self.write(b":%d\r\n" % ele)
+
+    def write_null(self) -> None:
+        self.write(b"$-1\r\n" if self.config.resp_version == 2 else b"_\r\n")
+
+    def write_element(self, ele: Any) -> None:
+        """
+        same wire format as Connection.pack_element
+        :param ele:
+        :return:
+        """
+        self.encoder.encode_items(self, (ele,))
+
+    def write_command(self, *args) -> None:
+        """
+        a redis command, every argument is sent as a bulk string. Nothing of it is left in
+        the buffer when an argument can't be packed or a memoryview buffer is full
+        :param args:
+        :return:
+        """
+        pos = self._pos
+        try:
+            self.write_array_header(len(args))
+            for arg in args:
+                self.write_bulk(arg)
+        except Exception:
+            self._pos = pos
+            raise
+
+    def write_commands(self, commands: Iterable[Sequence]) -> None:
+        """
+        pipeline several commands into the buffer
+        :param commands:
+        :return:
+        """
+        for args in commands:
+            self.write_command(*args)
@@ -0,0 +1,65 @@
+import os
+import tempfile
+from collections import Counter
+from unittest import TestCase
+
+from sioresp import Connection, Config
+from sioresp.aof import AofReader
+from sioresp.exceptions import ProtocolError
+
+
+def count_commands(records):
+    return Counter(bytes(command[0]) for offset, command in records)
+
+
+class TestAof(TestCase):
+    def setUp(self) -> None:
+        con = Connection(Config())
+        self.commands = []
+        data = bytearray()
+        for i in range(200):
+            # values that look like commands, to trip naive splitting
+            command = (b"SET", b"key%d" % i, b"\r\n" + b"*1\r\n$4\r\nPING\r\n" * (i % 5))
+            if i % 50 == 0:
+                command = (b"INCR", b"counter")
+                data += b"#TS:1628217470\r\n"
+            self.commands.append(list(command))
+            data += con.send_command(*command)
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.write(b"*3\r\n$3\r\nSET\r\n$1\r\nk")  # truncated by a crash
+        self.size = len(data)
+
+    def tearDown(self) -> None:
+        os.unlink(self.path)
+
+    def test_records(self):
+        with AofReader(self.path) as reader:
+            commands = [[bytes(arg) for arg in command] for offset, command in reader]
+            self.assertEqual(commands, self.commands)
+            self.assertEqual(reader.position, self.size)
+            offset, command = next(reader.records(copy=True))
+            self.assertEqual((offset, command), (16, [b"INCR", b"counter"]))
+            del commands, command
+
+    def test_malformed(self):
+        with open(self.path, "wb") as f:
+            f.write(b"*2\r\n$3\r\nGET\r\n$x\r\nk\r\n")
+        with AofReader(self.path) as reader:
+            with self.assertRaises(ProtocolError):
+                list(reader)
+
+    def test_close_with_views(self):
+        reader = AofReader(self.path)
+        offset, command = next(iter(reader))
+        reader.close()  # the views keep the mapping alive instead of raising BufferError
+        self.assertEqual(bytes(command[0]), b"INCR")
+
+    def test_parallel(self):
+        with AofReader(self.path) as reader:
+            offsets = {offset for offset, command in reader.records(copy=True)}
+            splits = {reader.boundary_after(reader.size * i // 16) for i in range(1, 16)}
+            self.assertTrue(splits - offsets)  # some splits land inside a value
+            counts = reader.parallel_map(count_commands, workers=16)
+        self.assertEqual(sum(counts, Counter()), Counter({b"SET": 196, b"INCR": 4}))
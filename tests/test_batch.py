@@ -0,0 +1,95 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from sioresp.batch import Batcher
+from sioresp.events import ReplyError
+from sioresp.exceptions import ProtocolError
+
+DATA = {b"a": b"1", b"b": b"2"}
+HASH = {b"f": b"x", b"g": b"y"}
+
+
+class Server:
+    def __init__(self):
+        self.batches = []
+
+    def answer(self, command):
+        name, *args = command
+        if name == "MGET":
+            return [DATA.get(k) for k in args]
+        if name == "GET":
+            return DATA.get(args[0])
+        if name == "HMGET":
+            return [HASH.get(f) for f in args[1:]]
+        if name == "HGET":
+            return HASH.get(args[1])
+        if name == "EXISTS":
+            return int(args[0] in DATA)
+        return ReplyError(b"ERR unknown command")
+
+    async def execute(self, commands):
+        self.batches.append(commands)
+        await asyncio.sleep(0)
+        return [self.answer(command) for command in commands]
+
+
+class TestBatcher(IsolatedAsyncioTestCase):
+    async def test_coalesce(self):
+        server = Server()
+        batcher = Batcher(server.execute)
+        results = await asyncio.gather(
+            batcher.get(b"a"), batcher.get(b"b"), batcher.get(b"a"), batcher.get(b"c"),
+            batcher.hget(b"h", b"f"), batcher.hget(b"h", b"g"), batcher.exists(b"a"), batcher.exists(b"a"),
+            batcher.call("NOPE"))
+        self.assertEqual(results[:8], [b"1", b"2", b"1", None, b"x", b"y", 1, 1])
+        self.assertIsInstance(results[8], ReplyError)
+        self.assertEqual(server.batches, [[("MGET", b"a", b"b", b"c"), ("HMGET", b"h", b"f", b"g"),
+                                           ("EXISTS", b"a"), ("NOPE",)]])
+        self.assertEqual(batcher._inflight, {})
+
+    async def test_single_flight(self):
+        server = Server()
+        batcher = Batcher(server.execute)
+        first = asyncio.ensure_future(batcher.get(b"a"))
+        await asyncio.sleep(0)  # the first batch is in flight now
+        second = batcher.get(b"a")
+        third = asyncio.ensure_future(batcher.get(b"b"))
+        self.assertEqual(await asyncio.gather(first, second, third), [b"1", b"1", b"2"])
+        self.assertEqual(server.batches, [[("GET", b"a")], [("GET", b"b")]])
+
+    async def test_max_batch_and_errors(self):
+        async def broken(commands):
+            raise ConnectionError("gone")
+
+        batcher = Batcher(broken, max_batch=2)
+        calls = [batcher.get(b"a"), batcher.get(b"b"), batcher.get(b"c")]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        self.assertTrue(all(isinstance(r, ConnectionError) for r in results))
+
+    async def test_short_replies(self):
+        async def short(commands):
+            return [[b"1"]] + [None] * (len(commands) - 2)  # one reply missing, MGET short
+
+        batcher = Batcher(short)
+        calls = [batcher.get(b"a"), batcher.get(b"b"), batcher.exists(b"a")]
+        results = await asyncio.wait_for(asyncio.gather(*calls, return_exceptions=True), 1)
+        self.assertTrue(all(isinstance(r, ProtocolError) for r in results))
+
+        async def mget_short(commands):
+            return [[b"1"], 1]
+
+        batcher = Batcher(mget_short)
+        calls = [batcher.get(b"a"), batcher.get(b"b"), batcher.exists(b"a")]
+        results = await asyncio.wait_for(asyncio.gather(*calls, return_exceptions=True), 1)
+        self.assertIsInstance(results[0], ProtocolError)
+        self.assertIsInstance(results[1], ProtocolError)
+        self.assertEqual(results[2], 1)
+
+    async def test_cancel_one(self):
+        server = Server()
+        batcher = Batcher(server.execute)
+        first = asyncio.ensure_future(batcher.get(b"a"))
+        second = asyncio.ensure_future(batcher.get(b"a"))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, b"1")
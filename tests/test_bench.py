@@ -0,0 +1,22 @@
+import contextlib
+import io
+from unittest import TestCase
+
+from sioresp.bench import main, make_commands, parse_mix, percentile
+
+
+class TestBench(TestCase):
+    def test_mix(self):
+        self.assertEqual(parse_mix("get=8, set=2,ping"), {"get": 8, "set": 2, "ping": 1})
+        with self.assertRaises(ValueError):
+            parse_mix("flushall=1")
+        commands = make_commands({"lrange": 1}, 3, 4, 10, 5)
+        self.assertEqual(commands[0][2:], (0, 4))
+        self.assertEqual(percentile([1, 2, 3, 4], 0.5), 3)
+
+    def test_run(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            main(["-n", "300", "-c", "2", "-P", "8", "--mix", "get,set,incr,ping,lrange", "--server", "thread",
+                  "--engines", "python"])
+        self.assertIn("python", out.getvalue().splitlines()[-1])
@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+from sioresp import Connection
+from sioresp.bulk import hset, mset, zadd
+from sioresp.codecs import Value
+from sioresp.config import Config
+from sioresp.exceptions import ProtocolError
+from sioresp.writer import RespWriter
+
+
+def expected(config, *commands):
+    writer = RespWriter(config)
+    writer.write_commands(commands)
+    return bytes(writer.getvalue())
+
+
+class TestBulk(TestCase):
+    def setUp(self) -> None:
+        self.config = Config()
+
+    def test_mset(self):
+        data, n = mset(self.config, {"a": 1, b"b": 2.5, "c": b"x"})
+        self.assertEqual(n, 1)
+        self.assertIsInstance(data, bytearray)
+        self.assertEqual(bytes(data), expected(self.config, ("MSET", "a", 1, b"b", 2.5, "c", b"x")))
+        data, _ = mset(self.config, (["a", "b"], [1, 2]))
+        self.assertEqual(bytes(data), expected(self.config, ("MSET", "a", 1, "b", 2)))
+
+    def test_hset_chunks(self):
+        config = Config(bulk_max_args=4)
+        fields = [f"f{i}" for i in range(5)]
+        data, n = hset(config, "h", (fields, range(5)))
+        self.assertEqual(n, 5)  # the key counts too, one pair fits
+        self.assertEqual(bytes(data), expected(config, *[("HSET", "h", f"f{i}", i) for i in range(5)]))
+        con = Connection(config)
+        con.feed_data(bytes(data))
+        self.assertEqual(len(list(con)), 5)
+        data, n = hset(Config(bulk_max_args=8), "h", (fields, range(5)))
+        self.assertEqual(n, 2)
+        self.assertEqual(bytes(data), expected(config, ("HSET", "h", "f0", 0, "f1", 1, "f2", 2),
+                                               ("HSET", "h", "f3", 3, "f4", 4)))
+        data, n = hset(Config(bulk_max_args=None), "h", (fields, range(5)))
+        self.assertEqual(n, 1)
+        with self.assertRaises(ValueError):
+            zadd(Config(bulk_max_args=5), "z", {"a": 1}, options=("NX", "CH"))
+
+    def test_zadd(self):
+        data, n = zadd(self.config, "z", {"a": 1.5, "b": 2}, options=("NX", "CH"))
+        self.assertEqual(n, 1)
+        self.assertEqual(bytes(data), expected(self.config, ("ZADD", "z", "NX", "CH", 1.5, "a", 2, "b")))
+        data, _ = zadd(self.config, "z", ["a", "b"], [1, 2])
+        self.assertEqual(bytes(data), expected(self.config, ("ZADD", "z", 1, "a", 2, "b")))
+
+    def test_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        data, _ = zadd(self.config, "z", numpy.array(["a", "b"]), numpy.array([0.5, 3.0]))
+        self.assertEqual(bytes(data), expected(self.config, ("ZADD", "z", 0.5, "a", 3.0, "b")))
+
+    def test_value(self):
+        config = Config(value_codecs=["pickle"])
+        data, _ = mset(config, {"a": Value({"x": 1})})
+        self.assertEqual(bytes(data), expected(config, ("MSET", "a", Value({"x": 1}))))
+
+    def test_errors(self):
+        with self.assertRaises(ProtocolError):
+            mset(self.config, {"a": True})
+        with self.assertRaises(ProtocolError):
+            mset(self.config, {"a": None})
+        with self.assertRaises(ValueError):
+            mset(self.config, (["a", "b"], [1]))
+        with self.assertRaises(ValueError):
+            hset(self.config, "h", {})
+        with self.assertRaises(ValueError):
+            zadd(self.config, "z", ["a"])
@@ -0,0 +1,132 @@
+import os
+import socket
+import tempfile
+import threading
+from unittest import TestCase, skipUnless
+
+from sioresp import Connection, Config
+from sioresp.client import Client
+from sioresp.events import ReplyError
+from sioresp.exceptions import CommunicationError
+
+
+class StubServer(threading.Thread):
+    """
+    answers PING, ECHO and SLEEP (nothing until the next command), anything else is an error
+    """
+
+    def __init__(self, sock: socket.socket):
+        super().__init__(daemon=True)
+        self.sock = sock
+        self.con = Connection(Config())
+        self.held = 0
+        self.received = 0
+
+    def run(self):
+        while True:
+            data = self.sock.recv(65536)
+            if not data:
+                break
+            self.received += len(data)
+            self.con.feed_data(data)
+            out = bytearray()
+            for command in self.con:
+                name = command[0].upper()
+                if name == b"SLEEP":
+                    self.held += 1
+                    continue
+                out += b"+late\r\n" * self.held
+                self.held = 0
+                if name == b"PING":
+                    out += b"+PONG\r\n"
+                elif name == b"ECHO":
+                    out += self.con.pack_bulk_string(command[1])
+                else:
+                    out += self.con.pack_error("ERR unknown command")
+            if out:
+                self.sock.sendall(out)
+        self.sock.close()
+
+
+class TestClient(TestCase):
+    def setUp(self) -> None:
+        a, b = socket.socketpair()
+        self.server = StubServer(b)
+        self.server.start()
+        self.client = Client.from_socket(a, timeout=5, sendmsg_threshold=1024)
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.join(5)
+
+    def test_execute(self):
+        self.assertEqual(self.client.execute("PING"), b"PONG")
+        reply = self.client.execute("NOPE")
+        self.assertIsInstance(reply, ReplyError)
+
+    def test_no_address(self):
+        self.assertIsNone(self.client.address)
+        self.client.close()
+        with self.assertRaisesRegex(CommunicationError, "no address"):
+            self.client.execute("PING")
+
+    def test_pipeline(self):
+        big = os.urandom(200000)
+        commands = [("ECHO", big), ("PING",)] + [("ECHO", str(i)) for i in range(2000)]
+        replies = self.client.pipeline(commands)
+        self.assertEqual(replies[0], big)
+        self.assertEqual(replies[1], b"PONG")
+        self.assertEqual(replies[2:], [str(i).encode() for i in range(2000)])
+
+    def test_timeout(self):
+        self.client.timeout = 0.05
+        self.client._sock.settimeout(0.05)
+        with self.assertRaises(socket.timeout):
+            self.client.execute("SLEEP")
+        self.client.timeout = 5
+        self.client._sock.settimeout(5)
+        # the late reply is dropped, the next one lines up
+        self.assertEqual(self.client.execute("ECHO", "x"), b"x")
+
+    def test_unix(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "s.sock")
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(path)
+            listener.listen(1)
+            with Client(path, timeout=5) as client:
+                server = StubServer(listener.accept()[0])
+                server.start()
+                self.assertEqual(client.pipeline([("PING",), ("ECHO", b"a")]), [b"PONG", b"a"])
+            server.join(5)
+            listener.close()
+
+    @skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_fork(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "s.sock")
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(path)
+            listener.listen(2)
+
+            def accept():
+                for _ in range(2):
+                    StubServer(listener.accept()[0]).start()
+
+            threading.Thread(target=accept, daemon=True).start()
+            client = Client(path, timeout=5)
+            self.assertEqual(client.execute("PING"), b"PONG")
+            r, w = os.pipe()
+            pid = os.fork()
+            if not pid:  # the child connects again instead of sharing the parent's socket
+                try:
+                    os.write(w, client.execute("ECHO", "child"))
+                finally:
+                    os._exit(0)
+            os.close(w)
+            self.assertEqual(os.waitpid(pid, 0)[1], 0)
+            self.assertEqual(os.read(r, 100), b"child")
+            os.close(r)
+            self.assertEqual(client.execute("ECHO", "parent"), b"parent")
+            client.close()
+            listener.close()
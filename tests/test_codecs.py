@@ -0,0 +1,84 @@
+import pickle
+import zlib
+from unittest import TestCase
+
+from sioresp import Connection, Config, Value
+from sioresp.codecs import MAGIC, Codec, register_codec, unregister_codec
+from sioresp.exceptions import ProtocolError
+
+
+class TestCodecs(TestCase):
+    def setUp(self) -> None:
+        self.con = Connection(Config(value_codecs=("pickle", "zlib"), value_codec_threshold=100))
+
+    def roundtrip(self, data: bytes):
+        # the server hands back the bulk string we sent
+        self.con.feed_data(data[data.index(b"$", 20):])
+        return next(self.con)
+
+    def test_compress(self):
+        value = {"rows": list(range(100))}
+        data = self.con.send_command("SET", "key", Value(value))
+        self.assertTrue(data.startswith(b"*3\r\n$3\r\nSET\r\n$3\r\nkey\r\n"))
+        body = data[data.index(b"\r\n", 22) + 2:-2]
+        self.assertEqual(body[:5], MAGIC + bytes((2, 16, 1)))
+        self.assertEqual(pickle.loads(zlib.decompress(body[5:])), value)
+        self.assertEqual(self.roundtrip(data), value)
+
+    def test_threshold(self):
+        data = self.con.send_command("SET", "key", Value("small"))
+        self.assertIn(MAGIC + bytes((1, 16)), data)
+        self.assertEqual(self.roundtrip(data), "small")
+
+    def test_raw(self):
+        con = Connection(Config(value_codecs=("zlib",)))
+        self.assertEqual(con.send_command("SET", "k", Value(b"v")), b"*3\r\n$3\r\nSET\r\n$1\r\nk\r\n$1\r\nv\r\n")
+        data = con.send_command(Value(MAGIC + b"looks tagged"))
+        con.feed_data(data)
+        self.assertEqual(next(con), MAGIC + b"looks tagged")
+        con.feed_data(b"+OK\r\n$2\r\nhi\r\n")
+        self.assertEqual([next(con), next(con)], [b"OK", b"hi"])
+        with self.assertRaises(ProtocolError):
+            con.send_command("SET", "k", Value(1))
+
+    def test_writer(self):
+        register_codec(Codec(200, "reverse", lambda b: bytes(b)[::-1], lambda b: bytes(b)[::-1]))
+        self.addCleanup(unregister_codec, "reverse")
+        con = Connection(Config(value_codecs=("reverse",), value_codec_threshold=0))
+        writer = con.writer()
+        writer.write_command("SET", "k", Value(b"abc"))
+        self.assertTrue(writer.getvalue().endswith(b"$7\r\n" + MAGIC + bytes((1, 200)) + b"cba\r\n"))
+        con.feed_data(writer.getvalue())
+        self.assertEqual(next(con), [b"SET", b"k", b"abc"])
+
+    def test_not_enabled(self):
+        # a value tagged with a codec the Config doesn't list is refused, pickle above all
+        con = Connection(Config(value_codecs=("zlib",)))
+        tagged = MAGIC + bytes((1, 16)) + pickle.dumps(ValueError("should not be built"))
+        con.feed_data(b"$%d\r\n%s\r\n+OK\r\n" % (len(tagged), tagged))
+        with self.assertRaisesRegex(ProtocolError, "codec id 16"):
+            next(con)
+        self.assertEqual(next(con), b"OK")
+
+    def test_malformed(self):
+        con = Connection(Config(value_codecs=("zlib",)))
+        bad = MAGIC + bytes((1, 1)) + b"not zlib"
+        con.feed_data(b"$2\r\n%s\r\n*2\r\n$%d\r\n%s\r\n:1\r\n+OK\r\n" % (MAGIC, len(bad), bad))
+        with self.assertRaisesRegex(ProtocolError, "truncated"):
+            next(con)
+        with self.assertRaisesRegex(ProtocolError, "zlib"):
+            next(con)
+        self.assertEqual(next(con), b"OK")
+
+    def test_escape(self):
+        # plain arguments that start with MAGIC come back as they were sent
+        con = Connection(Config(value_codecs=("zlib",)))
+        raw = MAGIC + b"\x01\x01plain"
+        data = con.send_command(raw, raw.decode("latin-1"))
+        writer = con.writer()
+        writer.write_command(raw)
+        con.feed_data(data + bytes(writer.getvalue()))
+        self.assertEqual(next(con), [raw, raw])
+        self.assertEqual(next(con), [raw])
+        con = Connection(Config())
+        self.assertEqual(con.send_command("GET", raw), b"*2\r\n$3\r\nGET\r\n$9\r\n%s\r\n" % raw)
@@ -209,9 +209,15 @@ class TestParse(TestCase):
 
     def test_attr(self):
         self.con.feed_data(b"|1\r\n+key-popularity\r\n%2\r\n$1\r\na\r\n,0.1923\r\n$1\r\nb\r\n,0.0012\r\n")
+        with self.assertRaises(StopIteration):  # an attribute is not a reply of its own
+            next(self.con)
+        self.con.feed_data(b"*2\r\n:2039123\r\n:9543892\r\n")
         data = next(self.con)
-        self.assertEqual(len(data), 1)
-        self.assertEqual(len(data[0][1]), 2)
+        self.assertEqual(data, [2039123, 9543892])
+        self.assertEqual(self.con.attributes, [[(b"key-popularity", [(b"a", 0.1923), (b"b", 0.0012)])]])
+        self.con.feed_data(b"+OK\r\n")
+        self.assertEqual(next(self.con), b"OK")
+        self.assertEqual(self.con.attributes, ())
         self.assertEqual(len(self.con._buffer), 0)
         self.assertEqual(len(self.con._events), 0)
         self.assertEqual(len(self.con._events_backup), 0)
@@ -297,3 +303,158 @@ class TestParse(TestCase):
         self.assertEqual(self.con._parser_state, ParserState.wait_data)
         self.con.reset()
         self.assertEqual(self.con._parser_state, ParserState.wait_data)
+
+    def test_intern(self):
+        con = Connection(Config(resp_version=3, intern_cache_size=2, intern_max_length=5))
+        con.feed_data(b"%2\r\n$4\r\nname\r\n:1\r\n$6\r\nlonger\r\n:2\r\n" * 2)
+        first, second = next(con), next(con)
+        self.assertEqual(first, [(b"name", 1), (b"longer", 2)])
+        self.assertIs(first[0][0], second[0][0])
+        self.assertIsNot(first[1][0], second[1][0])
+        self.assertIs(con.intern(b"na" + b"me"), first[0][0])
+        con.intern(b"a")
+        con.intern(b"b")  # over the bound, the cache starts over
+        self.assertEqual(len(con._intern_cache), 1)
+
+    def test_discard(self):
+        con = Connection(Config(resp_version=3))
+        con.feed_data(b"*2\r\n:1\r\n:2\r\n*2\r\n$5\r\nhel")
+        con.discard(2)  # the queued array and the partial one
+        with self.assertRaises(StopIteration):
+            next(con)
+        con.feed_data(b"lo\r\n%1\r\n+a\r\n:1\r\n+OK\r\n")
+        self.assertEqual(next(con), b"OK")
+        con.discard(2)  # nothing arrived yet
+        con.feed_data(b"$10\r\n01234")
+        self.assertEqual(len(con._buffer), 0)
+        con.feed_data(b"56789\r\n~1\r\n*1\r\n:1\r\n:3\r\n")
+        self.assertEqual(next(con), 3)
+        with self.assertRaises(StopIteration):
+            next(con)
+        self.assertEqual(con.pending_bytes(), 0)
+        self.assertEqual(con._parser_state, ParserState.wait_data)
+
+    def test_reset_midway(self):
+        con = Connection(Config(resp_version=3))
+        for partial in (b"*2\r\n$5\r\nhel", b"$10\r\n0123", b"|1\r\n+a\r\n:1\r\n", b"=9\r\ntxt:a"):
+            con.feed_data(partial)
+            con.discard(1)
+            con.reset()
+            self.assertIsNone(con._current_length)
+            self.assertEqual(con._parser_state, ParserState.wait_data)
+            self.assertEqual(con.attributes, ())
+            con.feed_data(b"$3\r\nfoo\r\n")
+            self.assertEqual(list(con), [b"foo"])
+            self.assertEqual(con.pending_bytes(), 0)
+
+    def test_validation(self):
+        con = Connection(Config(resp_version=3))
+        with self.assertRaisesRegex(ProtocolError, "at offset 12"):
+            con.feed_data(b"+OK\r\n$3\r\nfooXX")
+        con = Connection(Config(resp_version=3, validation="fast"))
+        con.feed_data(b"#t\r\n$3\r\nfoo\r\n_\r\n")
+        self.assertEqual(list(con), [True, b"foo", None])
+        with self.assertRaises(ProtocolError):
+            con.feed_data(b"?1\r\n")
+        with self.assertRaises(ValueError):
+            Connection(Config(validation="none"))
+
+    def test_malformed_numbers(self):
+        for data in (b"$abc\r\n", b"*x\r\n", b"$ 3\r\n"):
+            with self.assertRaisesRegex(ProtocolError, "invalid .*length"):
+                Connection(Config()).feed_data(data)
+        for validation in ("strict", "fast"):
+            con = Connection(Config(resp_version=3, validation=validation))
+            con.feed_data(b"*3\r\n:1\r\n:x\r\n:3\r\n+OK\r\n,1_0\r\n,-inf\r\n:+5\r\n")
+            with self.assertRaises(ProtocolError if validation == "strict" else ValueError):
+                next(con)
+            self.assertEqual(next(con), b"OK")  # the rest of the broken reply is dropped
+            if validation == "strict":
+                with self.assertRaisesRegex(ProtocolError, "invalid double"):
+                    next(con)
+            else:
+                self.assertEqual(next(con), 10.0)
+            self.assertEqual(next(con), float("-inf"))
+            self.assertEqual(next(con), 5)
+
+    def test_attr_alignment(self):
+        data = b"*3\r\n:1\r\n|1\r\n+ttl\r\n:3600\r\n:2\r\n|0\r\n:3\r\n|1\r\n+hint\r\n#t\r\n$2\r\nok\r\n"
+        con = Connection(Config(resp_version=3))
+        con.feed_data(data)
+        self.assertEqual(next(con), [1, 2, 3])
+        self.assertEqual(con.attributes, [[(b"ttl", 3600)], []])
+        self.assertEqual(next(con), b"ok")
+        self.assertEqual(con.attributes, [[(b"hint", True)]])
+        self.assertEqual(con.pending_bytes(), 0)
+
+        con = Connection(Config(resp_version=3, skip_attributes=True))
+        for i in range(len(data)):
+            con.feed_data(data[i:i + 1])
+        self.assertEqual(list(con), [[1, 2, 3], b"ok"])
+        self.assertEqual(con.attributes, ())
+        self.assertEqual(con.pending_bytes(), 0)
+
+        for skip in (False, True):  # discarded in the middle of an attribute
+            con = Connection(Config(resp_version=3, skip_attributes=skip))
+            con.feed_data(data[:23])
+            con.discard()
+            con.feed_data(data[23:])
+            self.assertEqual(list(con), [b"ok"])
+
+    def test_immutable(self):
+        data = b"*3\r\n:1\r\n~1\r\n+a\r\n%1\r\n+k\r\n|1\r\n+ttl\r\n:5\r\n*1\r\n_\r\n*-1\r\n>1\r\n+m\r\n"
+        con = Connection(Config(resp_version=3, immutable_containers=True))
+        con.feed_data(data)
+        self.assertEqual(next(con), (1, frozenset([b"a"]), ((b"k", (None,)),)))
+        self.assertEqual(con.attributes, [((b"ttl", 5),)])
+        self.assertIsNone(next(con))
+        self.assertEqual(next(con), (b"m",))
+        con = Connection(Config(resp_version=3, immutable_containers=True, dict_for_map=True))
+        con.feed_data(b"%1\r\n+k\r\n:1\r\n")
+        m = next(con)
+        self.assertEqual(m, {b"k": 1})
+        with self.assertRaises(TypeError):
+            m[b"k"] = 2
+
+    def test_get_buffer(self):
+        con = Connection(Config())
+        storage = con._buffer.data
+        for chunk in (b"+OK\r\n$5\r\nhel", b"lo\r\n:1", b"\r\n"):
+            with con.get_buffer(16) as view:
+                view[:len(chunk)] = chunk
+            con.buffer_updated(len(chunk))
+        self.assertEqual(list(con), [b"OK", b"hello", 1])
+        self.assertEqual(len(con._buffer), 0)
+        size = len(storage)
+        for _ in range(10):
+            with con.get_buffer(16) as view:
+                view[:5] = b"+OK\r\n"
+            con.buffer_updated(5)
+            self.assertEqual(next(con), b"OK")
+        self.assertIs(con._buffer.data, storage)
+        self.assertEqual(len(storage), size)  # the room is reused, not allocated on every call
+
+    def test_peek(self):
+        con = Connection(Config())
+        self.assertEqual(con.peek(2), [])
+        con.feed_data(b"*2\r\n$2\r\n42\r\n*3")
+        events = con.peek(2)
+        self.assertEqual([type(e).__name__ for e in events], ["Array", "String"])
+        self.assertEqual(bytes(events[1].data), b"42")
+        con.feed_data(b"\r\n:1\r\n:2\r\n:3\r\n")
+        self.assertEqual(next(con), [b"42", [1, 2, 3]])
+        self.assertEqual(con.peek(), [])
+
+    def test_no_cycle(self):
+        import gc
+        import weakref
+
+        gc.disable()
+        try:
+            for config in (Config(), Config(resp_version=3, immutable_containers=True, value_codecs=("pickle",))):
+                con = Connection(config)
+                ref = weakref.ref(con)
+                del con
+                self.assertIsNone(ref())  # freed by reference counting alone
+        finally:
+            gc.enable()
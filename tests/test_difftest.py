@@ -0,0 +1,39 @@
+import contextlib
+import io
+from unittest import TestCase
+
+from sioresp import Connection, Config
+from sioresp.difftest import Mismatch, check, engines, main, make_corpus, parse_splits, reference, run
+
+
+class TestDifftest(TestCase):
+    def test_corpus(self):
+        self.assertEqual(make_corpus(3, 20, seed=1), make_corpus(3, 20, seed=1))
+        for version in (2, 3):
+            data = make_corpus(version, 20, seed=version, attributes=version == 3)
+            self.assertEqual(len(reference(data, version)), 20)
+        self.assertNotIn(b"\r\n%", make_corpus(2, 50, seed=0))
+
+    def test_run(self):
+        for version in (2, 3):
+            data = make_corpus(version, 8, seed=5, max_depth=2)
+            splits = parse_splits("all", len(data))
+            throughput = run(data, splits, engines(["python"], version), version)
+            self.assertEqual(set(throughput), {"python", "python-fast"})
+            self.assertEqual(sorted(throughput["python"]), splits)
+
+    def test_mismatch(self):
+        data = b"*2\r\n:1\r\n#t\r\n"
+        expected = reference(data)
+        self.assertEqual(expected, [[1, ("bool", True)]])
+        with self.assertRaises(Mismatch) as cm:
+            check(data, [[1, 1]], "python", Connection, Config(resp_version=3), 3, "buffer")
+        self.assertEqual((cm.exception.split, cm.exception.index), (3, 0))
+        with self.assertRaises(Mismatch):
+            check(data + b":2\r\n", expected, "python", Connection, Config(resp_version=3), 1)
+
+    def test_main(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(main(["--replies", "10", "--splits", "1,3,max", "--engines", "python"]), 0)
+        self.assertIn("python-fast MB/s", out.getvalue())
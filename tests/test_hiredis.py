@@ -248,3 +248,11 @@ class TestParse(TestCase):
         self.assertEqual(self.con._parser_state, ParserState.wait_data)
         self.con.reset()
         self.assertEqual(self.con._parser_state, ParserState.wait_data)
+
+    def test_next_with(self):
+        from sioresp.visitor import BuildVisitor
+
+        self.con.feed_data(b"*3\r\n:1\r\n$3\r\nfoo\r\n*1\r\n$-1\r\n")
+        self.assertEqual(self.con.next_with(BuildVisitor(self.con)), [1, b"foo", [None]])
+        with self.assertRaises(StopIteration):
+            self.con.next_with(BuildVisitor(self.con))
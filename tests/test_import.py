@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+HEAVY_MODULES = ("hiredis", "multiprocessing", "asyncio", "sioresp.writer", "sioresp.framing", "sioresp.offload",
+                 "sioresp.codecs", "sioresp.encoder", "dataclasses", "inspect", "decimal")
+# bytecode is written and reused, so source compilation doesn't count
+_ENV = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+
+
+def _import_time(code: str) -> int:
+    """
+    microseconds spent importing modules while running code, the least of a few runs,
+    from -X importtime: the cumulative time of every top level import added up
+    """
+    runs = []
+    for _ in range(3):
+        err = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                             env=_ENV, check=True).stderr
+        total = 0
+        for line in err.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit() and not name.startswith("  "):  # nested imports are indented
+                total += int(cumulative)
+        runs.append(total)
+    return min(runs)
+
+
+class TestImport(TestCase):
+    def test_lazy(self):
+        code = f"import sys, sioresp; print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.strip(), "[]")
+
+    def test_budget(self):
+        # against the interpreter's own startup on the same machine, not a wall clock figure.
+        # about 2x here, it was near 5x with dataclasses and the codecs loaded eagerly
+        subprocess.run([sys.executable, "-c", "import sioresp"], env=_ENV, check=True)  # bytecode written first
+        startup = _import_time("pass")
+        self.assertLess(_import_time("import sioresp") - startup, 3.5 * startup)
+
+    def test_backends(self):
+        import sioresp
+        from sioresp import backends
+
+        self.assertIn("python", backends.available())
+        self.assertIs(backends.load("python"), sioresp.Connection)
+        backends.set_default("python")
+        try:
+            self.assertEqual(backends.active(), "python")
+            self.assertIs(backends.get_connection_class(), sioresp.Connection)
+        finally:
+            backends.set_default(None)
+        with self.assertRaises(ImportError):
+            backends.load("nope")
+        self.assertIsNotNone(sioresp.RespWriter)
+        with self.assertRaises(AttributeError):
+            sioresp.Nope
+
+    def test_public_types(self):
+        import dataclasses
+        from enum import Enum
+
+        from sioresp import Config, ParserState
+        from sioresp.events import String, VerbatimString
+
+        config = Config("latin-1", "strict", 3)
+        self.assertEqual(config.resp_version, 3)
+        self.assertEqual(dataclasses.replace(config, resp_version=2), Config("latin-1", resp_version=2))
+        self.assertEqual(config.replace(validation="fast").validation, "fast")
+        self.assertEqual(dataclasses.asdict(config)["encoding"], "latin-1")
+        self.assertEqual(dataclasses.asdict(String(b"a")), {"data": b"a", "len": None})
+        self.assertIsInstance(ParserState.wait_data, Enum)
+
+        @dataclasses.dataclass
+        class Sub(Config):
+            extra: int = 0
+
+        self.assertEqual(Sub("latin-1", extra=1).encoding, "latin-1")
+        self.assertEqual(dataclasses.replace(Sub(extra=1), resp_version=3), Sub(resp_version=3, extra=1))
+        self.assertEqual([f.name for f in dataclasses.fields(VerbatimString)], ["data", "len", "type"])
@@ -0,0 +1,106 @@
+from unittest import TestCase
+
+from sioresp import Connection, Config
+from sioresp.exceptions import LimitExceededError, ProtocolError
+
+
+class TestLimits(TestCase):
+    def test_bulk_length(self):
+        con = Connection(Config(max_bulk_length=10))
+        with self.assertRaises(LimitExceededError):
+            con.feed_data(b"$999999999\r\n")
+        con = Connection(Config(max_bulk_length=10))
+        con.feed_data(b"$10\r\n0123456789\r\n")
+        self.assertEqual(next(con), b"0123456789")
+
+    def test_aggregate_length(self):
+        con = Connection(Config(max_aggregate_length=2))
+        con.feed_data(b"*2\r\n:1\r\n:2\r\n")
+        self.assertEqual(next(con), [1, 2])
+        with self.assertRaises(LimitExceededError):
+            con.feed_data(b"*3\r\n")
+
+    def test_nesting_depth(self):
+        con = Connection(Config(max_nesting_depth=2))
+        con.feed_data(b"*1\r\n*1\r\n:1\r\n")
+        self.assertEqual(next(con), [[1]])
+        with self.assertRaises(LimitExceededError):
+            con.feed_data(b"*1\r\n*1\r\n*1\r\n:1\r\n")
+
+    def test_buffer_size(self):
+        con = Connection(Config(max_buffer_size=8))
+        con.feed_data(b"+OK\r\n+OK")
+        with self.assertRaises(LimitExceededError):
+            con.feed_data(b"OOOOOOOOOOOO")
+        self.assertLessEqual(len(con._buffer), 8)  # refused before it was buffered
+
+    def test_buffer_size_bulk(self):
+        # a bulk max_bulk_length allows is fine, and so is a large feed of small replies
+        con = Connection(Config(max_buffer_size=8))
+        con.feed_data(b"$20\r\n" + b"x" * 20 + b"\r\n" + b"+OK\r\n" * 10)
+        self.assertEqual(list(con), [b"x" * 20] + [b"OK"] * 10)
+        with con.get_buffer() as view:
+            self.assertEqual(len(view), 8)
+            view[:7] = b"$100\r\nx"
+        con.buffer_updated(7)
+        with con.get_buffer() as view:
+            self.assertEqual(len(view), 109)  # the rest of the body and \r\n, then 8 more
+        con.buffer_updated(0)
+
+    def test_pause_reading(self):
+        con = Connection(Config(read_high_water=20, read_low_water=5))
+        self.assertFalse(con.should_pause_reading())
+        con.feed_data(b"*3\r\n$3\r\nfoo\r\n$3\r\nbar")
+        self.assertEqual(con.pending_bytes(), 20)
+        self.assertTrue(con.should_pause_reading())
+        with self.assertRaises(StopIteration):
+            next(con)
+        con.feed_data(b"\r\n:1\r\n+OK\r\n")
+        self.assertEqual(next(con), [b"foo", b"bar", 1])
+        self.assertEqual(con.pending_bytes(), 5)
+        self.assertFalse(con.should_pause_reading())
+        self.assertTrue(con.should_resume_reading())
+        self.assertEqual(next(con), b"OK")
+        self.assertEqual(con.pending_bytes(), 0)
+        con.reset()
+        self.assertEqual(con.pending_bytes(), 0)
+
+
+class TestFramer(TestCase):
+    def test_resume(self):
+        from sioresp.framing import Framer
+
+        data = b"*2\r\n$5\r\nhello\r\n%1\r\n+a\r\n:1\r\n+OK\r\n"
+        framer = Framer()
+        pos = 0
+        for end in range(1, len(data) + 1):
+            pos = framer.scan(data, pos, end)
+            if framer.complete:
+                break
+        self.assertEqual(pos, 27)
+        self.assertEqual(framer.scan(data, pos), len(data))
+        self.assertTrue(framer.complete)
+
+    def test_crlf_split(self):
+        from sioresp.framing import Framer
+
+        for data in (b"$3\r\nfooX\n", b"$3\r\nfoo\rX", b"$3\r\nfooXY"):
+            for step in (1, 2, 3):
+                framer = Framer()
+                pos = 0
+                with self.assertRaises(ProtocolError):
+                    for end in range(step, len(data) + step, step):
+                        pos = framer.scan(data, pos, min(end, len(data)))
+        framer = Framer()
+        pos = 0
+        for end in range(1, 10):
+            pos = framer.scan(b"$3\r\nfoo\r\n", pos, end)
+        self.assertTrue(framer.complete)
+
+    def test_attribute(self):
+        from sioresp.framing import Framer
+
+        data = b"|1\r\n+ttl\r\n:1\r\n*2\r\n|0\r\n:1\r\n:2\r\n+OK\r\n"
+        framer = Framer()
+        self.assertEqual(framer.scan(data), len(data) - 5)  # the attribute goes with the array
+        self.assertTrue(framer.complete)
@@ -0,0 +1,125 @@
+import asyncio
+import os
+from unittest import IsolatedAsyncioTestCase, mock
+
+from sioresp import Connection, Config
+from sioresp.events import ReplyError
+from sioresp.exceptions import CommunicationError, ProtocolError
+from sioresp.multiplex import Multiplexer
+
+
+class TestMultiplexer(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.reads = 0
+
+        async def handle(reader, writer):
+            con = Connection(Config(resp_version=3))
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                self.reads += 1
+                con.feed_data(data)
+                out = bytearray()
+                for command in con:
+                    if command[0] == b"ECHO":
+                        out += b">2\r\n+message\r\n+hi\r\n"  # a push in between
+                        out += con.pack_bulk_string(command[1])
+                    elif command[0] == b"GET":
+                        out += con.pack_bulk_string(command[1])
+                    elif command[0] == b"QUIT":
+                        writer.close()
+                        return
+                    else:
+                        out += con.pack_error("ERR unknown command")
+                writer.write(bytes(out))
+            writer.close()
+
+        self.server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        self.port = port = self.server.sockets[0].getsockname()[1]
+        self.pushes = []
+        self.mux = await Multiplexer.create("127.0.0.1", port, config=Config(resp_version=3),
+                                            connection_class=Connection, push_handler=self.pushes.append)
+
+    async def asyncTearDown(self) -> None:
+        self.mux.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_concurrent(self):
+        results = await asyncio.gather(*(self.mux.execute("ECHO", str(i)) for i in range(2000)),
+                                       self.mux.execute("NOPE"))
+        self.assertEqual(results[:2000], [str(i).encode() for i in range(2000)])
+        self.assertIsInstance(results[2000], ReplyError)
+        self.assertEqual(len(self.pushes), 2000)
+        self.assertLess(self.reads, 100)  # batched, not one write per caller
+        self.assertEqual(await self.mux.pipeline([("ECHO", "a"), ("ECHO", "b")]), [b"a", b"b"])
+
+    async def test_cancel(self):
+        task = asyncio.ensure_future(self.mux.execute("ECHO", "slow"))
+        await asyncio.sleep(0)
+        task.cancel()
+        self.assertEqual(await self.mux.execute("ECHO", "next"), b"next")
+        with self.assertRaises(ProtocolError):
+            await self.mux.pipeline([("ECHO", "ok"), ("ECHO", True)])
+        self.assertEqual(await self.mux.execute("ECHO", "after"), b"after")
+
+    async def test_cancel_discards(self):
+        class Counting(Connection):
+            discarded = 0
+
+            def discard(self, n=1):
+                self.discarded += n
+                super().discard(n)
+
+        mux = await Multiplexer.create("127.0.0.1", self.port, connection_class=Counting)
+        try:
+            task = asyncio.ensure_future(mux.execute("GET", "slow"))
+            await asyncio.sleep(0)
+            task.cancel()
+            self.assertEqual(await mux.execute("GET", "next"), b"next")
+            self.assertEqual(mux.connection.discarded, 1)  # skipped, not built
+        finally:
+            mux.close()
+
+    def test_resp3_needs_peek(self):
+        class NoPeek(Connection):
+            def peek(self, n=1):
+                return None
+
+        with self.assertRaises(ValueError):
+            Multiplexer(Config(resp_version=3), connection_class=NoPeek)
+        Multiplexer(Config(), connection_class=NoPeek)
+
+    async def test_lost(self):
+        with self.assertRaises(CommunicationError):
+            await asyncio.gather(self.mux.execute("ECHO", "a"), self.mux.execute("QUIT"))
+        with self.assertRaises(CommunicationError):
+            await self.mux.execute("ECHO", "a")
+
+    async def test_after_fork(self):
+        inherited = self.mux.transport
+        fd = inherited.get_extra_info("socket").fileno()
+        if hasattr(os, "fork"):
+            pid = os.fork()
+            if not pid:  # the at fork hook has run, the child's copy of the socket is closed
+                try:
+                    os.fstat(fd)
+                except OSError:
+                    os._exit(0)
+                os._exit(1)
+            self.assertEqual(os.waitpid(pid, 0)[1], 0)
+            os.fstat(fd)  # the parent's is still open
+        with mock.patch("sioresp.multiplex.os.close") as close:  # the real one would close the parent's here
+            self.mux._after_fork()  # what a forked child runs
+        close.assert_called_once_with(fd)
+        try:
+            results = await asyncio.gather(self.mux.execute("ECHO", "a"), self.mux.execute("ECHO", "b"))
+            self.assertEqual(results, [b"a", b"b"])
+            self.assertIsNot(self.mux.transport, inherited)
+        finally:
+            inherited.close()
+        mux = Multiplexer(connection_class=Connection)
+        mux._after_fork()
+        with self.assertRaises(CommunicationError):
+            await mux.execute("ECHO", "a")
@@ -0,0 +1,55 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+
+from sioresp import Config
+from sioresp.offload import OffloadConnection, OffloadedReply
+
+
+class TestOffload(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.executor = ProcessPoolExecutor(1)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.executor.shutdown()
+
+    def setUp(self) -> None:
+        self.con = OffloadConnection(Config(resp_version=3), self.executor, threshold=3)
+
+    def test_order(self):
+        self.con.feed_data(b"+OK\r\n*3\r\n$3\r\nfoo\r\n*1\r\n:1\r")
+        self.assertEqual(next(self.con), b"OK")
+        with self.assertRaises(StopIteration):
+            next(self.con)
+        self.con.feed_data(b"\n%1\r\n+a\r\n,1.5\r\n*2\r\n:1\r\n:2\r\n")
+        reply = next(self.con)
+        self.assertIsInstance(reply, OffloadedReply)
+        self.assertEqual(next(self.con), [1, 2])
+        self.assertEqual(reply.result(10), [b"foo", [1], [(b"a", 1.5)]])
+        self.assertEqual(len(self.con._buffer), 0)
+        self.assertEqual(self.con.pending_bytes(), 0)
+
+    def test_await(self):
+        self.con.feed_data(b"~3\r\n:1\r\n:2\r\n:3\r\n")
+        reply = next(self.con)
+
+        async def main():
+            return await reply
+
+        self.assertEqual(asyncio.run(main()), {1, 2, 3})
+
+    def test_own_executor(self):
+        with OffloadConnection(Config(), threshold=2) as con:
+            self.assertIsNone(con.executor)  # nothing started until a reply is offloaded
+            con.feed_data(b"*2\r\n:1\r\n:2\r\n")
+            self.assertEqual(next(con).result(10), [1, 2])
+            executor = con.executor
+        self.assertIsNone(con.executor)
+        with self.assertRaises(RuntimeError):
+            executor.submit(int)  # shut down
+        con = OffloadConnection(Config(), self.executor, threshold=2)
+        con.close()
+        self.assertIs(con.executor, self.executor)  # a shared one is left running
+        self.assertEqual(self.executor.submit(int, "1").result(10), 1)
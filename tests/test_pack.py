@@ -36,3 +36,45 @@ class TestPack(TestCase):
         self.con.feed_data(data)
         ok = next(self.con)
         self.assertEqual(ok, b"OK")
+
+    def test_bool(self):
+        self.assertEqual(self.con.pack_element(True), b"#t\r\n")
+        self.assertEqual(self.con.send_command([1, False]), b"*2\r\n(1\r\n#f\r\n")
+        con2 = Connection(Config(resp_version=2))
+        with self.assertRaises(ProtocolError):
+            con2.pack_element(True)
+        self.assertEqual(con2.pack_element(1), b":1\r\n")
+
+    def test_unsupported(self):
+        with self.assertRaises(ProtocolError):
+            self.con.pack_element(object())
+
+    def test_register_packer(self):
+        from decimal import Decimal
+
+        self.con.register_packer(Decimal, str)
+        self.assertEqual(self.con.send_command("SET", "k", Decimal("1.5")),
+                         b"*3\r\n$3\r\nSET\r\n$1\r\nk\r\n$3\r\n1.5\r\n")
+
+    def test_register_errors(self):
+        from sioresp.encoder import register_packer
+
+        class Celsius(float):
+            pass
+
+        self.con.register_packer(Celsius, lambda c: Celsius(c))
+        with self.assertRaises(ProtocolError):
+            self.con.pack_element(Celsius(1.5))
+
+        class Point:
+            pass
+
+        register_packer(Point, lambda p: "point")  # after the connection was made
+        self.assertEqual(self.con.pack_element(Point()), b"$5\r\npoint\r\n")
+        with self.assertRaises(ValueError):
+            Connection(Config(resp_version=4))
+
+    def test_nested(self):
+        data = self.con.send_command([[[b"a"]], {"k": {1, }}, None])
+        self.con.feed_data(data)
+        self.assertEqual(next(self.con), [[[b"a"]], [(b"k", {1})], None])
@@ -0,0 +1,66 @@
+from unittest import TestCase
+
+from sioresp import Config
+from sioresp.exceptions import ProtocolError
+from sioresp.replication import ReplicationConnection
+
+COMMANDS = b"*1\r\n$4\r\nPING\r\n*3\r\n$3\r\nSET\r\n$1\r\na\r\n$1\r\nb\r\n"
+MARK = b"m" * 40
+
+
+class TestReplication(TestCase):
+    def run_stream(self, data: bytes, step: int):
+        chunks = []
+        con = ReplicationConnection(Config(), lambda chunk: chunks.append(bytes(chunk)))
+        commands = []
+        for i in range(0, len(data), step):
+            con.feed_data(data[i:i + step])
+            for command in con:
+                commands.append((con.offset, command))
+        return con, b"".join(chunks), commands
+
+    def test_fullresync(self):
+        data = b"\n\n+FULLRESYNC abc 100\r\n\n$10\r\n0123456789" + COMMANDS
+        for step in (1, 3, len(data)):
+            con, rdb, commands = self.run_stream(data, step)
+            self.assertEqual(rdb, b"0123456789")
+            self.assertEqual(con.replid, "abc")
+            self.assertEqual(con.rdb_size, 10)
+            self.assertTrue(con.rdb_complete)
+            self.assertEqual(commands, [(114, [b"PING"]), (141, [b"SET", b"a", b"b"])])
+            self.assertEqual(con.ack_command(), b"*3\r\n$8\r\nREPLCONF\r\n$3\r\nACK\r\n$3\r\n141\r\n")
+            self.assertEqual(con.pending_bytes(), 0)
+
+    def test_diskless(self):
+        data = b"+FULLRESYNC abc 0\r\n$EOF:" + MARK + b"\r\nrdb data with m in it" + MARK + COMMANDS
+        for step in (1, 7, len(data)):
+            con, rdb, commands = self.run_stream(data, step)
+            self.assertEqual(rdb, b"rdb data with m in it")
+            self.assertEqual(con.rdb_size, 21)
+            self.assertEqual([command for offset, command in commands], [[b"PING"], [b"SET", b"a", b"b"]])
+
+    def test_reset(self):
+        chunks = []
+        con = ReplicationConnection(Config(), lambda chunk: chunks.append(bytes(chunk)), offset=7, replid="old")
+        con.feed_data(b"+FULLRESYNC abc 100\r\n$5\r\n01234" + COMMANDS)
+        self.assertEqual(next(con), [b"PING"])
+        con.reset()
+        self.assertEqual((con.offset, con.replid, con.rdb_size, con.rdb_received), (7, "old", None, 0))
+        chunks.clear()
+        con.feed_data(b"+FULLRESYNC def 0\r\n$EOF:" + MARK + b"\r\nxy" + MARK + COMMANDS)
+        self.assertEqual(b"".join(chunks), b"xy")
+        self.assertEqual((con.rdb_size, con.rdb_received, con.replid), (2, 2, "def"))
+        self.assertEqual(next(con), [b"PING"])
+        self.assertEqual(con.offset, 14)
+
+    def test_continue(self):
+        con = ReplicationConnection(Config(), None, offset=500)
+        con.feed_data(b"+CONTINUE def\r\n" + COMMANDS)
+        self.assertEqual(next(con), [b"PING"])
+        self.assertEqual(con.offset, 514)
+        self.assertEqual(con.replid, "def")
+
+    def test_refused(self):
+        con = ReplicationConnection(Config(), None)
+        with self.assertRaises(ProtocolError):
+            con.feed_data(b"-NOMASTERLINK Can't SYNC while not connected with my master\r\n")
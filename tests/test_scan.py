@@ -0,0 +1,91 @@
+import socket
+import threading
+from unittest import TestCase
+
+from sioresp import Connection, Config
+from sioresp.client import Client
+from sioresp.exceptions import RedisError
+from sioresp.scan import parallel_scan, scan_iter, scan_pages
+
+PAGE = 10
+
+
+class ScanServer(threading.Thread):
+    def __init__(self, sock, keys, resp_version=2):
+        super().__init__(daemon=True)
+        self.sock = sock
+        self.keys = keys
+        self.con = Connection(Config(resp_version=resp_version))
+
+    def run(self):
+        with self.sock:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    return
+                self.con.feed_data(data)
+                for command in self.con:
+                    name = command[0]
+                    if name in (b"SCAN", b"HSCAN"):
+                        cursor = int(command[1 if name == b"SCAN" else 2])
+                        page = self.keys[cursor:cursor + PAGE]
+                        if name == b"HSCAN":
+                            page = [x for k in page for x in (k, k.upper())]
+                        next_cursor = cursor + PAGE if cursor + PAGE < len(self.keys) else 0
+                        out = self.con.pack_element([str(next_cursor).encode(), page])
+                    else:
+                        out = self.con.pack_error("ERR unknown command")
+                    self.sock.sendall(out)
+
+
+class CountingClient(Client):
+    sends = 0
+
+    def send(self, commands):
+        self.sends += 1
+        super().send(commands)
+
+
+def make_client(keys):
+    a, b = socket.socketpair()
+    ScanServer(b, keys).start()
+    return CountingClient.from_socket(a, timeout=5)
+
+
+class TestScan(TestCase):
+    def setUp(self) -> None:
+        self.keys = [b"k%d" % i for i in range(25)]
+        self.client = make_client(self.keys)
+
+    def tearDown(self) -> None:
+        self.client.close()
+
+    def test_prefetch(self):
+        pages = scan_pages(self.client)
+        self.assertEqual(next(pages), self.keys[:PAGE])
+        self.assertEqual(self.client.sends, 2)  # the second page was asked for before the first was handed out
+        self.assertEqual(list(pages), [self.keys[PAGE:2 * PAGE], self.keys[2 * PAGE:]])
+        self.assertEqual(self.client.sends, 3)
+        self.assertEqual(self.client.execute("SCAN", 0)[1], self.keys[:PAGE])
+
+    def test_close_early(self):
+        items = scan_iter(self.client, "HSCAN", b"h", count=PAGE)
+        self.assertEqual(next(items), (b"k0", b"K0"))
+        items.close()  # the prefetched page is dropped when it arrives
+        self.assertEqual(self.client.execute("HSCAN", b"h", 20), [b"0", [b"k20", b"K20", b"k21", b"K21", b"k22",
+                                                                         b"K22", b"k23", b"K23", b"k24", b"K24"]])
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            next(scan_iter(self.client, "SSCAN"))
+        with self.assertRaises(RedisError):
+            next(scan_iter(self.client, "ZSCAN", b"z"))
+        self.assertEqual(len(list(scan_iter(self.client))), 25)
+
+    def test_parallel(self):
+        other = [b"x%d" % i for i in range(31)]
+        clients = [self.client, make_client(other)]
+        try:
+            self.assertEqual(sorted(parallel_scan(clients, match="*")), sorted(self.keys + other))
+        finally:
+            clients[1].close()
@@ -0,0 +1,92 @@
+from hashlib import sha1
+from unittest import IsolatedAsyncioTestCase
+
+from sioresp.events import ReplyError
+from sioresp.scripts import Scripts
+
+SOURCE = "return redis.call('GET', KEYS[1])"
+
+
+class Server:
+    """
+    runs commands in order and logs every one that has an effect
+    """
+
+    def __init__(self):
+        self.cache = {}
+        self.batches = []
+        self.log = []
+
+    def answer(self, command):
+        name, *args = command
+        if name == "SCRIPT":
+            if args[0] == "EXISTS":
+                return [int(sha in self.cache) for sha in args[1:]]
+            sha = sha1(args[1]).hexdigest()
+            self.cache[sha] = args[1]
+            return sha.encode()
+        if name in ("EVALSHA", "EVALSHA_RO"):
+            if args[0] not in self.cache:
+                return ReplyError(b"NOSCRIPT No matching script. Please use EVAL.")
+            self.log.append(("script", *args[2:]))
+            return [b"ran", *args[2:]]
+        if name in ("SET", "INCR"):
+            self.log.append(tuple(command))
+            return b"OK"
+        if name == "GET":
+            return b"v"
+        return ReplyError(b"ERR unknown command")
+
+    async def execute(self, commands):
+        self.batches.append(list(commands))
+        return [self.answer(command) for command in commands]
+
+
+class TestScripts(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.server = Server()
+        self.scripts = Scripts(self.server.execute)
+        self.script = self.scripts.register(SOURCE)
+
+    async def test_loaded_first(self):
+        scripts, script, server = self.scripts, self.script, self.server
+        self.assertIs(scripts.register(SOURCE.encode()), script)
+        pipeline = [("SET", "a", 1), scripts.call(script, ["k"], [1]), ("INCR", "c"),
+                    scripts.call(script, ["j"], readonly=True), ("GET", "k"), ("EVALSHA", "0" * 40, 0)]
+        replies = await scripts.execute(pipeline)
+        self.assertEqual(replies[:5], [b"OK", [b"ran", "k", 1], b"OK", [b"ran", "j"], b"v"])
+        self.assertIsInstance(replies[5], ReplyError)  # unknown to the registry, left alone
+        self.assertEqual(server.batches[:2], [[("SCRIPT", "EXISTS", script.sha)],
+                                              [("SCRIPT", "LOAD", SOURCE.encode())]])
+        self.assertEqual(server.batches[2], pipeline)  # sent once, in order
+        self.assertEqual(server.log, [("SET", "a", 1), ("script", "k", 1), ("INCR", "c"), ("script", "j")])
+        self.assertEqual(await scripts.run(script, ["x"]), [b"ran", "x"])
+        self.assertEqual(len(server.batches), 4)  # known loaded now, no check
+
+    async def test_already_on_server(self):
+        self.server.cache[self.script.sha] = SOURCE.encode()
+        await self.scripts.execute([("INCR", "c"), self.scripts.call(self.script, ["k"])])
+        self.assertEqual(len(self.server.batches), 2)  # SCRIPT EXISTS only, no LOAD
+
+    async def test_flushed_tail(self):
+        scripts, script, server = self.scripts, self.script, self.server
+        await scripts.run(script, ["k"])
+        server.cache.clear()  # SCRIPT FLUSH behind our back
+        server.log.clear()
+        replies = await scripts.execute([("INCR", "c"), scripts.call(script, ["a"]), scripts.call(script, ["b"])])
+        self.assertEqual(replies, [b"OK", [b"ran", "a"], [b"ran", "b"]])
+        self.assertEqual(server.log, [("INCR", "c"), ("script", "a"), ("script", "b")])
+
+    async def test_flushed_middle(self):
+        scripts, script, server = self.scripts, self.script, self.server
+        await scripts.run(script, ["k"])
+        server.cache.clear()
+        server.log.clear()
+        replies = await scripts.execute([scripts.call(script, ["a"]), ("INCR", "c")])
+        # INCR already ran after the failed script, running the script now would reorder them
+        self.assertIsInstance(replies[0], ReplyError)
+        self.assertEqual(replies[1], b"OK")
+        self.assertEqual(server.log, [("INCR", "c")])
+        self.assertEqual(await scripts.execute([scripts.call(script, ["a"]), ("INCR", "c")]),
+                         [[b"ran", "a"], b"OK"])  # checked and loaded again first
+        self.assertEqual(server.log, [("INCR", "c"), ("script", "a"), ("INCR", "c")])
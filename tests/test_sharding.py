@@ -0,0 +1,86 @@
+from bisect import bisect_left
+from unittest import IsolatedAsyncioTestCase, TestCase
+from zlib import crc32
+
+from sioresp.events import ReplyError
+from sioresp.exceptions import ProtocolError
+from sioresp.sharding import HashRing, ShardedClient
+
+
+class Node:
+    def __init__(self):
+        self.data = {}
+        self.batches = []
+
+    def answer(self, command):
+        name, *args = command
+        if name == "MGET":
+            return [self.data.get(k) for k in args]
+        if name == "GET":
+            return self.data.get(args[0])
+        if name == "MSET":
+            self.data.update(zip(args[::2], args[1::2]))
+            return b"OK"
+        if name == "DEL":
+            return sum(self.data.pop(k, None) is not None for k in args)
+        if name == "EVALSHA":
+            return ReplyError(b"NOSCRIPT No matching script")
+        return ReplyError(b"ERR unknown command")
+
+    async def execute(self, commands):
+        self.batches.append(commands)
+        return [self.answer(command) for command in commands]
+
+
+class TestRing(TestCase):
+    def test_lookup(self):
+        ring = HashRing(["a", "b", "c"], vnodes=50, table_bits=8)
+        for i in range(2000):
+            key = b"key:%d" % i
+            expected = ring._owners[bisect_left(ring._points, crc32(key)) % len(ring._points)]
+            self.assertEqual(ring.node_index(key), expected)
+        self.assertEqual(ring.node_for("user:{42}:name"), ring.node_for(b"42"))
+        self.assertEqual(ring.node_for(7), ring.node_for("7"))
+        self.assertEqual(ring.node_for(1.5), ring.node_for(b"1.5"))
+        self.assertEqual(ring.node_for(memoryview(b"user:{42}")), ring.node_for(b"42"))
+        self.assertEqual(ring.node_for(bytearray(b"key:1")), ring.node_for(b"key:1"))
+        with self.assertRaises(ProtocolError):
+            ring.node_for(True)
+
+    def test_spread(self):
+        ring = HashRing([f"node{i}" for i in range(4)])
+        counts = {}
+        for i in range(20000):
+            node = ring.node_for(b"key:%d" % i)
+            counts[node] = counts.get(node, 0) + 1
+        self.assertEqual(len(counts), 4)
+        self.assertTrue(all(3000 < count < 7000 for count in counts.values()), counts)
+        # adding a node only moves keys to it
+        bigger = HashRing([f"node{i}" for i in range(5)])
+        for i in range(2000):
+            before, after = ring.node_for(b"key:%d" % i), bigger.node_for(b"key:%d" % i)
+            self.assertIn(after, (before, "node4"))
+
+
+class TestSharded(IsolatedAsyncioTestCase):
+    async def test_fan_out(self):
+        nodes = {name: Node() for name in ("a", "b", "c")}
+        client = ShardedClient({name: node.execute for name, node in nodes.items()})
+        keys = [b"k%d" % i for i in range(30)]
+        pairs = [x for k in keys for x in (k, k + b"v")]
+        self.assertEqual(await client.execute("MSET", *pairs), b"OK")
+        for name, node in nodes.items():
+            self.assertTrue(node.data)
+            self.assertTrue(all(client.node_for(k) == name for k in node.data))
+        for node in nodes.values():
+            node.batches.clear()
+        replies = await client.pipeline([("MGET", *keys, b"missing"), ("GET", keys[3]), ("DEL", keys[0], keys[1]),
+                                         ("EVALSHA", "sha", 1, keys[5]), ("NOPE", keys[6])])
+        self.assertEqual(replies[0], [k + b"v" for k in keys] + [None])
+        self.assertEqual(replies[1], keys[3] + b"v")
+        self.assertEqual(replies[2], 2)
+        self.assertIsInstance(replies[3], ReplyError)
+        self.assertIsInstance(replies[4], ReplyError)
+        self.assertTrue(all(len(node.batches) == 1 for node in nodes.values()))  # one batch per node
+        with self.assertRaises(ValueError):
+            await client.execute("PING")
@@ -0,0 +1,79 @@
+from unittest import TestCase
+
+from sioresp import Connection, Config
+from sioresp.exceptions import ProtocolError
+from sioresp.tracing import Tracer
+
+
+class TestTracer(TestCase):
+    def test_trace(self):
+        con = Connection(Config(resp_version=3))
+        tracer = Tracer()
+        tracer.attach(con)
+        self.assertEqual(con.send_command("GET", "k"), b"*2\r\n$3\r\nGET\r\n$1\r\nk\r\n")
+        con.send_command(b"lrange", "l", 0, -1)
+        con.feed_data(b"$3\r\nabc\r\n*2\r\n:1\r\n")
+        self.assertEqual(next(con), b"abc")
+        with self.assertRaises(StopIteration):
+            next(con)
+        con.feed_data(b":2\r\n")
+        self.assertEqual(next(con), [1, 2])
+        sends = [s for s in tracer.samples if s.kind == "send"]
+        replies = [s for s in tracer.samples if s.kind == "reply"]
+        self.assertEqual([(s.name, s.size) for s in sends], [("GET", 20), ("LRANGE", 32)])
+        self.assertEqual([(s.name, s.size, s.type) for s in replies], [("GET", 9, "String"), ("LRANGE", 12, "Array")])
+        self.assertEqual(tracer.top(1, "size", "reply")[0].name, "LRANGE")
+        self.assertIn("LRANGE", tracer.report(3))
+
+        Tracer.detach(con)
+        self.assertIs(type(con), Connection)
+        con.feed_data(b"+OK\r\n")
+        self.assertEqual(next(con), b"OK")
+        self.assertEqual(len(tracer.samples), 4)
+
+    def test_sampling(self):
+        seen = []
+        con = Connection(Config())
+        tracer = Tracer(rate=0.25, callback=seen.append, seed=1)
+        tracer.attach(con)
+        for i in range(400):
+            con.send_command("PING")
+            con.feed_data(b"+PONG\r\n")
+            next(con)
+        self.assertEqual(len(tracer.samples), 0)
+        self.assertTrue(100 < len(seen) < 300)
+        self.assertEqual(len([s for s in seen if s.kind == "send"]), len([s for s in seen if s.kind == "reply"]))
+        self.assertEqual(len(con._trace_pending), 0)
+
+    def test_failed_reply(self):
+        con = Connection(Config(resp_version=3))
+        tracer = Tracer()
+        tracer.attach(con)
+        con.send_command("INCR", "k")
+        con.send_command("GET", "k")
+        con.feed_data(b":x\r\n$1\r\nv\r\n")
+        with self.assertRaises(ProtocolError):
+            next(con)
+        self.assertEqual(next(con), b"v")
+        replies = [(s.name, s.type) for s in tracer.samples if s.kind == "reply"]
+        self.assertEqual(replies, [("INCR", "ProtocolError"), ("GET", "String")])
+        self.assertEqual(len(con._trace_pending), 0)
+
+    def test_discard_and_visitor(self):
+        from sioresp.visitor import BuildVisitor
+
+        con = Connection(Config())
+        tracer = Tracer()
+        tracer.attach(con)
+        for name in ("A", "B", "C"):
+            con.send_command(name)
+        con.feed_data(b"+a\r\n+b\r\n")
+        con.discard()
+        self.assertEqual(con.next_with(BuildVisitor(con)), b"b")
+        con.feed_data(b"+c\r\n")
+        self.assertEqual(next(con), b"c")
+        replies = [s for s in tracer.samples if s.kind == "reply"]
+        self.assertEqual([(s.name, s.size) for s in replies], [("B", 4), ("C", 4)])
+        self.assertTrue(all(s.duration > 0 for s in replies))
+        self.assertEqual(len(con._trace_pending), 0)
+        self.assertEqual(len(con._trace_parsed), 0)
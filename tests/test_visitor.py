@@ -0,0 +1,102 @@
+from unittest import TestCase
+
+from sioresp import Connection, Config
+from sioresp.codecs import Value
+from sioresp.visitor import BuildVisitor, Visitor
+
+CORPUS = b"+OK\r\n$-1\r\n*-1\r\n*0\r\n*3\r\n:1\r\n$3\r\nfoo\r\n*2\r\n,1.5\r\n#t\r\n" \
+         b"%2\r\n+a\r\n*1\r\n_\r\n+b\r\n~2\r\n:1\r\n:2\r\n|1\r\n+ttl\r\n:3\r\n" \
+         b">2\r\n+message\r\n=8\r\ntxt:text\r\n-ERR no\r\n!3\r\nerr\r\n(12345678901234567890\r\n"
+
+
+class Sum(Visitor):
+    def __init__(self):
+        self.total = 0
+
+    def on_int(self, value):
+        self.total += value
+
+    def result(self):
+        total, self.total = self.total, 0
+        return total
+
+
+class TestVisitor(TestCase):
+    def check_same(self, config, data):
+        expected = Connection(config)
+        expected.feed_data(data)
+        con = Connection(config)
+        visitor = BuildVisitor(con)
+        for i in range(len(data)):  # whole replies only, whatever the split
+            con.feed_data(data[i:i + 1])
+            while True:
+                try:
+                    reply = con.next_with(visitor)
+                except StopIteration:
+                    break
+                self.assertEqual(reply, next(expected))
+                self.assertEqual(con.attributes, expected.attributes)
+        self.assertEqual(list(expected), [])
+        self.assertEqual(con.pending_bytes(), 0)
+
+    def test_default(self):
+        self.check_same(Config(resp_version=3), CORPUS)
+        self.check_same(Config(resp_version=3, dict_for_map=True, intern_cache_size=8), CORPUS)
+        self.check_same(Config(resp_version=3, immutable_containers=True), CORPUS)
+        self.check_same(Config(resp_version=3, immutable_containers=True, dict_for_map=True), CORPUS)
+
+    def test_codecs(self):
+        config = Config(resp_version=3, value_codecs=("pickle",))
+        data = Connection(config).send_command("X", Value({"a": [1]}))
+        self.check_same(config, data)
+
+    def test_fold(self):
+        con = Connection(Config())
+        con.feed_data(b"*3\r\n:1\r\n*2\r\n:2\r\n:3\r\n$1\r\nx\r\n:4\r\n*1\r\n")
+        visitor = Sum()
+        self.assertEqual(con.next_with(visitor), 6)
+        self.assertEqual(con.next_with(visitor), 4)
+        with self.assertRaises(StopIteration):
+            con.next_with(visitor)
+        con.feed_data(b":5\r\n")
+        self.assertEqual(con.next_with(visitor), 5)
+
+    def test_streaming(self):
+        con = Connection(Config())
+        visitor = Sum()
+        con.feed_data(b"*1000\r\n")
+        with self.assertRaises(StopIteration):
+            con.next_with(visitor)
+        for i in range(1000):
+            con.feed_data(b":%d\r\n" % i)
+            self.assertEqual(len(con._events), 0)  # folded as parsed, nothing piles up
+        con.feed_data(b":7\r\n")
+        self.assertEqual(con.next_with(visitor), sum(range(1000)))
+        self.assertEqual(con.next_with(visitor), 7)
+        with self.assertRaises(RuntimeError):
+            con.feed_data(b"*2\r\n")
+            try:
+                con.next_with(visitor)
+            except StopIteration:
+                pass
+            con.next_with(Sum())
+
+    def test_streaming_error(self):
+        class Fail(Sum):
+            def on_int(self, value):
+                if value == 2:
+                    raise ValueError(value)
+
+        con = Connection(Config())
+        con.feed_data(b"*3\r\n:1\r\n")
+        with self.assertRaises(StopIteration):
+            con.next_with(Fail())
+        con.feed_data(b":2\r\n:3\r\n+OK\r\n")
+        with self.assertRaises(ValueError):
+            con.next_with(Sum())  # the reply was already taken, its error comes out
+        self.assertEqual(next(con), b"OK")
+        con.feed_data(b"*2\r\n:2\r\n:3\r\n:4\r\n")
+        with self.assertRaises(ValueError):
+            con.next_with(Fail())
+        self.assertEqual(next(con), 4)
+        self.assertEqual(con.pending_bytes(), 0)
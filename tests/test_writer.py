@@ -0,0 +1,65 @@
+import socket
+from unittest import TestCase
+
+from sioresp import Connection, Config, RespWriter
+from sioresp.exceptions import ProtocolError
+
+
+class Transport:
+    def __init__(self):
+        self.data = []
+
+    def write(self, data):
+        self.data.append(data)
+
+
+class TestWriter(TestCase):
+    def setUp(self) -> None:
+        self.con = Connection(Config(resp_version=3))
+        self.writer = self.con.writer(bytearray(8))
+
+    def test_command(self):
+        self.writer.write_command("SET", b"key", 10, 1.5)
+        self.assertEqual(self.writer.getvalue(), b"*4\r\n$3\r\nSET\r\n$3\r\nkey\r\n$2\r\n10\r\n$3\r\n1.5\r\n")
+        with self.assertRaises(ProtocolError):
+            self.writer.write_command("SET", b"key", True)
+
+    def test_reuse(self):
+        self.writer.write_commands([("GET", "a"), ("GET", "b")])
+        capacity = self.writer.capacity
+        transport = Transport()
+        self.assertEqual(self.writer.flush_to(transport), 40)
+        self.assertEqual(transport.data, [b"*2\r\n$3\r\nGET\r\n$1\r\na\r\n*2\r\n$3\r\nGET\r\n$1\r\nb\r\n"])
+        self.assertEqual(len(self.writer), 0)
+        self.writer.write_command("GET", "c")
+        self.assertIs(type(transport.data[0]), bytes)
+        self.assertEqual(self.writer.capacity, capacity)
+
+    def test_element(self):
+        self.writer.write_element([1, {"a": None}, True])
+        self.writer.write_push_header(1)
+        self.writer.write_string("OK")
+        self.con.feed_data(self.writer.getvalue())
+        self.assertEqual(next(self.con), [1, [(b"a", None)], True])
+        self.assertEqual(next(self.con), [b"OK"])
+
+    def test_memoryview(self):
+        area = bytearray(16)
+        writer = RespWriter(Config(), memoryview(area))
+        writer.write_integer(100)
+        self.assertEqual(bytes(area[:6]), b":100\r\n")
+        with self.assertRaises(BufferError):
+            writer.write_bulk(b"x" * 8)  # the header would fit, nothing is written
+        with self.assertRaises(BufferError):
+            writer.write_command("SET", "k", "v")
+        self.assertEqual(len(writer), 6)
+        self.assertEqual(bytes(writer.getbuffer()), b":100\r\n")
+        writer.write_bulk(b"x")
+        self.assertEqual(bytes(area[:13]), b":100\r\n$1\r\nx\r\n")
+
+    def test_socket(self):
+        a, b = socket.socketpair()
+        with a, b:
+            self.writer.write_command("PING")
+            self.writer.flush_to(a)
+            self.assertEqual(b.recv(100), b"*1\r\n$4\r\nPING\r\n")